@@ -0,0 +1,197 @@
+"""Index cache hit rate with several worker processes per cache backend.
+
+Скрипт моделирует воркеры gunicorn: каждый процесс обслуживает свою
+долю запросов к страницам главной (популярность страниц убывает по
+степенному закону) через ключи posts.cache. Часть запросов — записи,
+которые сменяют поколение кэша главной. Для каждого бэкенда и числа
+воркеров считаются доля попаданий и доля устаревших ответов — тех, что
+отданы из поколения старше последней записи.
+
+Redis замеряется на локальной замене из core.cache.redis_stub, если не
+указан --redis-url. Запуск из корня репозитория:
+
+    python benchmarks/cache_hit_rate.py --workers 1 4 16
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'yatube'))
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'db': 'django.core.cache.backends.db.DatabaseCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'core.cache.redis.RedisCache',
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS,
+                        default=list(BACKENDS))
+    parser.add_argument('--workers', nargs='+', type=int,
+                        default=[1, 4, 16])
+    parser.add_argument('--requests', type=int, default=20000,
+                        help='Всего запросов на один прогон.')
+    parser.add_argument('--pages', type=int, default=50)
+    parser.add_argument('--write-ratio', type=float, default=0.01)
+    parser.add_argument('--render-ms', type=float, default=1.0,
+                        help='Время сборки страницы при промахе.')
+    parser.add_argument('--redis-url')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Сохранить результаты в JSON.')
+    return parser.parse_args()
+
+
+def configure(backend, location, database):
+    from django.conf import settings
+
+    settings.configure(
+        DATABASES={'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': database,
+            'OPTIONS': {'timeout': 30},
+        }},
+        CACHES={'default': {
+            'BACKEND': BACKENDS[backend],
+            'LOCATION': location,
+            'KEY_PREFIX': 'bench',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }},
+    )
+    import django
+    django.setup()
+
+
+def worker(backend, location, database, requests, args, number,
+           latest, results):
+    configure(backend, location, database)
+    from django.core.cache import cache
+
+    from posts import cache as posts_cache
+
+    rng = random.Random(args.seed + number)
+    hits = misses = stale = writes = 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        if rng.random() < args.write_ratio:
+            posts_cache.bump_index_generation()
+            latest.value = posts_cache.index_generation()
+            writes += 1
+            continue
+        generation = posts_cache.index_generation()
+        page = int(args.pages * rng.random() ** 3) + 1
+        key = posts_cache.index_key(generation, f'page:{page}')
+        if cache.get(key) is None:
+            time.sleep(args.render_ms / 1000)
+            cache.set(key, [page] * 10, 3600)
+            misses += 1
+        else:
+            hits += 1
+        if latest.value and generation != latest.value:
+            stale += 1
+    results.put({'hits': hits, 'misses': misses, 'stale': stale,
+                 'writes': writes,
+                 'seconds': time.perf_counter() - started})
+
+
+def location_for(backend, args, workdir, redis_url):
+    if backend == 'file':
+        return os.path.join(workdir, 'cache')
+    if backend == 'db':
+        return 'bench_cache'
+    if backend == 'redis':
+        return redis_url
+    return ''
+
+
+def prepare(backend, location, database):
+    """Создаёт таблицу кэша и очищает кэш перед прогоном."""
+    process = multiprocessing.Process(
+        target=_prepare, args=(backend, location, database))
+    process.start()
+    process.join()
+
+
+def _prepare(backend, location, database):
+    configure(backend, location, database)
+    from django.core.cache import cache
+    from django.core.management import call_command
+
+    if backend == 'db':
+        call_command('createcachetable', verbosity=0)
+    cache.clear()
+
+
+def run(backend, workers, args, workdir, redis_url):
+    location = location_for(backend, args, workdir, redis_url)
+    database = os.path.join(workdir, 'cache.sqlite3')
+    prepare(backend, location, database)
+    latest = multiprocessing.Value('q', 0)
+    results = multiprocessing.Queue()
+    share = args.requests // workers
+    processes = [multiprocessing.Process(
+        target=worker,
+        args=(backend, location, database, share, args, number,
+              latest, results))
+        for number in range(workers)]
+    for process in processes:
+        process.start()
+    totals = {'hits': 0, 'misses': 0, 'stale': 0, 'writes': 0,
+              'seconds': 0.0}
+    for _ in processes:
+        for name, value in results.get().items():
+            totals[name] = max(totals[name], value) if name == 'seconds' \
+                else totals[name] + value
+    for process in processes:
+        process.join()
+    reads = totals['hits'] + totals['misses']
+    return {
+        'backend': backend,
+        'workers': workers,
+        'hit_rate': round(totals['hits'] / reads, 4),
+        'stale_rate': round(totals['stale'] / reads, 4),
+        'writes': totals['writes'],
+        'requests_per_second': round(share * workers / totals['seconds']),
+    }
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix='yatube-cache-bench-')
+    server = None
+    redis_url = args.redis_url
+    if 'redis' in args.backends and not redis_url:
+        from core.cache.redis_stub import RedisStubServer
+        server = RedisStubServer().start()
+        redis_url = server.url
+    try:
+        results = []
+        for backend in args.backends:
+            for workers in args.workers:
+                result = run(backend, workers, args, workdir, redis_url)
+                results.append(result)
+                print('{backend:>6} x{workers:<3} hit rate {hit_rate:.1%}, '
+                      'stale {stale_rate:.1%}, '
+                      '{requests_per_second} req/s'.format(**result))
+    finally:
+        if server is not None:
+            server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'args': vars(args), 'results': results},
+                      output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""Query plans of feed lookups before and after the feed indexes.
+
+Скрипт создаёт отдельную базу SQLite, применяет миграции posts до
+0012_timeline (без составных индексов), заполняет её синтетическими
+данными, снимает EXPLAIN QUERY PLAN и время запросов лент, затем
+применяет остальные миграции и повторяет замеры.
+
+Запуск из корня репозитория:
+
+    python benchmarks/feed_query_plans.py --posts 1000000
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'yatube'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+BEFORE_MIGRATION = '0012_timeline'
+# Поля ленты, добавленные миграциями после BEFORE_MIGRATION.
+BEFORE_MISSING_FIELDS = {'updated_at'}
+CHUNK_SIZE = 50000
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', default=os.path.join(
+        ROOT_DIR, 'benchmarks', 'feed_query_plans.sqlite3'))
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--groups', type=int, default=100)
+    parser.add_argument('--comments', type=int, default=200000)
+    parser.add_argument('--follows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Сохранить результаты в JSON.')
+    return parser.parse_args()
+
+
+def insert_rows(cursor, table, columns, rows):
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        table, ', '.join(columns), ', '.join('%s' for _ in columns))
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == CHUNK_SIZE:
+            cursor.executemany(sql, chunk)
+            chunk = []
+    if chunk:
+        cursor.executemany(sql, chunk)
+
+
+def skewed_id(rng, total):
+    """Id со степенным распределением: немногие авторы пишут много."""
+    return int(total * rng.random() ** 3) + 1
+
+
+def seed(args):
+    from django.db import connection, transaction
+
+    rng = random.Random(args.seed)
+    start = datetime(2020, 1, 1)
+    with transaction.atomic(), connection.cursor() as cursor:
+        insert_rows(cursor, 'auth_user', (
+            'password', 'is_superuser', 'username', 'first_name',
+            'last_name', 'email', 'is_staff', 'is_active', 'date_joined'),
+            (('!', False, f'user{number}', '', '', '', False, True, start)
+             for number in range(1, args.users + 1)))
+        insert_rows(cursor, 'posts_group', ('title', 'slug', 'description'),
+                    ((f'Группа {number}', f'group-{number}', '')
+                     for number in range(1, args.groups + 1)))
+        insert_rows(cursor, 'posts_post', (
+            'text', 'pub_date', 'author_id', 'group_id', 'image'),
+            ((f'Пост {number}', start + timedelta(seconds=number),
+              skewed_id(rng, args.users),
+              rng.randint(1, args.groups) if rng.random() < 0.7 else None,
+              '')
+             for number in range(args.posts)))
+        insert_rows(cursor, 'posts_comment', (
+            'text', 'created', 'author_id', 'post_id'),
+            ((f'Комментарий {number}',
+              start + timedelta(seconds=number),
+              rng.randint(1, args.users), skewed_id(rng, args.posts))
+             for number in range(args.comments)))
+        follows = set()
+        while len(follows) < args.follows:
+            user_id = rng.randint(1, args.users)
+            author_id = skewed_id(rng, args.users)
+            if user_id != author_id:
+                follows.add((user_id, author_id))
+        insert_rows(cursor, 'posts_follow', ('user_id', 'author_id', 'pull'),
+                    ((user_id, author_id, False)
+                     for user_id, author_id in sorted(follows)))
+        cursor.execute('ANALYZE')
+
+
+def feed_querysets():
+    from posts.models import Comment, Follow, Post, PostQuerySet
+    from posts.pagination import CursorPaginator
+
+    # Как Post.objects.feed(), но только со столбцами, которые есть уже
+    # на BEFORE_MIGRATION: обе серии замеров выбирают одно и то же.
+    feed = Post.objects.select_related('author', 'group').only(*(
+        field for field in PostQuerySet.FEED_FIELDS
+        if field not in BEFORE_MISSING_FIELDS))
+    middle = Post.objects.order_by('-pub_date', '-id').values(
+        'pub_date', 'id')[Post.objects.count() // 2]
+    follow = Follow.objects.order_by('id').first()
+    return {
+        'index': feed[:10],
+        'index_keyset_page': CursorPaginator(feed, 10).seek(
+            [middle['pub_date'], middle['id']])[:10],
+        'profile': feed.filter(author_id=1)[:10],
+        'group_posts': feed.filter(group_id=1)[:10],
+        'follow_lookup': Follow.objects.filter(
+            user_id=follow.user_id, author_id=follow.author_id)[:1],
+        'comments': Comment.objects.filter(post_id=1).order_by('created'),
+    }
+
+
+def measure(repeat):
+    results = {}
+    for name, queryset in feed_querysets().items():
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(queryset.all())
+            timings.append((time.perf_counter() - started) * 1000)
+        results[name] = {
+            'plan': queryset.explain(),
+            'median_ms': round(statistics.median(timings), 3),
+        }
+    return results
+
+
+def main():
+    args = parse_args()
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = args.database
+    if os.path.exists(args.database):
+        os.remove(args.database)
+
+    import django
+    django.setup()
+    from django.core.management import call_command
+    from django.db import connection
+
+    call_command('migrate', verbosity=0)
+    call_command('migrate', 'posts', BEFORE_MIGRATION, verbosity=0)
+    started = time.perf_counter()
+    seed(args)
+    print(f'Seeded {args.posts} posts in '
+          f'{time.perf_counter() - started:.1f}s')
+    before = measure(args.repeat)
+
+    started = time.perf_counter()
+    call_command('migrate', verbosity=0)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    print(f'Applied feed indexes in {time.perf_counter() - started:.1f}s')
+    after = measure(args.repeat)
+
+    for name in before:
+        print(f'\n== {name}: {before[name]["median_ms"]} ms -> '
+              f'{after[name]["median_ms"]} ms')
+        print('-- before\n' + before[name]['plan'])
+        print('-- after\n' + after[name]['plan'])
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'args': vars(args), 'before': before,
+                       'after': after}, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""Deterministic synthetic dataset for yatube benchmarks.
+
+Генератор строит пользователей, группы, посты, комментарии и подписки
+заданного масштаба. Авторы постов и авторы, на которых подписываются,
+распределены по степенному закону: немногие пишут много и собирают
+большинство подписчиков; комментарии так же скапливаются у немногих
+постов. Тексты собираются из словаря Faker с частотами по закону Ципфа,
+поэтому поиск находит и редкие, и частые слова.
+
+При одном и том же --seed данные совпадают байт в байт. Записи
+загружаются тем же путём, что и import_posts (posts.transfer), поэтому
+счётчики, ленты и поисковый индекс строятся как в рабочей базе.
+
+Запуск из корня репозитория:
+
+    python benchmarks/generate_data.py --database bench.sqlite3 \\
+        --users 1000 --posts 20000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'yatube'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+START = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+def add_arguments(parser):
+    parser.add_argument('--database', default=os.path.join(
+        ROOT_DIR, 'benchmarks', 'bench.sqlite3'))
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--groups', type=int, default=20)
+    parser.add_argument('--posts', type=int, default=20000)
+    parser.add_argument('--comments', type=int, default=40000)
+    parser.add_argument('--follows', type=int, default=5000)
+    parser.add_argument('--skew', type=float, default=2.0,
+                        help='Показатель степенного распределения авторов.')
+    parser.add_argument('--seed', type=int, default=42)
+
+
+def skewed_id(rng, total, skew):
+    """Id со степенным распределением: чем меньше id, тем он чаще."""
+    return int(total * rng.random() ** skew) + 1
+
+
+class TextGenerator:
+    """Тексты из словаря Faker с частотами слов по закону Ципфа."""
+
+    def __init__(self, rng, seed):
+        from faker import Faker
+
+        fake = Faker('ru_RU')
+        fake.seed_instance(seed)
+        self.fake = fake
+        self.rng = rng
+        self.vocabulary = sorted(set(fake.words(nb=20000)))
+        self.rng.shuffle(self.vocabulary)
+        weights = [1 / rank for rank in range(1, len(self.vocabulary) + 1)]
+        total = sum(weights)
+        self.cumulative = []
+        running = 0
+        for weight in weights:
+            running += weight / total
+            self.cumulative.append(running)
+
+    def words(self, low, high):
+        count = self.rng.randint(low, high)
+        words = self.rng.choices(self.vocabulary, cum_weights=self.cumulative,
+                                 k=count)
+        return ' '.join(words).capitalize()
+
+
+def records(args):
+    """Записи в формате posts.transfer; при одном seed одинаковые."""
+    rng = random.Random(args.seed)
+    text = TextGenerator(rng, args.seed)
+    fake = text.fake
+    for number in range(1, args.users + 1):
+        yield {'type': 'user', 'username': f'user{number}',
+               'first_name': fake.first_name(),
+               'last_name': fake.last_name()}
+    for number in range(1, args.groups + 1):
+        yield {'type': 'group', 'slug': f'group-{number}',
+               'title': text.words(1, 3),
+               'description': text.words(5, 20)}
+    moment = START
+    for number in range(1, args.posts + 1):
+        moment += timedelta(seconds=rng.randint(1, 600))
+        group = (f'group-{skewed_id(rng, args.groups, args.skew)}'
+                 if rng.random() < 0.7 else None)
+        yield {'type': 'post', 'id': number,
+               'author': f'user{skewed_id(rng, args.users, args.skew)}',
+               'group': group, 'text': text.words(5, 80),
+               'pub_date': moment.isoformat(), 'image': ''}
+    for number in range(1, args.comments + 1):
+        post = skewed_id(rng, args.posts, args.skew)
+        yield {'type': 'comment', 'id': number, 'post': post,
+               'author': f'user{rng.randint(1, args.users)}',
+               'text': text.words(1, 30),
+               'created': (moment + timedelta(seconds=number)).isoformat()}
+    follows = set()
+    attempts = 0
+    while len(follows) < args.follows and attempts < args.follows * 20:
+        attempts += 1
+        user = rng.randint(1, args.users)
+        author = skewed_id(rng, args.users, args.skew)
+        if user != author and (user, author) not in follows:
+            follows.add((user, author))
+            yield {'type': 'follow', 'user': f'user{user}',
+                   'author': f'user{author}'}
+
+
+def generate(args):
+    """Создаёт базу args.database и наполняет её; Django уже настроен."""
+    from django.core.management import call_command
+    from django.db import connection
+    from posts.transfer import Importer
+
+    call_command('migrate', verbosity=0)
+    started = time.perf_counter()
+    counts = Importer(batch_size=1000, transaction_size=20000).run(
+        records(args))
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    print(f'Generated {counts} in {time.perf_counter() - started:.1f}s')
+    return counts
+
+
+def configure(database, fresh=True):
+    """Направляет Django на базу бенчмарка и отключает отладку."""
+    from django.conf import settings
+
+    for alias in settings.DATABASES.values():
+        alias['NAME'] = database
+    settings.DEBUG = False
+    if fresh:
+        for path in (database, database + '-wal', database + '-shm'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    import django
+    django.setup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure(args.database)
+    generate(args)
+
+
+if __name__ == '__main__':
+    main()
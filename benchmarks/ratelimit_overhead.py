@@ -0,0 +1,137 @@
+"""Per-request overhead of the core.ratelimit decorator.
+
+Пустой view вызывается через RequestFactory с декоратором ratelimit и
+без него; разница времени — накладные расходы лимитера на запрос.
+Замеряются пропущенные запросы (лимит не исчерпан: add и incr) и
+отклонённые (incr, decr и ответ 429 с шаблоном) для каждого бэкенда
+кэша. Redis замеряется на локальной замене из core.cache.redis_stub,
+если не указан --redis-url; там время почти целиком — обмен с сервером.
+
+Скрипт завершается с кодом 1, если пропущенный запрос с кэшем locmem
+дороже --budget-us микросекунд. Запуск из корня репозитория:
+
+    python benchmarks/ratelimit_overhead.py --requests 20000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'yatube'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'redis': 'core.cache.redis.RedisCache',
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS,
+                        default=list(BACKENDS))
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--rounds', type=int, default=5,
+                        help='Повторов замера; берётся медиана.')
+    parser.add_argument('--budget-us', type=float, default=100.0)
+    parser.add_argument('--redis-url')
+    parser.add_argument('--output', help='Сохранить результаты в JSON.')
+    return parser.parse_args()
+
+
+class BenchUser:
+    is_authenticated = True
+
+    def __init__(self, pk):
+        self.pk = pk
+
+
+def per_call_us(view, requests):
+    started = time.perf_counter()
+    for request in requests:
+        view(request)
+    return (time.perf_counter() - started) / len(requests) * 1000000
+
+
+def measure(args):
+    from django.conf import settings
+    from django.core.cache import caches
+    from django.http import HttpResponse
+    from django.test import RequestFactory
+
+    from core.ratelimit import ratelimit
+
+    def view(request):
+        return HttpResponse()
+
+    limited = ratelimit('bench')(view)
+    factory = RequestFactory()
+    results = {}
+    for name, rate in (('allowed', f'{args.requests * 10}/s'),
+                       ('denied', '1/d')):
+        settings.RATELIMITS = {'bench': rate}
+        timings = []
+        for _ in range(args.rounds):
+            caches['default'].clear()
+            requests = []
+            for number in range(args.requests):
+                request = factory.post('/')
+                # Пропущенные запросы — от сотни клиентов (add, затем incr),
+                # отклонённые — от одного.
+                request.user = BenchUser(
+                    number % 100 if name == 'allowed' else 0)
+                requests.append(request)
+            limited(requests[0])
+            bare = per_call_us(view, requests)
+            timings.append(per_call_us(limited, requests) - bare)
+        results[name] = round(statistics.median(timings), 2)
+    return results
+
+
+def main():
+    args = parse_args()
+    from django.conf import settings
+
+    server = None
+    redis_url = args.redis_url
+    if 'redis' in args.backends and not redis_url:
+        from core.cache.redis_stub import RedisStubServer
+        server = RedisStubServer().start()
+        redis_url = server.url
+    settings.DEBUG = False
+    import django
+    django.setup()
+    from django.core.cache import caches
+
+    results = {}
+    try:
+        for backend in args.backends:
+            settings.CACHES = {'default': {
+                'BACKEND': BACKENDS[backend],
+                'LOCATION': redis_url if backend == 'redis' else 'bench',
+                'KEY_PREFIX': 'bench',
+                'OPTIONS': {'MAX_ENTRIES': args.requests * 2},
+            }}
+            caches._caches.__dict__.clear()
+            results[backend] = result = measure(args)
+            print(f'{backend:>6}: allowed {result["allowed"]:7.2f} us, '
+                  f'denied {result["denied"]:7.2f} us per request')
+    finally:
+        if server is not None:
+            server.stop()
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'args': vars(args), 'results': results}, output,
+                      indent=2)
+    locmem = results.get('locmem')
+    if locmem and locmem['allowed'] > args.budget_us:
+        print(f'Накладные расходы больше {args.budget_us} us')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
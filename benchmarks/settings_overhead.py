@@ -0,0 +1,140 @@
+"""Startup time and per-request overhead of the dev and prod settings.
+
+Каждый вариант настроек запускается в отдельном процессе: замеряется
+время django.setup(), первый запрос (загрузка шаблонов, соединение с
+базой) и среднее, p50 и p95 последующих запросов к нескольким
+страницам. Варианты показывают, что даёт каждая настройка prod:
+
+* dev — DEBUG, панель отладки, шаблоны читаются при каждом запросе;
+* dev-no-toolbar — то же без панели отладки;
+* prod-no-persist — prod, но новое соединение с базой на каждый запрос;
+* prod — постоянные соединения, кэш шаблонов, чтение через replica.
+
+Данные берутся из базы generate_data.py (создаётся, если её нет).
+Запуск из корня репозитория:
+
+    python benchmarks/settings_overhead.py --requests 300
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import generate_data
+
+VARIANTS = {
+    'dev': {'DJANGO_ENV': 'dev'},
+    'dev-no-toolbar': {'DJANGO_ENV': 'dev', 'DEBUG_TOOLBAR': '0'},
+    'prod-no-persist': {'DJANGO_ENV': 'prod', 'DB_CONN_MAX_AGE': '0'},
+    'prod': {'DJANGO_ENV': 'prod'},
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    generate_data.add_arguments(parser)
+    parser.add_argument('--requests', type=int, default=300,
+                        help='Запросов на вариант после первого.')
+    parser.add_argument('--variants', nargs='+', choices=VARIANTS,
+                        default=list(VARIANTS))
+    parser.add_argument('--child', action='store_true',
+                        help=argparse.SUPPRESS)
+    parser.add_argument('--output', help='Сохранить результаты в JSON.')
+    return parser.parse_args()
+
+
+def child(args):
+    """Замеры внутри процесса с настройками из окружения."""
+    started = time.perf_counter()
+    import django
+    from django.conf import settings
+
+    django.setup()
+    setup_ms = (time.perf_counter() - started) * 1000
+    from django.test import Client
+    from django.urls import reverse
+    from posts.models import Group, Post, User
+
+    settings.ALLOWED_HOSTS = ['testserver']
+    paths = [
+        reverse('posts:index'),
+        reverse('posts:group_posts',
+                args=[Group.objects.order_by('pk').first().slug]),
+        reverse('posts:profile',
+                args=[User.objects.order_by('pk').first().username]),
+        reverse('posts:post_detail',
+                args=[Post.objects.order_by('pk').first().pk]),
+    ]
+    client = Client(REMOTE_ADDR='127.0.0.1')
+    started = time.perf_counter()
+    client.get(paths[0])
+    first_ms = (time.perf_counter() - started) * 1000
+    for path in paths:
+        client.get(path)
+    timings = []
+    for number in range(args.requests):
+        started = time.perf_counter()
+        response = client.get(paths[number % len(paths)])
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.status_code
+    mean = sum(timings) / len(timings)
+    timings.sort()
+    print(json.dumps({
+        'setup_ms': round(setup_ms, 1),
+        'first_request_ms': round(first_ms, 1),
+        'mean_ms': round(mean, 3),
+        'p50_ms': round(timings[len(timings) // 2], 3),
+        'p95_ms': round(timings[int(len(timings) * 0.95)], 3),
+    }))
+
+
+def measure(args, static_root):
+    """Запускает варианты в отдельных процессах; результаты по именам."""
+    base_env = dict(os.environ, DB_NAME=args.database,
+                    STATIC_ROOT=static_root, SECRET_KEY='benchmark',
+                    ALLOWED_HOSTS='testserver', METRICS_SAMPLE_RATE='0',
+                    DJANGO_SETTINGS_MODULE='yatube.settings',
+                    PYTHONPATH=os.path.join(generate_data.ROOT_DIR,
+                                            'yatube'))
+    manage = os.path.join(generate_data.ROOT_DIR, 'yatube', 'manage.py')
+    subprocess.run([sys.executable, manage, 'collectstatic', '--noinput',
+                    '-v', '0'], env=dict(base_env, DJANGO_ENV='prod'),
+                   check=True)
+    results = {}
+    for name in args.variants:
+        output = subprocess.run(
+            [sys.executable, __file__, '--child', '--database',
+             args.database, '--requests', str(args.requests)],
+            env=dict(base_env, **VARIANTS[name]), check=True,
+            capture_output=True, text=True).stdout
+        results[name] = result = json.loads(output.strip().splitlines()[-1])
+        print(f'{name:16} setup {result["setup_ms"]:7.1f} ms  '
+              f'first {result["first_request_ms"]:7.1f} ms  '
+              f'mean {result["mean_ms"]:7.2f} ms  '
+              f'p50 {result["p50_ms"]:7.2f} ms  '
+              f'p95 {result["p95_ms"]:7.2f} ms')
+    return results
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        child(args)
+        return
+    if not os.path.exists(args.database):
+        generate_data.configure(args.database)
+        generate_data.generate(args)
+    with tempfile.TemporaryDirectory() as static_root:
+        results = measure(args, static_root)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'args': vars(args), 'results': results}, output,
+                      indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""Read throughput and lock errors of SQLite under concurrent writers.
+
+Несколько процессов-читателей запрашивают посты с автором и
+комментариями, а процессы-писатели в транзакциях читают пост и
+добавляют к нему комментарий, как add_comment. Сравниваются два
+варианта на копиях одной базы generate_data.py:
+
+* stock — стандартный бэкенд Django, журнал отката (journal_mode=delete),
+  одно соединение на процесс;
+* tuned — core.backends.sqlite3: WAL, PRAGMA из SQLITE_PRAGMAS,
+  BEGIN IMMEDIATE для записи и чтения через соединение replica.
+
+Для каждого варианта печатаются чтения и записи в секунду и число
+ошибок «database is locked». Запуск из корня репозитория:
+
+    python benchmarks/sqlite_concurrency.py --readers 8 --writers 2
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+
+import generate_data
+
+VARIANTS = ('stock', 'tuned')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    generate_data.add_arguments(parser)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=10.0,
+                        help='Длительность прогона варианта, секунд.')
+    parser.add_argument('--timeout', type=float, default=5.0,
+                        help='Busy timeout соединений, секунд.')
+    parser.add_argument('--variants', nargs='+', choices=VARIANTS,
+                        default=list(VARIANTS))
+    parser.add_argument('--output', help='Сохранить результаты в JSON.')
+    return parser.parse_args()
+
+
+def setup_django(variant, database, timeout):
+    """Настраивает Django в процессе воркера под вариант."""
+    from django.conf import settings
+
+    default = settings.DATABASES['default']
+    default.update(NAME=database, OPTIONS={'timeout': timeout})
+    settings.DEBUG = False
+    if variant == 'stock':
+        default['ENGINE'] = 'django.db.backends.sqlite3'
+        settings.SQLITE_PRAGMAS = {}
+    else:
+        default['ENGINE'] = 'core.backends.sqlite3'
+        settings.DATABASES['replica'] = dict(default, READ_ONLY=True)
+        settings.DATABASE_ROUTERS = ['core.db.ReadReplicaRouter']
+
+    import django
+    django.setup()
+
+
+def worker(role, variant, database, args, ready, results):
+    setup_django(variant, database, args.timeout)
+    from django.db import OperationalError, close_old_connections, transaction
+    from posts.models import Comment, Post, User
+
+    rng = random.Random(os.getpid())
+    last_post = Post.objects.order_by('-pk').values_list('pk', flat=True)[0]
+    author = User.objects.order_by('pk').first()
+    done = locked = 0
+    ready.wait()
+    deadline = time.time() + args.duration
+    while time.time() < deadline:
+        pk = generate_data.skewed_id(rng, last_post, args.skew)
+        try:
+            if role == 'reader':
+                post = (Post.objects.select_related('author', 'group')
+                        .filter(pk=pk).first())
+                if post is not None:
+                    list(post.comments.select_related('author')[:20])
+            else:
+                with transaction.atomic():
+                    post = Post.objects.filter(pk=pk).first()
+                    if post is not None:
+                        Comment.objects.create(post=post, author=author,
+                                               text=f'Нагрузка {done}')
+            done += 1
+        except OperationalError:
+            locked += 1
+            close_old_connections()
+    results.put((role, done, locked))
+
+
+def measure(variant, source, args):
+    """Прогоняет вариант на копии базы; результаты в секунду."""
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, 'bench.sqlite3')
+        with sqlite3.connect(source) as connection:
+            connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        shutil.copy(source, database)
+        with sqlite3.connect(database) as connection:
+            mode = 'delete' if variant == 'stock' else 'wal'
+            connection.execute(f'PRAGMA journal_mode = {mode}')
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        roles = ['reader'] * args.readers + ['writer'] * args.writers
+        # Замер начинается, когда все процессы настроили Django.
+        ready = context.Barrier(len(roles))
+        processes = [
+            context.Process(target=worker, args=(
+                role, variant, database, args, ready, results))
+            for role in roles]
+        for process in processes:
+            process.start()
+        totals = {'reader': [0, 0], 'writer': [0, 0]}
+        for _ in processes:
+            role, done, locked = results.get()
+            totals[role][0] += done
+            totals[role][1] += locked
+        for process in processes:
+            process.join()
+    return {
+        'reads_per_s': round(totals['reader'][0] / args.duration, 1),
+        'writes_per_s': round(totals['writer'][0] / args.duration, 1),
+        'read_errors': totals['reader'][1],
+        'write_errors': totals['writer'][1],
+    }
+
+
+def main():
+    args = parse_args()
+    if not os.path.exists(args.database):
+        generate_data.configure(args.database)
+        generate_data.generate(args)
+    results = {}
+    for variant in args.variants:
+        results[variant] = result = measure(variant, args.database, args)
+        print(f'{variant:6} reads {result["reads_per_s"]:9.1f}/s  '
+              f'writes {result["writes_per_s"]:7.1f}/s  '
+              f'locked: reads {result["read_errors"]}, '
+              f'writes {result["write_errors"]}')
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'args': vars(args), 'results': results}, output,
+                      indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""Bytes and requests per cold and warm page load, static pipeline.
+
+Страницы открываются тестовым клиентом Django, из HTML выбираются
+адреса статики (href и src под STATIC_URL), и модель браузера
+загружает их, как при первом визите (пустой кэш) и при повторном через
+--revisit-after секунд. Файл из кэша браузера не запрашивается, если
+его Cache-Control ещё действует; иначе отправляется условный запрос с
+If-Modified-Since, и ответ 304 стоит только заголовков.
+
+Сравниваются два варианта сборки статики, каждый — collectstatic во
+временный каталог:
+
+- plain: StaticFilesStorage и django.views.static.serve, как при
+  раздаче статики без обработки (имена без хэша, без Cache-Control,
+  без сжатия);
+- pipeline: core.storage.CompressedManifestStaticFilesStorage и
+  core.views.serve_static (хэш в имени, кэш на год, .gz/.br).
+
+Байты — тело ответа плюс строка статуса и заголовки. Запуск из корня
+репозитория:
+
+    python benchmarks/static_bytes.py --reuse
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import tempfile
+from urllib.parse import urlsplit
+
+import generate_data
+
+VARIANTS = {
+    'plain': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    'pipeline': 'core.storage.CompressedManifestStaticFilesStorage',
+}
+
+ASSET_RE = re.compile(r'(?:href|src)="([^"]+)"')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    generate_data.add_arguments(parser)
+    parser.add_argument('--reuse', action='store_true',
+                        help='Не пересоздавать базу, если она есть.')
+    parser.add_argument('--accept-encoding', default='br, gzip')
+    parser.add_argument('--revisit-after', type=int, default=24 * 60 * 60,
+                        help='Через сколько секунд повторный визит.')
+    parser.add_argument('--output', help='Сохранить результаты в JSON.')
+    return parser.parse_args()
+
+
+def response_bytes(response):
+    """Размер ответа на проводе: статус, заголовки и тело."""
+    size = len(f'HTTP/1.1 {response.status_code} {response.reason_phrase}'
+               '\r\n\r\n')
+    for name, value in response.items():
+        size += len(f'{name}: {value}\r\n')
+    if response.streaming:
+        return size + sum(len(chunk) for chunk in response.streaming_content)
+    return size + len(response.content)
+
+
+def max_age(response):
+    match = re.search(r'max-age=(\d+)', response.get('Cache-Control', ''))
+    return int(match.group(1)) if match else 0
+
+
+def page_assets(html, static_url):
+    return list(dict.fromkeys(
+        urlsplit(url).path for url in ASSET_RE.findall(html)
+        if urlsplit(url).path.startswith(static_url)))
+
+
+def load(pages, serve, args):
+    """Холодная и тёплая загрузка страниц: байты и запросы статики."""
+    from django.conf import settings
+    from django.test import Client, RequestFactory
+
+    client = Client()
+    factory = RequestFactory()
+    browser = {}
+    totals = {mode: {'html_bytes': 0, 'static_bytes': 0,
+                     'static_requests': 0} for mode in ('cold', 'warm')}
+    for mode, elapsed in (('cold', 0), ('warm', args.revisit_after)):
+        for url in pages:
+            response = client.get(url)
+            totals[mode]['html_bytes'] += response_bytes(response)
+            for asset in page_assets(response.content.decode(),
+                                     settings.STATIC_URL):
+                cached = browser.get(asset)
+                if cached and cached['max_age'] > elapsed:
+                    continue
+                headers = {'HTTP_ACCEPT_ENCODING': args.accept_encoding}
+                if cached and cached['last_modified']:
+                    headers['HTTP_IF_MODIFIED_SINCE'] = (
+                        cached['last_modified'])
+                asset_response = serve(
+                    factory.get(asset, **headers),
+                    asset[len(settings.STATIC_URL):])
+                totals[mode]['static_requests'] += 1
+                totals[mode]['static_bytes'] += response_bytes(
+                    asset_response)
+                if asset_response.status_code == 200:
+                    browser[asset] = {
+                        'max_age': max_age(asset_response),
+                        'last_modified': asset_response.get('Last-Modified'),
+                    }
+    return totals
+
+
+def main():
+    args = parse_args()
+    fresh = not (args.reuse and os.path.exists(args.database))
+    generate_data.configure(args.database, fresh=fresh)
+    if fresh:
+        generate_data.generate(args)
+
+    from django.core.management import call_command
+    from django.test.utils import override_settings
+    from django.urls import reverse
+    from django.views.static import serve as django_serve
+
+    from core.views import serve_static
+    from posts.models import Post
+
+    post = Post.objects.exclude(comments_count=0).order_by('pk').first()
+    pages = [reverse('posts:index'),
+             reverse('posts:profile', args=[post.author.username]),
+             reverse('posts:post_detail', args=[post.pk])]
+    results = {}
+    for variant, storage in VARIANTS.items():
+        static_root = tempfile.mkdtemp()
+        try:
+            with override_settings(STATIC_ROOT=static_root,
+                                   STATICFILES_STORAGE=storage,
+                                   PAGE_CACHE_ENABLED=False):
+                call_command('collectstatic', interactive=False, verbosity=0)
+                if variant == 'plain':
+                    def serve(request, path):
+                        return django_serve(request, path, static_root)
+                else:
+                    serve = serve_static
+                results[variant] = totals = load(pages, serve, args)
+        finally:
+            shutil.rmtree(static_root, ignore_errors=True)
+        for mode, result in totals.items():
+            print(f'{variant:>8} {mode}: html {result["html_bytes"]:8} B, '
+                  f'static {result["static_bytes"]:8} B '
+                  f'in {result["static_requests"]:3} requests')
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'args': vars(args), 'pages': pages,
+                       'results': results}, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
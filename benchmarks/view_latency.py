@@ -0,0 +1,283 @@
+"""Latency and query counts of every posts view on a synthetic dataset.
+
+Для каждого адреса из posts.urls выполняется сценарий запросов через
+тестовый клиент Django: с холодным кэшем (кэш очищается перед каждым
+запросом) и с тёплым (после одного прогревочного запроса). Для каждого
+сценария записываются p50/p95/p99 времени ответа и число запросов к
+базе. Сценарии записи идут после чтения, чтобы сброс кэша главной не
+портил замеры страниц.
+
+Результаты сохраняются в JSON вместе с коммитом и параметрами данных;
+команда compare сравнивает два таких файла и завершается с кодом 1,
+если p95 вырос больше порога или запросов к базе стало больше.
+
+Запуск из корня репозитория:
+
+    python benchmarks/view_latency.py run --output before.json
+    python benchmarks/view_latency.py run --reuse --output after.json
+    python benchmarks/view_latency.py compare before.json after.json
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import generate_data
+
+ROOT_DIR = generate_data.ROOT_DIR
+MODES = ('cold', 'warm')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('run', help='Замерить сценарии.')
+    generate_data.add_arguments(run)
+    run.add_argument('--reuse', action='store_true',
+                     help='Не пересоздавать базу, если она уже есть; '
+                          'сценарии записи добавляют в неё посты.')
+    run.add_argument('--repeat', type=int, default=50,
+                     help='Запросов на сценарий в каждом режиме.')
+    run.add_argument('--scenarios', nargs='+',
+                     help='Замерить только эти сценарии.')
+    run.add_argument('--output', help='Сохранить результаты в JSON.')
+    compare = commands.add_parser('compare',
+                                  help='Сравнить два файла результатов.')
+    compare.add_argument('base')
+    compare.add_argument('head')
+    compare.add_argument('--threshold', type=float, default=20.0,
+                         help='Допустимый рост p95, %%.')
+    return parser.parse_args()
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+class Scenario:
+    """Запрос к одному адресу posts.urls.
+
+    setup вызывается перед каждым запросом вне замера, например чтобы
+    вернуть подписку, которую снимает сам сценарий.
+    """
+
+    def __init__(self, name, url_name, path, user=None, method='get',
+                 data=None, setup=None, write=False):
+        self.name = name
+        self.url_name = url_name
+        self.path = path
+        self.user = user
+        self.method = method
+        self.data = data
+        self.setup = setup
+        self.write = write
+
+    def request(self, client):
+        data = self.data() if callable(self.data) else self.data
+        return getattr(client, self.method)(self.path, data)
+
+
+def build_scenarios():
+    """Сценарии для самых нагруженных объектов сгенерированных данных."""
+    from django.urls import reverse
+    from posts.models import Follow, Group, Post, UserCounters
+    from posts.views import comments_page
+
+    author = (UserCounters.objects.select_related('user')
+              .order_by('-posts_count', 'pk').first().user)
+    reader = (UserCounters.objects.select_related('user')
+              .order_by('-following_count', 'pk').first().user)
+    group = Group.objects.order_by('-posts_count', 'pk').first()
+    post = Post.objects.order_by('-comments_count', 'pk').first()
+    own_post = author.posts.order_by('-pub_date').first()
+    query = post.text.split()[0]
+    comments_cursor = comments_page(post.pk).next_cursor or ''
+    followed = (Follow.objects.filter(user=reader)
+                .select_related('author').order_by('pk').first().author)
+    counter = iter(range(1, 10 ** 9))
+
+    def follow():
+        Follow.objects.get_or_create(user=reader, author=followed)
+
+    def unfollow():
+        Follow.objects.filter(user=reader, author=followed).delete()
+
+    return [
+        Scenario('index', 'index', reverse('posts:index')),
+        Scenario('index_page_10', 'index',
+                 reverse('posts:index') + '?page=10'),
+        Scenario('group_posts', 'group_posts',
+                 reverse('posts:group_posts', args=[group.slug])),
+        Scenario('profile', 'profile',
+                 reverse('posts:profile', args=[author.username])),
+        Scenario('profile_as_reader', 'profile',
+                 reverse('posts:profile', args=[author.username]),
+                 user=reader),
+        Scenario('post_detail', 'post_detail',
+                 reverse('posts:post_detail', args=[post.pk])),
+        Scenario('post_comments', 'post_comments',
+                 reverse('posts:post_comments', args=[post.pk]),
+                 data={'cursor': comments_cursor}),
+        Scenario('post_create_form', 'post_create',
+                 reverse('posts:post_create'), user=author),
+        Scenario('post_edit_form', 'post_edit',
+                 reverse('posts:post_edit', args=[own_post.pk]),
+                 user=author),
+        Scenario('follow_index', 'follow_index',
+                 reverse('posts:follow_index'), user=reader),
+        Scenario('search', 'search', reverse('posts:search'),
+                 data={'q': query}),
+        Scenario('post_create', 'post_create', reverse('posts:post_create'),
+                 user=author, method='post', write=True,
+                 data=lambda: {'text': f'Бенчмарк {next(counter)}'}),
+        Scenario('add_comment', 'add_comment',
+                 reverse('posts:add_comment', args=[post.pk]),
+                 user=reader, method='post', write=True,
+                 data=lambda: {'text': f'Комментарий {next(counter)}'}),
+        Scenario('profile_follow', 'profile_follow',
+                 reverse('posts:profile_follow', args=[followed.username]),
+                 user=reader, setup=unfollow, write=True),
+        Scenario('profile_unfollow', 'profile_unfollow',
+                 reverse('posts:profile_unfollow', args=[followed.username]),
+                 user=reader, setup=follow, write=True),
+    ]
+
+
+def check_coverage(scenarios):
+    """Проверяет, что у каждого адреса posts.urls есть сценарий."""
+    from posts.urls import urlpatterns
+
+    missing = ({pattern.name for pattern in urlpatterns}
+               - {scenario.url_name for scenario in scenarios})
+    if missing:
+        raise SystemExit(f'Нет сценариев для адресов: {sorted(missing)}')
+
+
+def measure(scenario, mode, repeat):
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    client = Client()
+    if scenario.user is not None:
+        client.force_login(scenario.user)
+    if mode == 'warm':
+        if scenario.setup:
+            scenario.setup()
+        scenario.request(client)
+    timings = []
+    queries = []
+    statuses = set()
+    for _ in range(repeat):
+        if scenario.setup:
+            scenario.setup()
+        if mode == 'cold':
+            cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = scenario.request(client)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(context.captured_queries))
+        statuses.add(response.status_code)
+    return {
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'queries': max(queries),
+        'status': sorted(statuses),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=ROOT_DIR, check=True,
+            capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    fresh = not (args.reuse and os.path.exists(args.database))
+    generate_data.configure(args.database, fresh=fresh)
+    if fresh:
+        generate_data.generate(args)
+
+    import django
+    from django.conf import settings
+
+    scenarios = build_scenarios()
+    check_coverage(scenarios)
+    if args.scenarios:
+        scenarios = [scenario for scenario in scenarios
+                     if scenario.name in args.scenarios]
+    scenarios.sort(key=lambda scenario: scenario.write)
+    results = {}
+    for scenario in scenarios:
+        results[scenario.name] = {
+            mode: measure(scenario, mode, args.repeat) for mode in MODES}
+        print(f'{scenario.name:20} ' + '  '.join(
+            f'{mode}: p50 {result["p50_ms"]:8.2f} ms '
+            f'p95 {result["p95_ms"]:8.2f} ms {result["queries"]:3} q'
+            for mode, result in results[scenario.name].items()))
+    report = {
+        'commit': git_commit(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'cache': settings.CACHES['default']['BACKEND'],
+        'args': {key: value for key, value in vars(args).items()
+                 if key not in ('command', 'output', 'scenarios')},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2, ensure_ascii=False)
+
+
+def compare(args):
+    with open(args.base) as base_file, open(args.head) as head_file:
+        base, head = json.load(base_file), json.load(head_file)
+    if base['args'] != head['args']:
+        print('Внимание: результаты сняты с разными параметрами данных')
+    regressions = 0
+    print(f'{base["commit"]} -> {head["commit"]}')
+    for name, modes in head['results'].items():
+        for mode, result in modes.items():
+            before = base['results'].get(name, {}).get(mode)
+            if before is None:
+                print(f'{name:20} {mode:5} новый сценарий')
+                continue
+            change = ((result['p95_ms'] - before['p95_ms'])
+                      / before['p95_ms'] * 100 if before['p95_ms'] else 0)
+            slower = change > args.threshold
+            more_queries = result['queries'] > before['queries']
+            regressions += slower or more_queries
+            mark = ' РЕГРЕССИЯ' if slower or more_queries else ''
+            print(f'{name:20} {mode:5} p95 {before["p95_ms"]:8.2f} -> '
+                  f'{result["p95_ms"]:8.2f} ms ({change:+6.1f}%)  '
+                  f'queries {before["queries"]} -> '
+                  f'{result["queries"]}{mark}')
+    return 1 if regressions else 0
+
+
+def main():
+    args = parse_args()
+    if args.command == 'compare':
+        sys.exit(compare(args))
+    run(args)
+
+
+if __name__ == '__main__':
+    main()
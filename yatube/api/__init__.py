@@ -0,0 +1 @@
+"""init.py приложения Api."""
@@ -0,0 +1,10 @@
+"""Write your Api app settings here."""
+
+from django.apps import AppConfig
+
+
+class ApiConfig(AppConfig):
+    """Api app config."""
+
+    name = 'api'
+    verbose_name: str = 'API'
@@ -0,0 +1,117 @@
+"""Write your Api app tests here."""
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    """Тесты JSON API лент."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.posts = [Post.objects.create(text=f'Пост {number}',
+                                         author=cls.author,
+                                         group=cls.group if number % 2
+                                         else None)
+                     for number in range(12)]
+        cls.comment = Comment.objects.create(post=cls.posts[0],
+                                             author=cls.author,
+                                             text='Комментарий')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_posts_page_and_cursor(self):
+        """Лента отдаётся страницами по курсору."""
+        response = self.client.get(reverse('api:posts'))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([post['id'] for post in data['results']],
+                         [post.pk for post in self.posts[:-11:-1]])
+        self.assertEqual(data['results'][0]['author'], 'author')
+        self.assertEqual(data['results'][0]['group'], 'group')
+        self.assertIsNone(data['previous'])
+        data = self.client.get(data['next']).json()
+        self.assertEqual([post['id'] for post in data['results']],
+                         [self.posts[1].pk, self.posts[0].pk])
+        self.assertIsNone(data['next'])
+
+    def test_filtered_feeds(self):
+        """Посты группы, автора и комментарии поста."""
+        data = self.client.get(
+            reverse('api:group_posts', args=['group'])).json()
+        self.assertEqual(len(data['results']), 6)
+        data = self.client.get(
+            reverse('api:profile_posts', args=['author'])).json()
+        self.assertEqual(len(data['results']), 10)
+        data = self.client.get(
+            reverse('api:post_comments', args=[self.posts[0].pk])).json()
+        self.assertEqual(data['results'], [{
+            'id': self.comment.pk, 'post': self.posts[0].pk,
+            'author': 'author', 'text': 'Комментарий',
+            'created': self.comment.created.isoformat()}])
+
+    def test_missing_objects(self):
+        """Несуществующие группа, автор и пост — 404."""
+        for url in (reverse('api:group_posts', args=['missing']),
+                    reverse('api:profile_posts', args=['missing']),
+                    reverse('api:post_comments', args=[10 ** 6])):
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+
+    def test_fields_projection(self):
+        """?fields= оставляет в ответе только выбранные поля."""
+        response = self.client.get(reverse('api:posts'),
+                                   {'fields': 'id,text'})
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'text'})
+        response = self.client.get(reverse('api:posts'),
+                                   {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_cursor(self):
+        """Испорченный курсор — 400."""
+        response = self.client.get(reverse('api:posts'),
+                                   {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_not_modified(self):
+        """Повторный запрос с ETag — 304 за один запрос к базе."""
+        url = reverse('api:posts')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_etag_changes(self):
+        """ETag меняется при изменении поста, счётчика и автора."""
+        url = reverse('api:posts')
+        etags = [self.client.get(url)['ETag']]
+        post = self.posts[-1]
+        post.text = 'Новый текст'
+        post.save()
+        etags.append(self.client.get(url)['ETag'])
+        Comment.objects.create(post=post, author=self.author, text='Ещё')
+        etags.append(self.client.get(url)['ETag'])
+        self.author.first_name = 'Имя'
+        self.author.save()
+        etags.append(self.client.get(url)['ETag'])
+        etags.append(self.client.get(url, {'fields': 'id'})['ETag'])
+        self.assertEqual(len(set(etags)), len(etags))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[0])
+        self.assertEqual(response.status_code, 200)
+
+    def test_read_only(self):
+        """API принимает только GET."""
+        response = self.client.post(reverse('api:posts'))
+        self.assertEqual(response.status_code, 405)
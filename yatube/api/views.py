@@ -0,0 +1,221 @@
+"""Read-only JSON API of yatube.
+
+Ленты постов и комментарии отдаются страницами по курсору (тот же
+CursorPaginator, что и в HTML-лентах). Параметр ?fields= выбирает поля
+ответа, и из базы читаются только они.
+
+Ответ собирается в два шага. Сначала читаются ключи страницы: id, даты
+и счётчики строк без JOIN. Из них и отметок версий авторов и групп в
+кэше считается сильный ETag. Если он совпал с If-None-Match, клиент
+получает 304 без второго запроса и сериализации. Иначе строки
+страницы загружаются по id и сериализуются.
+"""
+
+import hashlib
+import json
+
+from django.http import Http404, HttpResponseNotModified, JsonResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, urlencode
+from django.views.decorators.http import require_GET
+
+from posts.cache import get_versions
+from posts.feeds import POSTS_PER_PAGE
+from posts.models import Comment, Group, Post, User
+from posts.pagination import CursorPaginator, InvalidCursor
+
+
+def _image_url(post):
+    return post.image.url if post.image else None
+
+
+class Resource:
+    """Описание выдачи модели: поля ответа и как их читать из базы.
+
+    fields — имя поля ответа, поля модели для only() и функция значения.
+    key_fields — поля модели, от которых зависит ответ; они читаются
+    вместе с ключами страницы и входят в ETag. versions — поля ответа,
+    зависящие от связанных объектов, и вид их отметки версии в кэше.
+    """
+
+    def __init__(self, model, ordering, fields, key_fields, versions):
+        self.model = model
+        self.ordering = ordering
+        self.fields = fields
+        self.key_fields = key_fields
+        self.versions = versions
+
+    def parse_fields(self, value):
+        """Поля ответа из ?fields=; все поля, если параметра нет."""
+        if not value:
+            return list(self.fields)
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown or not names:
+            raise ValueError(
+                'Неизвестные поля: {}. Доступны: {}.'.format(
+                    ', '.join(unknown), ', '.join(self.fields)))
+        return list(dict.fromkeys(names))
+
+    def keys(self, queryset, names):
+        """Выборка ключей страницы: поля сортировки и поля ETag."""
+        only = {name.lstrip('-') for name in self.ordering}
+        for name in names:
+            only.update(self.key_fields.get(name, ()))
+        return queryset.only(*only)
+
+    def load(self, pks, names):
+        """Строки страницы по id в порядке pks, только нужные поля."""
+        only = {self.model._meta.pk.name}
+        related = set()
+        for name in names:
+            for field in self.fields[name][0]:
+                only.add(field)
+                if '__' in field:
+                    related.add(field.split('__')[0])
+        queryset = self.model.objects.filter(pk__in=pks).only(*only)
+        if related:
+            queryset = queryset.select_related(*related)
+        rows = queryset.in_bulk()
+        return [rows[pk] for pk in pks]
+
+    def serialize(self, obj, names):
+        return {name: self.fields[name][1](obj) for name in names}
+
+    def etag(self, page, names, cursor):
+        """Сильный ETag страницы по ключам строк и версиям связей."""
+        rows = [[obj.pk] + [str(getattr(obj, field))
+                            for name in names
+                            for field in self.key_fields.get(name, ())]
+                for obj in page]
+        objects = [(kind, getattr(obj, attname))
+                   for obj in page
+                   for name, (kind, attname) in self.versions.items()
+                   if name in names and getattr(obj, attname)]
+        payload = json.dumps(
+            [names, cursor, rows, get_versions(*objects) if objects else [],
+             page.has_next(), page.has_previous()],
+            separators=(',', ':'))
+        return '"{}"'.format(hashlib.sha256(payload.encode()).hexdigest())
+
+
+POSTS = Resource(
+    Post, ordering=('-pub_date', '-id'),
+    fields={
+        'id': ((), lambda post: post.pk),
+        'text': (('text',), lambda post: post.text),
+        'pub_date': (('pub_date',), lambda post: post.pub_date.isoformat()),
+        'updated_at': (('updated_at',),
+                       lambda post: post.updated_at.isoformat()),
+        'author': (('author__username',),
+                   lambda post: post.author.username),
+        'group': (('group__slug',),
+                  lambda post: post.group.slug if post.group_id else None),
+        'image': (('image',), _image_url),
+        'comments_count': (('comments_count',),
+                           lambda post: post.comments_count),
+    },
+    key_fields={
+        'text': ('updated_at',),
+        'updated_at': ('updated_at',),
+        'author': ('author_id',),
+        'group': ('group_id',),
+        'image': ('updated_at',),
+        'comments_count': ('comments_count',),
+    },
+    versions={'author': ('user', 'author_id'),
+              'group': ('group', 'group_id')},
+)
+
+COMMENTS = Resource(
+    Comment, ordering=('created', 'id'),
+    fields={
+        'id': ((), lambda comment: comment.pk),
+        'post': (('post',), lambda comment: comment.post_id),
+        'author': (('author__username',),
+                   lambda comment: comment.author.username),
+        'text': (('text',), lambda comment: comment.text),
+        'created': (('created',),
+                    lambda comment: comment.created.isoformat()),
+    },
+    key_fields={'author': ('author_id',)},
+    versions={'author': ('user', 'author_id')},
+)
+
+
+def error(message, status=400):
+    return JsonResponse({'detail': message}, status=status,
+                        json_dumps_params={'ensure_ascii': False})
+
+
+def page_response(request, resource, queryset, exists=None):
+    """Страница выдачи resource с ETag и ответом 304.
+
+    exists проверяет, что родительский объект есть, если страница
+    пустая; иначе ответ 404.
+    """
+    try:
+        names = resource.parse_fields(request.GET.get('fields'))
+    except ValueError as exc:
+        return error(str(exc))
+    cursor = request.GET.get('cursor') or None
+    paginator = CursorPaginator(resource.keys(queryset, names),
+                                POSTS_PER_PAGE, ordering=resource.ordering)
+    try:
+        page = paginator.page(cursor)
+    except InvalidCursor:
+        return error('Неверный курсор.')
+    if not page and exists is not None and not exists():
+        raise Http404
+    etag = resource.etag(page, names, cursor)
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+    else:
+        rows = resource.load([obj.pk for obj in page], names)
+        response = JsonResponse(
+            {'results': [resource.serialize(obj, names) for obj in rows],
+             'next': page_link(request, page.next_cursor),
+             'previous': page_link(request, page.previous_cursor)},
+            json_dumps_params={'ensure_ascii': False})
+    response['ETag'] = etag
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def page_link(request, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return request.build_absolute_uri(
+        request.path + '?' + urlencode(sorted(query.items())))
+
+
+@require_GET
+def posts(request):
+    """Лента всех постов."""
+    return page_response(request, POSTS, Post.objects.all())
+
+
+@require_GET
+def group_posts(request, slug):
+    """Посты группы."""
+    return page_response(
+        request, POSTS, Post.objects.filter(group__slug=slug),
+        exists=Group.objects.filter(slug=slug).exists)
+
+
+@require_GET
+def profile_posts(request, username):
+    """Посты автора."""
+    return page_response(
+        request, POSTS, Post.objects.filter(author__username=username),
+        exists=User.objects.filter(username=username).exists)
+
+
+@require_GET
+def post_comments(request, post_id):
+    """Комментарии поста по порядку создания."""
+    return page_response(
+        request, COMMENTS, Comment.objects.filter(post_id=post_id),
+        exists=Post.objects.filter(pk=post_id).exists)
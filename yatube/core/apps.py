@@ -7,3 +7,7 @@ class CoreConfig(AppConfig):
     """Core app config."""
 
     name = 'core'
+
+    def ready(self):
+        """Подключает настройку соединений с базой."""
+        from . import db  # noqa: F401
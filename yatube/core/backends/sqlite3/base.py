@@ -0,0 +1,40 @@
+"""SQLite database backend with immediate write transactions.
+
+Транзакция, которая сначала читает, а потом пишет, при BEGIN по
+умолчанию (DEFERRED) получает блокировку записи только на первой
+записи. Если в это время пишет другой процесс, SQLite сразу отвечает
+«database is locked», не дожидаясь busy timeout. Поэтому транзакции
+соединения для записи начинаются с BEGIN IMMEDIATE: блокировка берётся
+в начале транзакции, и писатели по очереди ждут друг друга не дольше
+OPTIONS['timeout'].
+
+Поэтому atomic() на этом соединении держит единственную блокировку
+записи SQLite до конца блока, даже если блок только читает: код,
+который не пишет (например, отрисовка формы на GET), не должен
+выполняться внутри atomic().
+
+Соединение с READ_ONLY=True в настройках базы только читает: на нём
+включается PRAGMA query_only, а транзакции остаются DEFERRED.
+"""
+
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """Соединение SQLite с BEGIN IMMEDIATE для записи."""
+
+    @property
+    def read_only(self):
+        return bool(self.settings_dict.get('READ_ONLY'))
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        if self.read_only:
+            conn.execute('PRAGMA query_only = 1')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.read_only:
+            super()._start_transaction_under_autocommit()
+        else:
+            self.cursor().execute('BEGIN IMMEDIATE')
@@ -0,0 +1,12 @@
+"""Cache helpers shared by yatube apps."""
+
+
+def namespaced(app):
+    """Возвращает функцию ключей кэша с пространством имён приложения.
+
+    Ключи разных приложений не пересекаются в общем кэше, а префикс
+    KEY_PREFIX из настроек отделяет друг от друга развёртывания.
+    """
+    def make_key(*parts):
+        return ':'.join([app, *(str(part) for part in parts)])
+    return make_key
@@ -0,0 +1,309 @@
+"""Cache backend speaking the Redis protocol (RESP2).
+
+Бэкенд не требует сторонних библиотек: он открывает одно TCP-соединение
+на экземпляр кэша (Django создаёт экземпляры отдельно для каждого
+потока) и использует только базовые команды, которые поддерживает и
+локальная замена Redis из core.cache.redis_stub.
+
+Соединение не закрывается в конце запроса (Django вызывает close() на
+каждом request_finished): иначе каждый запрос платил бы за новое
+соединение и AUTH/SELECT. Прежнее поведение включает
+OPTIONS['CLOSE_CONNECTION'] = True.
+
+Оборвавшийся пакет команд отправляется повторно, только если
+команды точно не выполнены (соединение разорвалось при подключении или
+отправке) или их повтор ничего не меняет. Иначе, например для incr,
+повтор мог бы увеличить счётчик дважды, и ошибка передаётся дальше.
+
+LOCATION: redis://[:password@]host[:port][/db]
+"""
+
+import pickle
+import select
+import socket
+from urllib.parse import unquote, urlparse
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+DEFAULT_PORT = 6379
+
+# Команды, повтор которых после неизвестного исхода безопасен. SET
+# с NX сюда не входит: повтор ответил бы «ключ уже есть».
+IDEMPOTENT_COMMANDS = frozenset((
+    'GET', 'MGET', 'EXISTS', 'SET', 'DEL', 'PEXPIRE', 'PERSIST',
+    'FLUSHDB', 'PING',
+))
+
+# incr без создания ключа: INCRBY создал бы отсутствующий ключ, а
+# удалять его потом отдельной командой нельзя — между ними ключ мог
+# добавить другой процесс.
+INCR_EXISTING_SCRIPT = (
+    "if redis.call('EXISTS', KEYS[1]) == 0 then return false end "
+    "return redis.call('INCRBY', KEYS[1], ARGV[1])"
+)
+
+CONNECTION_ERRORS = (ConnectionError, socket.timeout, OSError)
+
+
+class RedisError(Exception):
+    """Ошибка, которую вернул сервер Redis."""
+
+
+class RespConnection:
+    """Соединение с сервером Redis по протоколу RESP2."""
+
+    def __init__(self, host, port, db=0, password=None, socket_timeout=5):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.socket_timeout = socket_timeout
+        self._socket = None
+        self._file = None
+
+    def connect(self):
+        self._socket = socket.create_connection(
+            (self.host, self.port), timeout=self.socket_timeout)
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._file = self._socket.makefile('rb')
+        if self.password:
+            self._call([('AUTH', self.password)])
+        if self.db:
+            self._call([('SELECT', self.db)])
+
+    def close(self):
+        if self._socket is not None:
+            self._file.close()
+            self._socket.close()
+        self._socket = None
+        self._file = None
+
+    @staticmethod
+    def _encode(command):
+        parts = [b'*%d\r\n' % len(command)]
+        for arg in command:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        return b''.join(parts)
+
+    def _read(self):
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError('Соединение с Redis закрыто')
+        prefix, payload = line[:1], line[1:-2]
+        if prefix == b'+':
+            return payload
+        if prefix == b'-':
+            return RedisError(payload.decode())
+        if prefix == b':':
+            return int(payload)
+        if prefix == b'$':
+            length = int(payload)
+            if length < 0:
+                return None
+            return self._file.read(length + 2)[:-2]
+        if prefix == b'*':
+            length = int(payload)
+            if length < 0:
+                return None
+            return [self._read() for _ in range(length)]
+        raise RedisError(f'Неизвестный ответ Redis: {line!r}')
+
+    def _call(self, commands):
+        if self._socket is None:
+            self.connect()
+        self._send(commands)
+        return self._replies(commands)
+
+    def _send(self, commands):
+        self._socket.sendall(b''.join(map(self._encode, commands)))
+
+    def _replies(self, commands):
+        replies = [self._read() for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+    @staticmethod
+    def _idempotent(commands):
+        for command in commands:
+            name = str(command[0]).upper()
+            if name not in IDEMPOTENT_COMMANDS:
+                return False
+            if name == 'SET' and any(str(arg).upper() == 'NX'
+                                     for arg in command[3:]):
+                return False
+        return True
+
+    def _stale(self):
+        # Между запросами сервер ничего не присылает: если из сокета
+        # можно читать, это конец потока от закрывшего его сервера.
+        readable, _, _ = select.select([self._socket], [], [], 0)
+        return bool(readable)
+
+    def pipeline(self, *commands):
+        """Отправляет команды одним пакетом и возвращает ответы.
+
+        Соединение, которое сервер закрыл, пока оно простаивало,
+        открывается заново до отправки команд.
+        """
+        if self._socket is not None and self._stale():
+            self.close()
+        reused = self._socket is not None
+        try:
+            if not reused:
+                self.connect()
+            self._send(commands)
+        except CONNECTION_ERRORS:
+            self.close()
+            if not reused:
+                raise
+            # Старое соединение оборвано до отправки: команды не
+            # выполнялись.
+            return self._call(commands)
+        try:
+            return self._replies(commands)
+        except CONNECTION_ERRORS:
+            # Команды могли выполниться: повторяются только безопасные.
+            self.close()
+            if not (reused and self._idempotent(commands)):
+                raise
+            return self._call(commands)
+
+    def execute(self, *command):
+        return self.pipeline(command)[0]
+
+
+class RedisCache(BaseCache):
+    """Кэш в Redis или совместимом по протоколу сервере."""
+
+    def __init__(self, server, params):
+        super().__init__(params)
+        url = urlparse(server)
+        options = params.get('OPTIONS', {})
+        self._close_connection = options.get('CLOSE_CONNECTION', False)
+        self._connection = RespConnection(
+            host=url.hostname or '127.0.0.1',
+            port=url.port or DEFAULT_PORT,
+            db=int(url.path.lstrip('/') or 0),
+            password=unquote(url.password) if url.password else None,
+            socket_timeout=options.get('SOCKET_TIMEOUT', 5),
+        )
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _expiry(self, timeout):
+        """Аргументы PX для SET; None — значение уже истекло."""
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return []
+        milliseconds = int(timeout * 1000)
+        if milliseconds <= 0:
+            return None
+        return ['PX', milliseconds]
+
+    @staticmethod
+    def _dump(value):
+        # Целые числа хранятся как есть, чтобы работал атомарный INCRBY.
+        if isinstance(value, int) and not isinstance(value, bool):
+            return str(value).encode()
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _load(data):
+        if data is None:
+            return None
+        try:
+            return int(data)
+        except ValueError:
+            return pickle.loads(data)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        expiry = self._expiry(timeout)
+        if expiry is None:
+            return False
+        reply = self._connection.execute(
+            'SET', key, self._dump(value), 'NX', *expiry)
+        return reply is not None
+
+    def get(self, key, default=None, version=None):
+        value = self._load(
+            self._connection.execute('GET', self._key(key, version)))
+        return default if value is None else value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        expiry = self._expiry(timeout)
+        if expiry is None:
+            self._connection.execute('DEL', key)
+        else:
+            self._connection.execute('SET', key, self._dump(value), *expiry)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        expiry = self._expiry(timeout)
+        if expiry is None:
+            return bool(self._connection.execute('DEL', key))
+        if not expiry:
+            exists, _ = self._connection.pipeline(
+                ('EXISTS', key), ('PERSIST', key))
+            return bool(exists)
+        return bool(self._connection.execute('PEXPIRE', key, expiry[1]))
+
+    def delete(self, key, version=None):
+        self._connection.execute('DEL', self._key(key, version))
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = self._connection.execute(
+            'MGET', *(self._key(key, version) for key in keys))
+        return {key: self._load(value)
+                for key, value in zip(keys, values) if value is not None}
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expiry = self._expiry(timeout)
+        if not data:
+            return []
+        if expiry is None:
+            self.delete_many(data, version=version)
+            return []
+        self._connection.pipeline(*(
+            ('SET', self._key(key, version), self._dump(value), *expiry)
+            for key, value in data.items()))
+        return []
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            self._connection.execute('DEL', *keys)
+
+    def has_key(self, key, version=None):
+        return bool(
+            self._connection.execute('EXISTS', self._key(key, version)))
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        try:
+            value = self._connection.execute(
+                'EVAL', INCR_EXISTING_SCRIPT, 1, key, delta)
+        except RedisError:
+            raise ValueError(f"Key '{key}' is not an integer")
+        if value is None:
+            raise ValueError(f"Key '{key}' not found")
+        return value
+
+    def clear(self):
+        self._connection.execute('FLUSHDB')
+
+    def close(self, **kwargs):
+        if self._close_connection:
+            self._connection.close()
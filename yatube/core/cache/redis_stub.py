@@ -0,0 +1,234 @@
+"""Local stand-in for a Redis server.
+
+Сервер в памяти понимает протокол RESP2 и подмножество команд, которым
+пользуется core.cache.redis.RedisCache. Он нужен для тестов и
+бенчмарков там, где настоящего Redis нет. Lua здесь не выполняется:
+EVAL понимает только скрипты бэкенда, для них есть реализации на
+Python.
+
+    python -m core.cache.redis_stub --port 6379
+"""
+
+import argparse
+import socketserver
+import threading
+import time
+
+from .redis import INCR_EXISTING_SCRIPT
+
+
+class StubError(Exception):
+    """Ошибка команды, которая уходит клиенту ответом «-ERR»."""
+
+
+def encode(reply):
+    if reply is None:
+        return b'$-1\r\n'
+    if isinstance(reply, StubError):
+        return b'-ERR %s\r\n' % str(reply).encode()
+    if isinstance(reply, bool):
+        reply = int(reply)
+    if isinstance(reply, int):
+        return b':%d\r\n' % reply
+    if isinstance(reply, str):
+        return b'+%s\r\n' % reply.encode()
+    if isinstance(reply, list):
+        return b'*%d\r\n' % len(reply) + b''.join(map(encode, reply))
+    return b'$%d\r\n%s\r\n' % (len(reply), reply)
+
+
+class Storage:
+    """Словарь значений со сроками жизни, общий для всех соединений."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.data = {}
+
+    def _alive(self, key):
+        value = self.data.get(key)
+        if value is not None and value[1] is not None:
+            if value[1] <= time.monotonic():
+                del self.data[key]
+                return None
+        return value
+
+    def get(self, key):
+        value = self._alive(key)
+        return None if value is None else value[0]
+
+    def cmd_ping(self):
+        return 'PONG'
+
+    def cmd_select(self, db):
+        return 'OK'
+
+    def cmd_auth(self, password):
+        return 'OK'
+
+    def cmd_get(self, key):
+        return self.get(key)
+
+    def cmd_mget(self, *keys):
+        return [self.get(key) for key in keys]
+
+    def cmd_set(self, key, value, *options):
+        options = [option.upper() for option in options]
+        expire_at = None
+        if b'PX' in options:
+            milliseconds = int(options[options.index(b'PX') + 1])
+            expire_at = time.monotonic() + milliseconds / 1000
+        if b'EX' in options:
+            seconds = int(options[options.index(b'EX') + 1])
+            expire_at = time.monotonic() + seconds
+        if b'NX' in options and self._alive(key) is not None:
+            return None
+        self.data[key] = (value, expire_at)
+        return 'OK'
+
+    def cmd_del(self, *keys):
+        return sum(self.data.pop(key, None) is not None
+                   for key in keys if self._alive(key) is not None)
+
+    def cmd_exists(self, *keys):
+        return sum(self._alive(key) is not None for key in keys)
+
+    def cmd_incrby(self, key, delta):
+        value = self._alive(key)
+        current, expire_at = value if value is not None else (b'0', None)
+        try:
+            current = int(current) + int(delta)
+        except ValueError:
+            raise StubError('value is not an integer or out of range')
+        self.data[key] = (str(current).encode(), expire_at)
+        return current
+
+    def cmd_incr(self, key):
+        return self.cmd_incrby(key, 1)
+
+    def cmd_pexpire(self, key, milliseconds):
+        value = self._alive(key)
+        if value is None:
+            return 0
+        self.data[key] = (value[0],
+                          time.monotonic() + int(milliseconds) / 1000)
+        return 1
+
+    def cmd_persist(self, key):
+        value = self._alive(key)
+        if value is None or value[1] is None:
+            return 0
+        self.data[key] = (value[0], None)
+        return 1
+
+    def cmd_eval(self, script, numkeys, *args):
+        keys, argv = args[:int(numkeys)], args[int(numkeys):]
+        if script.decode() == INCR_EXISTING_SCRIPT:
+            if self._alive(keys[0]) is None:
+                return None
+            return self.cmd_incrby(keys[0], argv[0])
+        raise StubError('only the scripts of core.cache.redis are supported')
+
+    def cmd_flushdb(self):
+        self.data.clear()
+        return 'OK'
+
+    def execute(self, command):
+        name, *args = command
+        handler = getattr(self, 'cmd_' + name.decode().lower(), None)
+        if handler is None:
+            return StubError(f'unknown command {name.decode()!r}')
+        try:
+            return handler(*args)
+        except StubError as error:
+            return error
+        except (TypeError, ValueError, IndexError):
+            return StubError(f'syntax error in {name.decode()!r}')
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    """Обслуживает одно клиентское соединение."""
+
+    # Ответы на конвейер команд пишутся по одному; без TCP_NODELAY
+    # каждый следующий ждал бы подтверждения предыдущего.
+    disable_nagle_algorithm = True
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            return line.split()
+        command = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            command.append(self.rfile.read(length + 2)[:-2])
+        return command
+
+    def handle(self):
+        storage = self.server.storage
+        queued = None
+        while True:
+            command = self.read_command()
+            if command is None:
+                return
+            if not command:
+                continue
+            name = command[0].upper()
+            if name == b'MULTI':
+                queued = []
+                reply = 'OK'
+            elif name == b'EXEC' and queued is not None:
+                with storage.lock:
+                    reply = [storage.execute(queued_command)
+                             for queued_command in queued]
+                queued = None
+            elif queued is not None:
+                queued.append(command)
+                reply = 'QUEUED'
+            else:
+                with storage.lock:
+                    reply = storage.execute(command)
+            self.wfile.write(encode(reply))
+
+
+class RedisStubServer(socketserver.ThreadingTCPServer):
+    """Многопоточный TCP-сервер с общим хранилищем."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0)):
+        super().__init__(address, RespHandler)
+        self.storage = Storage()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'redis://{host}:{port}/0'
+
+    def start(self):
+        """Запускает сервер в фоновом потоке."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6379)
+    args = parser.parse_args()
+    with RedisStubServer((args.host, args.port)) as server:
+        print(f'Listening on {server.url}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
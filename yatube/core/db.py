@@ -0,0 +1,44 @@
+"""Database connection setup of yatube.
+
+Каждое новое соединение SQLite получает PRAGMA из SQLITE_PRAGMAS: WAL,
+чтобы читатели не ждали писателя, synchronous=NORMAL, mmap_size и
+cache_size. ReadReplicaRouter отправляет чтения в соединение только
+для чтения, а запись — в соединение default; внутри транзакции на
+default чтения идут туда же, чтобы видеть её незакоммиченные записи.
+"""
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+WRITE_DATABASE = 'default'
+READ_DATABASE = 'replica'
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """Выполняет SQLITE_PRAGMAS на новом соединении SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+class ReadReplicaRouter:
+    """Чтения — в базу replica, запись и миграции — в default."""
+
+    def db_for_read(self, model, **hints):
+        if connections[WRITE_DATABASE].in_atomic_block:
+            return WRITE_DATABASE
+        return READ_DATABASE
+
+    def db_for_write(self, model, **hints):
+        return WRITE_DATABASE
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == WRITE_DATABASE
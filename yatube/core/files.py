@@ -0,0 +1,131 @@
+"""File responses for media: front server delegation and byte ranges.
+
+Картинки постов и миниатюры не должны занимать воркер Django на всё
+время передачи. Поэтому view проверяет доступ и отдаёт файл одним из
+способов (настройка MEDIA_SERVE):
+
+- accel — пустой ответ с X-Accel-Redirect: файл из internal-location
+  отдаёт nginx;
+- sendfile — пустой ответ с X-Sendfile для Apache (mod_xsendfile) или
+  lighttpd;
+- python — FileResponse. WSGI-сервер с wsgi.file_wrapper (gunicorn,
+  uWSGI) передаёт файл через os.sendfile, не читая его в Python, в том
+  числе и часть файла по заголовку Range.
+
+В режиме python поддерживаются Range (один диапазон), If-Range и
+If-Modified-Since.
+"""
+
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.http import (FileResponse, HttpResponse,
+                         HttpResponseNotModified)
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.static import was_modified_since
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeFile:
+    """Файл, из которого читается не больше length байт с offset.
+
+    fileno() и позиция в файле остаются у открытого файла, поэтому
+    wsgi.file_wrapper с sendfile отправляет ровно Content-Length байт
+    с текущей позиции.
+    """
+
+    def __init__(self, file, offset, length):
+        self.file = file
+        self.file.seek(offset)
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """(начало, длина) из заголовка Range для файла size байт.
+
+    None — заголовка нет или он не поддерживается (несколько
+    диапазонов): отдаётся весь файл. ValueError — диапазон вне файла.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # Суффикс: последние end байт.
+        length = min(int(end), size)
+        if not length:
+            raise ValueError(header)
+        return size - length, length
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, end - start + 1
+
+
+def content_type(path):
+    return mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+
+def file_response(request, fullpath):
+    """Ответ с файлом fullpath: 200, 206, 304 или 416."""
+    stat = os.stat(fullpath)
+    last_modified = http_date(stat.st_mtime)
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'),
+                              stat.st_mtime, stat.st_size):
+        response = HttpResponseNotModified()
+        response['Last-Modified'] = last_modified
+        return response
+    byte_range = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and parse_http_date_safe(if_range) != int(stat.st_mtime):
+        # Файл изменился с тех пор, как клиент получил его начало.
+        byte_range = None
+    try:
+        byte_range = parse_range(byte_range, stat.st_size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+    file = open(fullpath, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type(fullpath))
+    else:
+        start, length = byte_range
+        response = FileResponse(RangeFile(file, start, length),
+                                status=206,
+                                content_type=content_type(fullpath))
+        response['Content-Length'] = str(length)
+        response['Content-Range'] = (
+            f'bytes {start}-{start + length - 1}/{stat.st_size}')
+    response['Last-Modified'] = last_modified
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def delegated_response(mode, path, fullpath, accel_prefix):
+    """Пустой ответ, по которому файл отдаёт фронтовой сервер."""
+    response = HttpResponse(content_type=content_type(fullpath))
+    if mode == 'accel':
+        response['X-Accel-Redirect'] = quote(accel_prefix + path)
+    else:
+        response['X-Sendfile'] = fullpath
+    return response
@@ -0,0 +1,283 @@
+"""Per-request metrics of yatube.
+
+RequestMetricsMiddleware замеряет для каждого запроса имя view, общее
+время, число и время запросов к базе, попадания и промахи кэша и время
+отрисовки шаблонов. Запросы к базе считаются через execute_wrapper,
+обращения к кэшу — обёрткой над get/get_many экземпляров кэша, шаблоны —
+бэкендом DjangoTemplates этого модуля. Всё это работает без DEBUG.
+
+Метрики отдаются заголовком Server-Timing, строками JSON в логгер
+core.metrics (выборочно с долей METRICS_SAMPLE_RATE и всегда для
+запросов медленнее METRICS_SLOW_REQUEST_MS) и сводкой по view за
+последние METRICS_WINDOW запросов процесса. Запросы к базе медленнее
+METRICS_SLOW_QUERY_MS пишутся в логгер core.metrics.sql.
+"""
+
+import json
+import logging
+import math
+import random
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache
+from django.db import connections
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+logger = logging.getLogger(__name__)
+sql_logger = logging.getLogger(__name__ + '.sql')
+
+_current = ContextVar('request_metrics', default=None)
+_missing = object()
+
+
+class RequestMetrics:
+    """Метрики одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view = None
+        self.status = None
+        self.total_ms = 0.0
+        self.queries = 0
+        self.db_ms = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_ms = 0.0
+        self.template_depth = 0
+
+    def finish(self, request, response):
+        self.total_ms = (time.perf_counter() - self.started) * 1000
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            self.view = match.view_name
+        self.status = response.status_code
+
+    def as_dict(self):
+        return {
+            'view': self.view,
+            'status': self.status,
+            'total_ms': round(self.total_ms, 3),
+            'queries': self.queries,
+            'db_ms': round(self.db_ms, 3),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'template_ms': round(self.template_ms, 3),
+        }
+
+    def server_timing(self):
+        """Значение заголовка Server-Timing."""
+        return ', '.join([
+            f'db;dur={self.db_ms:.1f};desc="{self.queries} queries"',
+            f'cache;desc="{self.cache_hits} hits {self.cache_misses} misses"',
+            f'tpl;dur={self.template_ms:.1f}',
+            f'total;dur={self.total_ms:.1f}',
+        ])
+
+
+def current():
+    """Метрики текущего запроса; None вне RequestMetricsMiddleware."""
+    return _current.get()
+
+
+def _execute_wrapper(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = (time.perf_counter() - started) * 1000
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.queries += 1
+            metrics.db_ms += duration
+        if duration >= settings.METRICS_SLOW_QUERY_MS:
+            sql_logger.warning(json.dumps({
+                'view': metrics and metrics.view,
+                'duration_ms': round(duration, 3),
+                'sql': sql[:2000],
+            }, ensure_ascii=False))
+
+
+def _count_cache(hits, misses):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.cache_hits += hits
+        metrics.cache_misses += misses
+
+
+def _instrument_cache(cache):
+    """Оборачивает get и get_many экземпляра кэша подсчётом попаданий.
+
+    get_many базового класса вызывает get для каждого ключа, поэтому
+    он оборачивается только там, где переопределён. Экземпляры кэша у
+    каждого потока свои, так что флаг вложенного вызова не разделяется
+    между потоками.
+    """
+    get = cache.get
+    nested = [False]
+
+    def instrumented_get(key, default=None, version=None):
+        nested[0] = True
+        try:
+            value = get(key, _missing, version=version)
+        finally:
+            nested[0] = False
+        if value is _missing:
+            _count_cache(0, 1)
+            return default
+        _count_cache(1, 0)
+        return value
+
+    cache.get = instrumented_get
+    if type(cache).get_many is not BaseCache.get_many:
+        get_many = cache.get_many
+
+        def instrumented_get_many(keys, version=None):
+            keys = list(keys)
+            found = get_many(keys, version=version)
+            if not nested[0]:
+                _count_cache(len(found), len(keys) - len(found))
+            return found
+
+        cache.get_many = instrumented_get_many
+    cache._metrics_instrumented = True
+
+
+def instrument_caches():
+    """Оборачивает кэши потока, которые ещё не обёрнуты."""
+    for alias in settings.CACHES:
+        cache = caches[alias]
+        if not getattr(cache, '_metrics_instrumented', False):
+            _instrument_cache(cache)
+
+
+class Template(django_backend.Template):
+    """Шаблон, время отрисовки которого попадает в метрики запроса."""
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return super().render(context, request)
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.template_ms += (time.perf_counter() - started) * 1000
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Бэкенд шаблонов Django с замером времени отрисовки."""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
+
+
+class ViewStats:
+    """Сводка по view за последние запросы процесса."""
+
+    def __init__(self, window):
+        self.requests = 0
+        self.window = deque(maxlen=window)
+
+    def add(self, metrics):
+        self.requests += 1
+        self.window.append((metrics.total_ms, metrics.queries,
+                            metrics.db_ms, metrics.cache_hits,
+                            metrics.cache_misses, metrics.template_ms))
+
+    def summary(self):
+        total, queries, db, hits, misses, template = zip(*self.window)
+        count = len(self.window)
+        ordered = sorted(total)
+        lookups = sum(hits) + sum(misses)
+        return {
+            'requests': self.requests,
+            'window': count,
+            'p50_ms': round(ordered[(count - 1) // 2], 3),
+            'p95_ms': round(ordered[math.ceil(count * 0.95) - 1], 3),
+            'max_ms': round(ordered[-1], 3),
+            'queries_avg': round(sum(queries) / count, 2),
+            'db_ms_avg': round(sum(db) / count, 3),
+            'template_ms_avg': round(sum(template) / count, 3),
+            'cache_hit_ratio': (round(sum(hits) / lookups, 3)
+                                if lookups else None),
+        }
+
+
+class Registry:
+    """Сводки по view; у каждого процесса своя."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def add(self, metrics):
+        with self.lock:
+            stats = self.views.get(metrics.view)
+            if stats is None:
+                stats = self.views[metrics.view] = ViewStats(
+                    settings.METRICS_WINDOW)
+            stats.add(metrics)
+
+    def snapshot(self):
+        with self.lock:
+            return {str(view): stats.summary()
+                    for view, stats in sorted(self.views.items(),
+                                              key=lambda item: str(item[0]))}
+
+    def clear(self):
+        with self.lock:
+            self.views.clear()
+
+
+registry = Registry()
+
+
+class RequestMetricsMiddleware:
+    """Собирает метрики запроса; ставится первым в MIDDLEWARE."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            instrument_caches()
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(_execute_wrapper))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        metrics.finish(request, response)
+        registry.add(metrics)
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = metrics.server_timing()
+        slow = metrics.total_ms >= settings.METRICS_SLOW_REQUEST_MS
+        if slow or random.random() < settings.METRICS_SAMPLE_RATE:
+            logger.log(logging.WARNING if slow else logging.INFO,
+                       json.dumps(dict(metrics.as_dict(), path=request.path),
+                                  ensure_ascii=False))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.view = request.resolver_match.view_name
@@ -0,0 +1,133 @@
+"""Page cache with per-user fragments (edge side includes).
+
+Страница кэшируется в одном экземпляре — в том виде, какой она имеет
+для анонимного пользователя, — а места, зависящие от пользователя
+(шапка, кнопка подписки, форма комментария), в ней заменены метками
+тега {% fragment %}. FragmentMiddleware на каждом ответе подставляет
+вместо меток фрагменты, отрисованные для текущего запроса. Поэтому из
+кэша обслуживаются и вошедшие пользователи, а не только анонимные, как
+с cache_page и Vary: Cookie.
+
+Фрагменты регистрируются декоратором fragment(name): функция получает
+запрос и строковые аргументы метки и возвращает HTML.
+"""
+
+import re
+from functools import wraps
+from urllib.parse import quote, unquote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.encoding import force_bytes
+
+from .cache import namespaced
+
+cache_key = namespaced('page')
+
+# Метка не может появиться из пользовательского текста: «<» в нём
+# экранируется шаблонами, а аргументы кодируются quote.
+PLACEHOLDER = '<!--fragment {}-->'
+PLACEHOLDER_RE = re.compile(rb'<!--fragment ([\w-]+(?: [^\s>]+)*)-->')
+
+_fragments = {}
+
+
+def fragment(name):
+    """Регистрирует функцию фрагмента name(request, *args)."""
+    def decorator(func):
+        _fragments[name] = func
+        return func
+    return decorator
+
+
+def render_fragment(request, name, *args):
+    return _fragments[name](request, *args)
+
+
+def placeholder(name, *args):
+    """Метка фрагмента в закэшированной странице."""
+    return PLACEHOLDER.format(
+        ' '.join([name, *(quote(str(arg), safe='') for arg in args)]))
+
+
+def placeholders_enabled(request):
+    """Рисует ли view страницу для кэша, с метками вместо фрагментов."""
+    return getattr(request, 'fragment_placeholders', False)
+
+
+def fill_placeholders(request, content):
+    """Подставляет в content фрагменты для запроса request."""
+    rendered = {}
+
+    def replace(match):
+        label = match.group(1)
+        if label not in rendered:
+            name, *args = label.decode().split(' ')
+            rendered[label] = force_bytes(render_fragment(
+                request, name, *(unquote(arg) for arg in args)))
+        return rendered[label]
+
+    return PLACEHOLDER_RE.sub(replace, content)
+
+
+def cache_page_fragments(key_func):
+    """Кэширует страницу view с метками фрагментов.
+
+    key_func(request, *args, **kwargs) возвращает версию страницы —
+    строку, меняющуюся вместе с её общим для всех содержимым, — или
+    None, если страницу кэшировать нельзя. Кэшируются только ответы 200
+    на GET и HEAD.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (not settings.PAGE_CACHE_ENABLED
+                    or request.method not in ('GET', 'HEAD')):
+                return view(request, *args, **kwargs)
+            version = key_func(request, *args, **kwargs)
+            if version is None:
+                return view(request, *args, **kwargs)
+            key = cache_key(version)
+            content = cache.get(key)
+            if content is not None:
+                response = HttpResponse(content)
+            else:
+                request.fragment_placeholders = True
+                try:
+                    response = view(request, *args, **kwargs)
+                finally:
+                    request.fragment_placeholders = False
+                if response.status_code == 200 and not response.streaming:
+                    cache.set(key, response.content,
+                              settings.PAGE_CACHE_TIMEOUT)
+            response.has_fragments = not response.streaming
+            return response
+        return wrapper
+    return decorator
+
+
+class FragmentMiddleware:
+    """Подставляет фрагменты текущего пользователя в страницы из кэша.
+
+    Стоит после CsrfViewMiddleware: фрагменты с формами выставляют
+    CSRF-токен, и cookie с ним добавляется уже к готовому ответу.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if getattr(response, 'has_fragments', False):
+            response.content = fill_placeholders(request, response.content)
+            if response.has_header('Content-Length'):
+                response['Content-Length'] = str(len(response.content))
+        return response
+
+
+@fragment('header')
+def header(request):
+    """Шапка сайта: пункты меню зависят от пользователя."""
+    return render_to_string('includes/header.html', request=request)
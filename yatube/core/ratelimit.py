@@ -0,0 +1,157 @@
+"""Token-bucket rate limiting of yatube views.
+
+Лимит задаётся строкой «N/единица» (s, m, h, d): корзина вмещает N
+токенов и пополняется равномерно, по токену за единицу/N. Состояние
+корзины — одно целое в кэше: теоретическое время прибытия следующего
+запроса (TAT, алгоритм GCRA) в микросекундах. Запрос сдвигает его
+атомарным incr на интервал одного токена и проходит, если TAT ушёл
+вперёд не больше чем на ёмкость корзины; иначе сдвиг откатывается и
+клиент получает 429 с Retry-After.
+
+Ключ живёт, пока TAT впереди текущего времени: после пропущенного
+запроса срок жизни переносится на TAT. Когда корзина снова полна,
+ключ истекает, и следующий запрос начинает её заново атомарным add.
+Так состояние никогда не перезаписывается целиком и параллельные
+запросы не теряют сдвигов друг друга.
+
+Нужен кэш с атомарным incr, который не меняет срок жизни ключа:
+locmem (лимит в пределах процесса) или redis (общий для всех
+процессов). У db и file incr — это get и set, поэтому они не
+поддерживаются (см. настройку RATELIMIT_CACHE).
+
+Ключ корзины — пользователь, а для анонимных запросов — IP-адрес.
+Лимиты view задаются в настройке RATELIMITS по имени области.
+"""
+
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.shortcuts import render
+
+from .cache import namespaced
+from .cache.redis import RedisCache
+
+cache_key = namespaced('ratelimit')
+
+RATE_UNITS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+# Кэши, у которых incr атомарен и не продлевает ключ.
+ATOMIC_INCR_CACHES = (LocMemCache, RedisCache)
+
+# Сколько раз повторить add и incr, если ключ истекает между ними.
+HIT_ATTEMPTS = 3
+
+
+def parse_rate(rate):
+    """Разбирает «N/единица» в (N, период в секундах)."""
+    try:
+        count, unit = rate.split('/')
+        count, period = int(count), RATE_UNITS[unit]
+    except (AttributeError, KeyError, ValueError):
+        raise ValueError(f'Неверный лимит {rate!r}, нужен вид «10/m».')
+    if count < 1:
+        raise ValueError(f'Неверный лимит {rate!r}, нужен вид «10/m».')
+    return count, period
+
+
+class RateLimiter:
+    """Корзина токенов области scope в кэше cache_alias."""
+
+    def __init__(self, scope, rate, cache_alias='default'):
+        self.scope = scope
+        self.rate = rate
+        self.burst, period = parse_rate(rate)
+        self.interval = period * 1000000 // self.burst
+        self.capacity = self.burst * self.interval
+        self.cache_alias = cache_alias
+        if not isinstance(caches[cache_alias], ATOMIC_INCR_CACHES):
+            raise ImproperlyConfigured(
+                f'Кэш {cache_alias!r} не подходит для лимитов запросов: '
+                f'нужен locmem или redis с атомарным incr.')
+
+    def hit(self, ident):
+        """Забирает токен клиента ident.
+
+        Возвращает 0, если токен был, иначе — сколько секунд ждать.
+        """
+        cache = caches[self.cache_alias]
+        key = cache_key(self.scope, ident)
+        now = int(time.time() * 1000000)
+        for _ in range(HIT_ATTEMPTS):
+            if cache.add(key, now + self.interval, self.interval / 1000000):
+                return 0
+            try:
+                tat = cache.incr(key, self.interval)
+                break
+            except ValueError:
+                # Ключ истёк между add и incr: корзина снова полна.
+                continue
+        else:
+            return 0
+        excess = tat - now - self.capacity
+        if excess <= 0:
+            # Ключ живёт, пока TAT впереди: потом корзина полна.
+            cache.touch(key, max(tat - now, self.interval) / 1000000)
+            return 0
+        try:
+            cache.decr(key, self.interval)
+        except ValueError:
+            # Ключ истёк, откатывать нечего.
+            pass
+        return excess / 1000000
+
+
+def client_ident(request):
+    """Ключ клиента: пользователь или IP-адрес анонимного запроса."""
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return f'ip:{request.META.get("REMOTE_ADDR", "")}'
+
+
+_limiters = {}
+
+
+def get_limiter(scope):
+    """RateLimiter области по настройке RATELIMITS; None без лимита."""
+    rate = settings.RATELIMITS.get(scope)
+    if rate is None:
+        return None
+    limiter = _limiters.get(scope)
+    if limiter is None or limiter.rate != rate:
+        limiter = _limiters[scope] = RateLimiter(
+            scope, rate, settings.RATELIMIT_CACHE)
+    return limiter
+
+
+def too_many_requests(request, retry_after):
+    """Ответ 429 с Retry-After в целых секундах."""
+    retry_after = max(1, math.ceil(retry_after))
+    response = render(request, 'core/429.html',
+                      {'retry_after': retry_after}, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def ratelimit(scope, methods=('POST',)):
+    """Ограничивает запросы view лимитом RATELIMITS[scope].
+
+    Считаются только запросы с методами из methods; None — все.
+    Несколько view с одной областью делят одну корзину.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            limiter = get_limiter(scope)
+            if (limiter is not None and settings.RATELIMIT_ENABLED
+                    and (methods is None or request.method in methods)):
+                retry_after = limiter.hit(client_ident(request))
+                if retry_after:
+                    return too_many_requests(request, retry_after)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
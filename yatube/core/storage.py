@@ -0,0 +1,133 @@
+"""Storages: hashed static files and content-addressed media.
+
+ManifestStaticFilesStorage при collectstatic добавляет к именам файлов
+хэш содержимого и записывает манифест, по которому тег {% static %}
+выводит хэшированные имена. Такие файлы не меняются, поэтому отдаются
+с кэшем на год (см. core.views.serve_static).
+
+Дополнительно для текстовых файлов рядом с хэшированной копией
+сохраняются сжатые .gz и, если установлен пакет brotli, .br. Сервер
+отдаёт их без сжатия на лету. Копии, которые не меньше оригинала хотя
+бы на STATIC_COMPRESS_MIN_RATIO, не сохраняются.
+
+ContentAddressedStorage называет загруженные файлы по SHA-256
+содержимого, поэтому одинаковые загрузки хранятся одним файлом.
+"""
+
+import gzip
+import hashlib
+import os
+import posixpath
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import FileSystemStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = frozenset((
+    '.css', '.js', '.svg', '.ico', '.json', '.map', '.txt', '.xml',
+    '.html', '.eot', '.ttf', '.otf',
+))
+
+# Расширение сжатой копии и функция сжатия в порядке предпочтения.
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def gzip_compress(content):
+    # mtime=0: одинаковые файлы дают одинаковые .gz при каждой сборке.
+    return gzip.compress(content, compresslevel=9, mtime=0)
+
+
+def brotli_compress(content):
+    return brotli.compress(content, quality=11)
+
+
+def compressors():
+    """Доступные сжатия: расширение копии и функция."""
+    available = [('.gz', gzip_compress)]
+    if brotli is not None:
+        available.insert(0, ('.br', brotli_compress))
+    return available
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Хэшированные имена, манифест и сжатые копии файлов."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed = []
+        for name, hashed_name, processed in super().post_process(
+                paths, dry_run=dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed.append(hashed_name)
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for hashed_name in dict.fromkeys(hashed):
+            for compressed_name in self.compress(hashed_name):
+                yield hashed_name, compressed_name, True
+
+    def compress(self, name):
+        """Сохраняет сжатые копии файла name; возвращает их имена."""
+        if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+            return []
+        with self.open(name) as original:
+            content = original.read()
+        if len(content) < settings.STATIC_COMPRESS_MIN_SIZE:
+            return []
+        names = []
+        for extension, compress in compressors():
+            compressed = compress(content)
+            if (len(compressed)
+                    > len(content) * (1 - settings.STATIC_COMPRESS_MIN_RATIO)):
+                continue
+            compressed_name = name + extension
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            self._save(compressed_name, ContentFile(compressed))
+            names.append(compressed_name)
+        return names
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Файлы с именами по хэшу содержимого, без повторной записи.
+
+    Имя — каталог из upload_to, два уровня каталогов по первым символам
+    хэша, хэш и расширение загруженного файла:
+    posts/3a/7b/3a7b...e1.gif. Если файл с таким именем уже есть, он не
+    записывается, а только обновляется его mtime: сборщик мусора
+    (posts.images) не удаляет недавно использованные файлы, на которые
+    ещё может сослаться незавершённая транзакция.
+    """
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        directory, basename = posixpath.split(name)
+        extension = os.path.splitext(basename)[1].lower()
+        shards = posixpath.join(digest[:2], digest[2:4])
+        # Имя уже по хэшу (например, при загрузке выгрузки): каталоги
+        # хэша второй раз не добавляются.
+        if directory != shards and not directory.endswith('/' + shards):
+            directory = posixpath.join(directory, shards)
+        return posixpath.join(directory, digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        # Если одинаковый файл одновременно пишет другой процесс,
+        # super().save() сохранит копию с суффиксом в имени: лишний
+        # файл, но не ошибка.
+        if self.exists(name):
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length=max_length)
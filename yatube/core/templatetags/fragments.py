@@ -0,0 +1,21 @@
+"""Template tag of per-user page fragments."""
+
+from django import template
+from django.utils.safestring import mark_safe
+
+from core.pagecache import placeholder, placeholders_enabled, render_fragment
+
+register = template.Library()
+
+
+@register.simple_tag(name='fragment', takes_context=True)
+def fragment_tag(context, name, *args):
+    """Выводит фрагмент name или, если страница рисуется для кэша, его метку.
+
+    Метку заменяет FragmentMiddleware, отрисовав фрагмент для текущего
+    пользователя.
+    """
+    request = context['request']
+    if placeholders_enabled(request):
+        return mark_safe(placeholder(name, *args))
+    return mark_safe(render_fragment(request, name, *args))
@@ -1,5 +1,38 @@
 """Write your Core app tests here."""
-from django.test import Client, TestCase
+import gzip
+import json
+import os
+import shutil
+import socket
+import tempfile
+import time
+from contextlib import contextmanager
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import DatabaseError, OperationalError, connection
+from django.http import Http404
+from django.test import (Client, RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Comment, Post
+
+from .cache import namespaced
+from .cache.redis import RedisCache
+from .cache.redis_stub import RedisStubServer
+from .backends.sqlite3.base import DatabaseWrapper
+from .db import ReadReplicaRouter, apply_sqlite_pragmas
+from .metrics import registry
+from .pagecache import fill_placeholders, fragment, placeholder
+from .ratelimit import RateLimiter, parse_rate
+from .files import parse_range
+from .views import accepted_encodings, serve_media, serve_static
 
 
 class CoreURLTests(TestCase):
@@ -13,3 +46,574 @@ class CoreURLTests(TestCase):
         """Страница 404 отдает кастомный шаблон."""
         response = self.guest_client.get('/rr/')
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class RedisCacheTests(TestCase):
+    """Тестирует Redis-бэкенд кэша на локальной замене сервера."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = RedisStubServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.cache = RedisCache(self.server.url, {'KEY_PREFIX': 'test'})
+        self.cache.clear()
+
+    def tearDown(self):
+        self.cache._connection.close()
+
+    def test_get_set_delete(self):
+        """Значения сохраняются, читаются и удаляются."""
+        self.cache.set('post', {'text': 'Тестовый пост'})
+        self.cache.set('views', 5)
+        self.assertEqual(self.cache.get('post'), {'text': 'Тестовый пост'})
+        self.assertEqual(self.cache.get('views'), 5)
+        self.assertEqual(self.cache.get_many(['post', 'views', 'missing']),
+                         {'post': {'text': 'Тестовый пост'}, 'views': 5})
+        self.cache.delete('post')
+        self.assertIsNone(self.cache.get('post'))
+        self.assertEqual(self.cache.get('post', 'default'), 'default')
+
+    def test_add_and_incr(self):
+        """add не перезаписывает ключ, incr работает атомарно."""
+        self.assertTrue(self.cache.add('hits', 1))
+        self.assertFalse(self.cache.add('hits', 10))
+        self.assertEqual(self.cache.incr('hits'), 2)
+        self.assertEqual(self.cache.decr('hits', 2), 0)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        self.assertFalse(self.cache.has_key('missing'),
+                         'incr отсутствующего ключа создал его')
+
+    def test_close_keeps_connection(self):
+        """close() в конце запроса не рвёт соединение без
+        CLOSE_CONNECTION."""
+        self.cache.set('key', 'value')
+        resp = self.cache._connection
+        opened = resp._socket
+        self.cache.close()
+        self.assertIs(resp._socket, opened)
+        closing = RedisCache(self.server.url,
+                             {'OPTIONS': {'CLOSE_CONNECTION': True}})
+        closing.get('key')
+        closing.close()
+        self.assertIsNone(closing._connection._socket)
+
+    def test_stale_connection_reopened(self):
+        """Соединение, закрытое сервером, открывается заново."""
+        self.cache.set('hits', 1)
+        resp = self.cache._connection
+        resp.close()
+        ours, theirs = socket.socketpair()
+        theirs.close()
+        resp._socket, resp._file = ours, ours.makefile('rb')
+        self.assertEqual(self.cache.incr('hits'), 2)
+
+    def test_lost_reply_retried_only_for_idempotent_commands(self):
+        """Без ответа повторяется чтение, но не incr."""
+        self.cache.set('hits', 1)
+        resp = self.cache._connection
+        replies = resp._replies
+        calls = []
+        lose = []
+
+        def lose_reply(commands):
+            calls.append(commands)
+            if lose:
+                lose.pop()
+                replies(commands)
+                raise ConnectionError('Соединение с Redis закрыто')
+            return replies(commands)
+
+        with mock.patch.object(resp, '_replies', lose_reply):
+            lose.append(True)
+            with self.assertRaises(ConnectionError):
+                self.cache.incr('hits')
+            self.assertEqual(len(calls), 1)
+            self.assertEqual(self.cache.get('hits'), 2)
+            calls.clear()
+            lose.append(True)
+            self.assertEqual(self.cache.get('hits'), 2)
+        self.assertEqual(len(calls), 2)
+
+    def test_timeouts(self):
+        """Сроки жизни передаются серверу относительными."""
+        self.cache.set('short', 'value', 0.05)
+        self.cache.set('forever', 'value', None)
+        self.cache.set('expired', 'value', 0)
+        self.assertFalse(self.cache.has_key('expired'))
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertEqual(self.cache.get('forever'), 'value')
+        self.assertTrue(self.cache.touch('forever', 0.05))
+        time.sleep(0.1)
+        self.assertFalse(self.cache.has_key('forever'))
+
+    def test_key_prefix_separates_caches(self):
+        """Кэши с разными KEY_PREFIX не видят ключи друг друга."""
+        other = RedisCache(self.server.url, {'KEY_PREFIX': 'other'})
+        self.cache.set('key', 'test')
+        self.assertIsNone(other.get('key'))
+        other.close()
+
+    def test_site_works_with_redis_cache(self):
+        """Главная страница кэшируется в Redis-бэкенде."""
+        caches = {'default': {'BACKEND': 'core.cache.redis.RedisCache',
+                              'LOCATION': self.server.url}}
+        with override_settings(CACHES=caches):
+            response = Client().get('/')
+            self.assertEqual(response.status_code, 200)
+            self.assertIsNotNone(
+                cache.get(namespaced('posts')('index', 'generation')))
+            cache.close()
+
+
+class NamespacedTests(TestCase):
+    def test_namespaced_keys(self):
+        """Ключи собираются с пространством имён приложения."""
+        cache_key = namespaced('posts')
+        self.assertEqual(cache_key('card', 1, 2), 'posts:card:1:2')
+
+
+def server_timing(response):
+    """Метрики заголовка Server-Timing: имя -> параметры."""
+    metrics = {}
+    for metric in response['Server-Timing'].split(', '):
+        name, *params = metric.split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+    return metrics
+
+
+class RequestMetricsTests(TestCase):
+    """Тестирует метрики запросов."""
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+        registry.clear()
+
+    @override_settings(METRICS_SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        """Заголовок Server-Timing содержит запросы, кэш и шаблоны."""
+        with CaptureQueriesContext(connection) as context:
+            response = self.guest_client.get('/')
+        metrics = server_timing(response)
+        self.assertEqual(metrics['db']['desc'],
+                         f'"{len(context.captured_queries)} queries"')
+        self.assertIn('misses', metrics['cache']['desc'])
+        self.assertGreater(float(metrics['tpl']['dur']), 0)
+        self.assertGreaterEqual(float(metrics['total']['dur']),
+                                float(metrics['tpl']['dur']))
+        response = self.guest_client.get('/')
+        self.assertRegex(server_timing(response)['cache']['desc'],
+                         r'"[1-9]\d* hits')
+
+    @override_settings(METRICS_SERVER_TIMING=False)
+    def test_server_timing_disabled(self):
+        """Без METRICS_SERVER_TIMING заголовок не отдаётся."""
+        response = self.guest_client.get('/')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(METRICS_SAMPLE_RATE=1)
+    def test_sampled_log(self):
+        """Выбранные запросы пишутся в лог строкой JSON."""
+        with self.assertLogs('core.metrics', 'INFO') as logs:
+            self.guest_client.get('/about/author/')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'about:author')
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(record['path'], '/about/author/')
+
+    @override_settings(METRICS_SLOW_QUERY_MS=0)
+    def test_slow_query_log(self):
+        """Запросы к базе медленнее порога пишутся в лог с SQL."""
+        with self.assertLogs('core.metrics.sql', 'WARNING') as logs:
+            self.guest_client.get('/')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertIn('SELECT', record['sql'])
+
+    def test_metrics_endpoint(self):
+        """Сводка по view доступна только персоналу."""
+        self.guest_client.get('/')
+        self.guest_client.get('/')
+        response = self.guest_client.get('/metrics/')
+        self.assertEqual(response.status_code, 302)
+        admin = get_user_model().objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin')
+        self.guest_client.force_login(admin)
+        summary = self.guest_client.get('/metrics/').json()
+        self.assertEqual(summary['posts:index']['requests'], 2)
+        self.assertLessEqual(summary['posts:index']['p50_ms'],
+                             summary['posts:index']['max_ms'])
+
+
+class SQLitePragmaTests(TestCase):
+    """Тестирует настройку соединений SQLite."""
+
+    @override_settings(SQLITE_PRAGMAS={'cache_size': -4096})
+    def test_pragmas_applied(self):
+        """PRAGMA из настроек выполняются на соединении."""
+        apply_sqlite_pragmas(sender=None, connection=connection)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], -4096)
+
+
+@contextmanager
+def transaction_on(wrapper):
+    """Транзакция на соединении вне connections, как её начинает atomic."""
+    wrapper.set_autocommit(
+        False, force_begin_transaction_with_broken_autocommit=True)
+    try:
+        yield
+    finally:
+        wrapper.rollback()
+        wrapper.set_autocommit(True)
+
+
+class ReadReplicaRouterTests(SimpleTestCase):
+    """Тестирует маршрутизацию чтения и записи."""
+
+    def test_routes(self):
+        """Чтения идут в replica, запись и миграции — в default."""
+        router = ReadReplicaRouter()
+        self.assertEqual(router.db_for_read(None), 'replica')
+        self.assertEqual(router.db_for_write(None), 'default')
+        self.assertTrue(router.allow_migrate('default', 'posts'))
+        self.assertFalse(router.allow_migrate('replica', 'posts'))
+
+
+class SQLiteBackendTests(SimpleTestCase):
+    """Тестирует бэкенд core.backends.sqlite3 на файле базы."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.name = os.path.join(directory.name, 'test.sqlite3')
+        self.writer = self.open()
+        with self.writer.cursor() as cursor:
+            cursor.execute('CREATE TABLE note (text TEXT)')
+
+    def open(self, **options):
+        wrapper = DatabaseWrapper(dict(
+            connection.settings_dict, NAME=self.name,
+            OPTIONS={'timeout': 0.1}, **options))
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def test_wal_mode(self):
+        """База переводится в режим WAL."""
+        with self.writer.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+
+    def test_read_only_connection(self):
+        """Соединение READ_ONLY читает, но не пишет."""
+        reader = self.open(READ_ONLY=True)
+        with reader.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM note')
+            self.assertEqual(cursor.fetchone()[0], 0)
+            with self.assertRaises(DatabaseError):
+                cursor.execute("INSERT INTO note VALUES ('текст')")
+
+    def test_immediate_transactions(self):
+        """Транзакция записи берёт блокировку сразу, чтения не ждут."""
+        other = self.open()
+        reader = self.open(READ_ONLY=True)
+        with transaction_on(self.writer):
+            with self.assertRaises(OperationalError):
+                with transaction_on(other):
+                    pass
+            with reader.cursor() as cursor:
+                cursor.execute('SELECT count(*) FROM note')
+                self.assertEqual(cursor.fetchone()[0], 0)
+
+
+class RateLimitTests(TestCase):
+    """Тестирует ограничение частоты запросов."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = get_user_model().objects.create(username='writer')
+        cls.other = get_user_model().objects.create(username='other')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_parse_rate(self):
+        """Лимит разбирается из строки «N/единица»."""
+        self.assertEqual(parse_rate('10/m'), (10, 60))
+        for rate in ('10', '0/m', 'x/m', '10/w'):
+            with self.assertRaises(ValueError):
+                parse_rate(rate)
+
+    def test_token_bucket(self):
+        """Корзина отдаёт N токенов сразу и пополняется по одному."""
+        limiter = RateLimiter('test', '3/m')
+        with mock.patch('core.ratelimit.time.time', return_value=1000.0):
+            self.assertEqual([limiter.hit('client') for _ in range(3)],
+                             [0, 0, 0])
+            self.assertAlmostEqual(limiter.hit('client'), 20)
+            self.assertAlmostEqual(limiter.hit('client'), 20)
+            self.assertEqual(limiter.hit('another'), 0)
+        with mock.patch('core.ratelimit.time.time', return_value=1020.0):
+            self.assertEqual(limiter.hit('client'), 0)
+            self.assertAlmostEqual(limiter.hit('client'), 20)
+        with mock.patch('core.ratelimit.time.time', return_value=2000.0):
+            self.assertEqual([limiter.hit('client') for _ in range(3)],
+                             [0, 0, 0])
+            self.assertGreater(limiter.hit('client'), 0)
+
+    def test_expired_key_on_reject(self):
+        """Ключ, истёкший до отката, не превращает 429 в ошибку."""
+        limiter = RateLimiter('test', '1/m')
+        with mock.patch('core.ratelimit.time.time', return_value=1000.0):
+            self.assertEqual(limiter.hit('client'), 0)
+            with mock.patch.object(LocMemCache, 'decr',
+                                   side_effect=ValueError):
+                self.assertAlmostEqual(limiter.hit('client'), 60)
+
+    @override_settings(CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'database': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'cache_table'},
+    })
+    def test_non_atomic_cache_refused(self):
+        """Кэш без атомарного incr для лимитов не принимается."""
+        with self.assertRaises(ImproperlyConfigured):
+            RateLimiter('test', '3/m', 'database')
+
+    @override_settings(RATELIMITS={'add_comment': '2/m'})
+    def test_view_returns_429(self):
+        """Сверх лимита view отвечает 429 с Retry-After."""
+        url = reverse('posts:add_comment', args=[self.post.pk])
+        for number in range(2):
+            response = self.client.post(url, {'text': f'Текст {number}'})
+            self.assertEqual(response.status_code, 302)
+        response = self.client.post(url, {'text': 'Лишний'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertTemplateUsed(response, 'core/429.html')
+        self.assertEqual(Comment.objects.filter(post=self.post).count(), 2)
+        other = Client()
+        other.force_login(self.other)
+        self.assertEqual(other.post(url, {'text': 'Другой'}).status_code,
+                         302)
+
+    @override_settings(RATELIMITS={'post_create': '1/m'})
+    def test_only_writes_counted(self):
+        """GET формы не расходует лимит записи."""
+        url = reverse('posts:post_create')
+        for _ in range(3):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(
+            self.client.post(url, {'text': 'Пост'}).status_code, 302)
+        self.assertEqual(
+            self.client.post(url, {'text': 'Пост'}).status_code, 429)
+
+    @override_settings(RATELIMITS={'follow': '1/m'},
+                       RATELIMIT_ENABLED=False)
+    def test_disabled(self):
+        """RATELIMIT_ENABLED=False отключает лимиты."""
+        url = reverse('posts:profile_follow', args=[self.other.username])
+        for _ in range(3):
+            self.assertEqual(self.client.get(url).status_code, 302)
+
+
+class FragmentPlaceholderTests(SimpleTestCase):
+    def test_placeholder_round_trip(self):
+        """Аргументы метки с пробелами и «-->» восстанавливаются."""
+        @fragment('test_echo')
+        def echo(request, *args):
+            return '|'.join(args)
+
+        content = 'до {} после'.format(
+            placeholder('test_echo', 'имя автора', '-->', 5)).encode()
+        self.assertEqual(fill_placeholders(None, content).decode(),
+                         'до имя автора|-->|5 после')
+
+    def test_escaped_text_is_not_placeholder(self):
+        """Экранированный шаблоном текст не считается меткой."""
+        content = b'&lt;!--fragment header--&gt;'
+        self.assertEqual(fill_placeholders(None, content), content)
+
+
+STATIC_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(
+    STATIC_ROOT=STATIC_ROOT,
+    STATICFILES_STORAGE='core.storage.CompressedManifestStaticFilesStorage')
+class StaticPipelineTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command('collectstatic', interactive=False, verbosity=0)
+        cls.css = staticfiles_storage.stored_name('css/bootstrap.min.css')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(STATIC_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def get(self, path, **headers):
+        request = RequestFactory().get('/static/' + path, **headers)
+        return serve_static(request, path)
+
+    def test_hashed_names_compressed(self):
+        """У хэшированного CSS есть .gz с тем же содержимым."""
+        self.assertRegex(self.css, r'bootstrap\.min\.[0-9a-f]{12}\.css$')
+        with staticfiles_storage.open(self.css) as original, \
+                staticfiles_storage.open(self.css + '.gz') as compressed:
+            self.assertEqual(gzip.decompress(compressed.read()),
+                             original.read())
+        self.assertFalse(staticfiles_storage.exists(
+            staticfiles_storage.stored_name('img/logo.png') + '.gz'),
+            'Сжата картинка PNG')
+
+    def test_serves_precompressed(self):
+        """Клиенту с gzip отдаётся .gz с Content-Encoding."""
+        response = self.get(self.css, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        response = self.get(self.css, HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_cache_control(self):
+        """Хэшированные файлы кэшируются на год, остальные — коротко."""
+        response = self.get(self.css)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+        response = self.get('css/bootstrap.min.css')
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=3600', response['Cache-Control'])
+
+    def test_not_modified_and_missing(self):
+        """304 на If-Modified-Since; 404 на чужие пути."""
+        response = self.get(self.css)
+        response = self.get(self.css,
+                            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        for path in ('css/missing.css', '../manage.py'):
+            with self.subTest(path=path):
+                with self.assertRaises(Http404):
+                    self.get(path)
+
+    def test_accepted_encodings(self):
+        self.assertEqual(accepted_encodings('br;q=1.0, gzip;q=0, *'),
+                         {'br', '*'})
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, MEDIA_SERVE='python')
+class MediaServeTests(SimpleTestCase):
+    content = bytes(range(256)) * 4
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for directory in ('posts', 'private'):
+            os.makedirs(os.path.join(MEDIA_ROOT, directory), exist_ok=True)
+            with open(os.path.join(MEDIA_ROOT, directory, 'image.gif'),
+                      'wb') as image:
+                image.write(cls.content)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def get(self, path='posts/image.gif', **headers):
+        request = RequestFactory().get('/media/' + path, **headers)
+        return serve_media(request, path)
+
+    def body(self, response):
+        body = b''.join(response.streaming_content)
+        response.close()
+        return body
+
+    def test_full_file(self):
+        """Файл целиком, с типом, Accept-Ranges и долгим кэшем."""
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/gif')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('max-age=2592000', response['Cache-Control'])
+        self.assertEqual(self.body(response), self.content)
+
+    def test_range(self):
+        """Range отдаёт часть файла с кодом 206."""
+        for header, start, end in (('bytes=10-19', 10, 19),
+                                   ('bytes=1000-', 1000, 1023),
+                                   ('bytes=-4', 1020, 1023),
+                                   ('bytes=1020-5000', 1020, 1023)):
+            with self.subTest(header=header):
+                response = self.get(HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response['Content-Range'],
+                                 f'bytes {start}-{end}/1024')
+                self.assertEqual(response['Content-Length'],
+                                 str(end - start + 1))
+                self.assertEqual(self.body(response),
+                                 self.content[start:end + 1])
+
+    def test_range_not_satisfiable(self):
+        response = self.get(HTTP_RANGE='bytes=2000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_if_range_mismatch(self):
+        """Устаревший If-Range — весь файл вместо части."""
+        response = self.get(HTTP_RANGE='bytes=0-9',
+                            HTTP_IF_RANGE='Wed, 21 Oct 2015 07:28:00 GMT')
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+    def test_not_modified(self):
+        response = self.get()
+        response.close()
+        response = self.get(HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_private_and_missing(self):
+        """Вне MEDIA_PUBLIC_DIRS и за пределами MEDIA_ROOT — 404."""
+        for path in ('private/image.gif', 'posts/missing.gif',
+                     'posts/../private/image.gif', 'posts/../../x'):
+            with self.subTest(path=path):
+                with self.assertRaises(Http404):
+                    self.get(path)
+
+    def test_delegated(self):
+        """accel и sendfile отдают только заголовок фронтовому серверу."""
+        with self.settings(MEDIA_SERVE='accel'):
+            response = self.get()
+        self.assertEqual(response['X-Accel-Redirect'],
+                         '/protected-media/posts/image.gif')
+        self.assertEqual(response.content, b'')
+        with self.settings(MEDIA_SERVE='sendfile'):
+            response = self.get()
+        self.assertEqual(response['X-Sendfile'],
+                         os.path.join(MEDIA_ROOT, 'posts', 'image.gif'))
+        self.assertIn('max-age', response['Cache-Control'])
+
+    def test_parse_range(self):
+        self.assertIsNone(parse_range('bytes=0-1,5-6', 10))
+        self.assertIsNone(parse_range('items=0-1', 10))
+        with self.assertRaises(ValueError):
+            parse_range('bytes=-0', 10)
@@ -1,6 +1,28 @@
-"""Write your Core app tests here."""
+"""Write your Core app views here."""
 
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (FileResponse, Http404, HttpResponseNotModified,
+                         JsonResponse)
 from django.shortcuts import render
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from .files import delegated_response, file_response
+from .metrics import registry
+from .storage import ENCODINGS
+
+# Имя файла с хэшем содержимого от ManifestStaticFilesStorage:
+# name.0123456789ab.ext (и его сжатые копии).
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
 
 
 def page_not_found(request, exception):
@@ -21,3 +43,94 @@ def server_error(request):
 def permission_denied(request, exception):
     """Вызов View функции для кастомной страницы 403."""
     return render(request, 'core/403.html', status=403)
+
+
+@staff_member_required
+def metrics(request):
+    """Сводка метрик запросов по view для текущего процесса."""
+    return JsonResponse(registry.snapshot(),
+                        json_dumps_params={'ensure_ascii': False})
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding, которые клиент не запретил (q=0)."""
+    encodings = set()
+    for item in header.split(','):
+        encoding, _, params = item.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        encodings.add(encoding.strip().lower())
+    return encodings
+
+
+def serve_static(request, path):
+    """Отдаёт файл из STATIC_ROOT, сжатую копию — если клиент примет.
+
+    Файлы с хэшем в имени неизменны и кэшируются браузером на год без
+    перепроверки (immutable); остальные — на STATIC_MAX_AGE секунд.
+    """
+    try:
+        fullpath = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+    content_type, _ = mimetypes.guess_type(fullpath)
+    encoding = None
+    accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    for name, extension in ENCODINGS:
+        if name in accepted and os.path.isfile(fullpath + extension):
+            encoding, fullpath = name, fullpath + extension
+            break
+    stat = os.stat(fullpath)
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'),
+                              stat.st_mtime, stat.st_size):
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(open(fullpath, 'rb'),
+                                content_type=content_type
+                                or 'application/octet-stream')
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        if encoding:
+            response['Content-Encoding'] = encoding
+    if HASHED_NAME_RE.search(path):
+        patch_cache_control(response, public=True,
+                            max_age=settings.STATIC_HASHED_MAX_AGE,
+                            immutable=True)
+    else:
+        patch_cache_control(response, public=True,
+                            max_age=settings.STATIC_MAX_AGE)
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def serve_media(request, path):
+    """Отдаёт файл из MEDIA_ROOT способом MEDIA_SERVE (см. core.files).
+
+    Доступны только каталоги MEDIA_PUBLIC_DIRS: картинки постов и
+    миниатюры. Имена загруженных файлов не переиспользуются, поэтому
+    ответы кэшируются на MEDIA_MAX_AGE секунд.
+    """
+    path = posixpath.normpath(path).lstrip('/')
+    if not path.startswith(settings.MEDIA_PUBLIC_DIRS):
+        raise Http404
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+    if settings.MEDIA_SERVE in ('accel', 'sendfile'):
+        response = delegated_response(settings.MEDIA_SERVE, path, fullpath,
+                                      settings.MEDIA_ACCEL_PREFIX)
+    else:
+        response = file_response(request, fullpath)
+    if response.status_code in (200, 206, 304):
+        patch_cache_control(response, public=True,
+                            max_age=settings.MEDIA_MAX_AGE)
+    return response
@@ -1,19 +1,115 @@
 """Write here Admin settings for Posts app."""
 
+from django import forms
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.views.main import PAGE_VAR
 
-from .models import Group, Post
+from . import search
+from .models import Group, Post, ThumbnailJob
+from .pagination import EstimatedCountPaginator
 
 
-class PostAdmin(admin.ModelAdmin):
-    """Set your Admin settings here."""
+class WriteOnPostMixin:
+    """Транзакция форм изменения и удаления только на POST.
 
-    list_display = ('pk', 'text', 'pub_date', 'author', 'group')
+    ModelAdmin открывает atomic() и на GET, а на SQLite транзакция
+    держит блокировку записи всю отрисовку формы (core.backends.sqlite3).
+    """
+
+    def changeform_view(self, request, object_id=None, form_url='',
+                        extra_context=None):
+        if request.method == 'POST':
+            return super().changeform_view(request, object_id, form_url,
+                                           extra_context)
+        return self._changeform_view(request, object_id, form_url,
+                                     extra_context)
+
+    def delete_view(self, request, object_id, extra_context=None):
+        if request.method == 'POST':
+            return super().delete_view(request, object_id, extra_context)
+        return self._delete_view(request, object_id, extra_context)
+
+
+class PostAdmin(WriteOnPostMixin, admin.ModelAdmin):
+    """Set your Admin settings here.
+
+    Список рассчитан на большие таблицы: автор и группа загружаются
+    одним запросом, число постов оценивается без полного COUNT(*),
+    а поиск идёт по полнотекстовому индексу.
+    """
+
+    list_display = ('pk', 'text', 'pub_date', 'author', 'group_title',
+                    'group')
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
+    autocomplete_fields = ('author', 'group')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display: str = '-пусто-'
 
+    def group_title(self, post):
+        return post.group
+
+    group_title.short_description = 'Название группы'
+    group_title.admin_order_field = 'group__title'
+
+    def get_changelist_form(self, request, **kwargs):
+        """Группа в строках списка редактируется по id.
+
+        Выпадающий список всех групп в каждой строке и подпись
+        виджета raw_id стоили бы запроса на строку.
+        """
+        kwargs.setdefault('widgets', {
+            'group': forms.NumberInput(attrs={'style': 'width: 6em'}),
+        })
+        return super().get_changelist_form(request, **kwargs)
+
+    def get_paginator(self, request, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True):
+        try:
+            # Номер страницы в адресе админки начинается с нуля.
+            number = int(request.GET.get(PAGE_VAR, 0)) + 1
+        except ValueError:
+            number = 1
+        return self.paginator(
+            queryset, per_page, orphans=orphans,
+            allow_empty_first_page=allow_empty_first_page,
+            count_limit=settings.POSTS_ADMIN_COUNT_LIMIT, number=number)
+
+    def get_search_results(self, request, queryset, search_term):
+        """Ищет посты по поисковому индексу вместо LIKE '%...%'.
+
+        Берутся POSTS_ADMIN_SEARCH_LIMIT самых релевантных постов.
+        """
+        if not search_term:
+            return queryset, False
+        post_ids = search.search_post_ids(
+            search_term, settings.POSTS_ADMIN_SEARCH_LIMIT)
+        return queryset.filter(pk__in=post_ids), False
+
+
+class GroupAdmin(WriteOnPostMixin, admin.ModelAdmin):
+    """Админка групп."""
+
+    list_display = ('pk', 'title', 'slug', 'posts_count')
+    search_fields = ('title', 'slug')
+    prepopulated_fields = {'slug': ('title',)}
+
+
+class ThumbnailJobAdmin(WriteOnPostMixin, admin.ModelAdmin):
+    """Админка очереди миниатюр."""
+
+    list_display = ('pk', 'image', 'geometry', 'status', 'attempts',
+                    'created', 'started')
+    list_filter = ('status',)
+    search_fields = ('image',)
+    readonly_fields = ('created', 'started')
+
 
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
+admin.site.register(Group, GroupAdmin)
+admin.site.register(ThumbnailJob, ThumbnailJobAdmin)
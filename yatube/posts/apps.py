@@ -8,3 +8,7 @@ class PostsConfig(AppConfig):
 
     name = 'posts'
     verbose_name: str = 'Посты'
+
+    def ready(self):
+        """Подключает обработчики сигналов и фрагменты страниц."""
+        from . import fragments, signals  # noqa: F401
@@ -0,0 +1,101 @@
+"""Cache keys and version stamps of Posts app.
+
+Отметка версии объекта — время её выставления в наносекундах. Если
+отметка вытеснена из кэша, новая будет больше любой прежней, поэтому
+ключи со старыми отметками уже не совпадут.
+"""
+
+import time
+
+from django.core.cache import cache
+
+from core.cache import namespaced
+
+cache_key = namespaced('posts')
+
+
+def _version_key(kind, pk):
+    return cache_key('version', kind, pk)
+
+
+def get_versions(*objects):
+    """Возвращает отметки версий для пар (вид, pk)."""
+    keys = [_version_key(kind, pk) for kind, pk in objects]
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump_version(kind, pk):
+    """Сбрасывает закэшированные фрагменты объекта."""
+    cache.set(_version_key(kind, pk), time.time_ns(), None)
+
+
+def bump_posts(posts):
+    """Сбрасывает карточки и страницы лент с постами.
+
+    posts — тройки (pk, author_id, group_id), например из
+    values_list. Страницы главной закэшированы целиком вместе с
+    карточками, поэтому начинается и новое поколение её кэша.
+    """
+    bumped = False
+    for pk, author_id, group_id in posts:
+        bump_version('post', pk)
+        bump_version('author_feed', author_id)
+        if group_id:
+            bump_version('group_feed', group_id)
+        bumped = True
+    if bumped:
+        bump_index_generation()
+
+
+def post_card_key(post, *flags):
+    """Ключ карточки поста с учётом версий поста, автора и группы."""
+    objects = [('post', post.pk), ('user', post.author_id)]
+    if post.group_id:
+        objects.append(('group', post.group_id))
+    versions = get_versions(*objects)
+    parts = [post.pk, post.updated_at.timestamp(), *versions,
+             *(int(bool(flag)) for flag in flags)]
+    return cache_key('card', *parts)
+
+
+# Параметры запроса, которые читают страницы лент и поста.
+PAGE_PARAMS = ('page', 'cursor', 'comments')
+
+
+def page_params(request):
+    """Параметры страницы из запроса для ключей кэша и ETag.
+
+    Возвращает пары (имя, значение) из PAGE_PARAMS и признак того, что
+    других параметров в запросе нет. Страницы с посторонними
+    параметрами не кэшируются, чтобы случайные параметры не плодили
+    записей в кэше.
+    """
+    params = [(name, request.GET[name]) for name in PAGE_PARAMS
+              if name in request.GET]
+    return params, len(params) == len(request.GET)
+
+
+INDEX_GENERATION_KEY = cache_key('index', 'generation')
+
+
+def index_generation():
+    """Текущее поколение кэша главной страницы."""
+    generation = cache.get(INDEX_GENERATION_KEY)
+    if generation is None:
+        generation = time.time_ns()
+        cache.set(INDEX_GENERATION_KEY, generation, None)
+    return generation
+
+
+def bump_index_generation():
+    """Начинает новое поколение кэша главной страницы."""
+    cache.set(INDEX_GENERATION_KEY, time.time_ns(), None)
+
+
+def index_key(generation, suffix):
+    return cache_key('index', generation, suffix)
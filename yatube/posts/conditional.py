@@ -0,0 +1,152 @@
+"""Conditional GET for group, profile and post pages of Posts app.
+
+Валидаторы страницы — ETag и Last-Modified — считаются одним запросом
+по индексу (дата последнего поста ленты или изменения поста и его
+последнего комментария) и отметками версий в кэше, которые сигналы
+сдвигают при изменении постов ленты, автора, группы и подписок. Если
+клиент прислал совпадающий If-None-Match или If-Modified-Since, view
+не выполняется и ответ 304 стоит этого одного запроса.
+
+ETag слабый: страницы с формами содержат разный при каждой отрисовке
+CSRF-токен, но по смыслу одинаковы. В ETag входят пользователь и
+параметры страницы (PAGE_PARAMS), а ответы помечаются Vary: Cookie;
+для анонимных пользователей они public, для вошедших — private, и в
+обоих случаях кэш обязан перепроверять их (no-cache).
+"""
+
+import hashlib
+import json
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.db.models import OuterRef, Subquery
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control, patch_vary_headers)
+from django.utils.http import http_date
+
+from .cache import get_versions, page_params
+from .models import Comment, Group, Post, User
+
+# Отметка, которую сдвигает изменение любого пользователя или группы:
+# их имена и адреса выводятся в карточках постов всех лент.
+CARDS = ('cards', 0)
+
+
+def _latest_post(**filters):
+    return Subquery(Post.objects.filter(**filters)
+                    .order_by('-pub_date', '-id').values('pub_date')[:1])
+
+
+def _digest(*parts):
+    payload = json.dumps(parts, separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _validators(request, parts, timestamps, stamps):
+    """ETag и время последнего изменения страницы.
+
+    Версия общего для всех содержимого страницы сохраняется в
+    request.page_version: по ней страница кэшируется с метками
+    фрагментов (core.pagecache). Из параметров запроса в неё входят
+    только PAGE_PARAMS; с другими параметрами page_version — None и
+    страница не кэшируется. В ETag к версии добавляются пользователь
+    и отметка его версии — от них зависят фрагменты.
+    """
+    if request.user.is_authenticated:
+        stamps = [*stamps, ('user', request.user.pk)]
+    versions = get_versions(*stamps)
+    params, cacheable = page_params(request)
+    version = _digest(
+        request.resolver_match.view_name, params,
+        [str(part) for part in parts],
+        [str(timestamp) for timestamp in timestamps],
+        versions[:-1] if request.user.is_authenticated else versions)
+    request.page_version = version if cacheable else None
+    etag = 'W/"{}"'.format(_digest(version, request.user.pk, versions[-1]))
+    moments = [timestamp for timestamp in timestamps if timestamp]
+    moments.extend(datetime.fromtimestamp(version / 10 ** 9, timezone.utc)
+                   for version in versions)
+    return etag, max(moments)
+
+
+def group_validators(request, slug):
+    group = (Group.objects.filter(slug=slug)
+             .values('pk', latest=_latest_post(group=OuterRef('pk')))
+             .first())
+    if group is None:
+        return None
+    return _validators(
+        request, [group['pk']], [group['latest']],
+        [('group', group['pk']), ('group_feed', group['pk']), CARDS])
+
+
+def profile_validators(request, username):
+    author = (User.objects.filter(username=username)
+              .values('pk', latest=_latest_post(author=OuterRef('pk')))
+              .first())
+    if author is None:
+        return None
+    return _validators(
+        request, [author['pk']], [author['latest']],
+        [('user', author['pk']), ('author_feed', author['pk']), CARDS])
+
+
+def post_detail_validators(request, post_id):
+    latest_comment = Subquery(
+        Comment.objects.filter(post=OuterRef('pk'))
+        .order_by('-created', '-id').values('created')[:1])
+    post = (Post.objects.filter(pk=post_id)
+            .values('pk', 'updated_at', 'author_id', 'group_id',
+                    'comments_count', latest_comment=latest_comment)
+            .first())
+    if post is None:
+        return None
+    stamps = [('post', post['pk']), ('user', post['author_id']),
+              ('author_feed', post['author_id'])]
+    if post['group_id']:
+        stamps.append(('group', post['group_id']))
+    return _validators(
+        request, [post['pk'], post['comments_count']],
+        [post['updated_at'], post['latest_comment']], stamps)
+
+
+def page_version(request, *args, **kwargs):
+    """Версия страницы, посчитанная conditional_page, для кэша страниц."""
+    return getattr(request, 'page_version', None)
+
+
+def conditional_page(validators):
+    """Отвечает 304 по валидаторам страницы, не вызывая view.
+
+    validators(request, *args, **kwargs) возвращает (etag,
+    last_modified) или None, если объекта страницы нет: тогда view
+    вызывается и сам отвечает 404.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            result = validators(request, *args, **kwargs)
+            if result is None:
+                return view(request, *args, **kwargs)
+            etag, last_modified = result
+            last_modified = int(last_modified.timestamp())
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response.setdefault('ETag', etag)
+                response.setdefault('Last-Modified',
+                                    http_date(last_modified))
+                if request.user.is_authenticated:
+                    patch_cache_control(response, private=True,
+                                        no_cache=True)
+                else:
+                    patch_cache_control(response, public=True,
+                                        no_cache=True)
+                patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,81 @@
+"""Denormalized counters of Posts app.
+
+Счётчики меняются выражениями F() в том же запросе UPDATE, поэтому
+одновременные записи не теряют приращений; recount() пересчитывает
+их агрегатами, если счётчики разошлись с данными.
+"""
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, UserCounters
+
+
+def _shift(queryset, field, delta):
+    """Сдвигает счётчик на delta, не опуская его ниже нуля."""
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def get_counters(user):
+    """Возвращает счётчики пользователя, создавая их при отсутствии."""
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        counters, _ = UserCounters.objects.get_or_create(user=user)
+        return counters
+
+
+def post_added(post, delta=1):
+    """Учитывает новый (или удалённый при delta=-1) пост."""
+    _shift(UserCounters.objects.filter(user_id=post.author_id),
+           'posts_count', delta)
+    if post.group_id:
+        _shift(Group.objects.filter(pk=post.group_id), 'posts_count', delta)
+
+
+def post_moved(old_group_id, new_group_id):
+    """Переносит пост между счётчиками групп."""
+    if old_group_id:
+        _shift(Group.objects.filter(pk=old_group_id), 'posts_count', -1)
+    if new_group_id:
+        _shift(Group.objects.filter(pk=new_group_id), 'posts_count', 1)
+
+
+def comment_added(comment, delta=1):
+    """Учитывает новый (или удалённый при delta=-1) комментарий."""
+    _shift(Post.objects.filter(pk=comment.post_id), 'comments_count', delta)
+
+
+def follow_added(follow, delta=1):
+    """Учитывает новую (или удалённую при delta=-1) подписку."""
+    _shift(UserCounters.objects.filter(user_id=follow.author_id),
+           'followers_count', delta)
+    _shift(UserCounters.objects.filter(user_id=follow.user_id),
+           'following_count', delta)
+
+
+def _count(model, field, outer='pk'):
+    """Число строк model, у которых field ссылается на OuterRef(outer)."""
+    queryset = (model.objects.filter(**{field: OuterRef(outer)}).order_by()
+                .values(field).annotate(total=Count('pk')).values('total'))
+    return Coalesce(Subquery(queryset), 0)
+
+
+def recount():
+    """Пересчитывает все счётчики агрегатами."""
+    missing = get_user_model().objects.filter(counters__isnull=True)
+    UserCounters.objects.bulk_create(
+        (UserCounters(user_id=user_id)
+         for user_id in missing.values_list('pk', flat=True).iterator()),
+        batch_size=500,
+    )
+    UserCounters.objects.update(
+        posts_count=_count(Post, 'author', 'user_id'),
+        followers_count=_count(Follow, 'author', 'user_id'),
+        following_count=_count(Follow, 'user', 'user_id'),
+    )
+    Group.objects.update(posts_count=_count(Post, 'group'))
+    Post.objects.update(comments_count=_count(Comment, 'post'))
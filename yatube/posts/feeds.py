@@ -0,0 +1,111 @@
+"""Cached index feed of Posts app.
+
+Страницы главной хранятся в кэше под текущим поколением, которое
+сменяется при создании, изменении и удалении постов. После смены
+поколения первые INDEX_PREWARM_PAGES страниц пересчитываются, когда
+ответ уже отдан клиенту (сигнал request_finished). Прогрев идёт
+синхронно в том же воркере и задерживает его следующий запрос, поэтому
+одновременно прогревает только один воркер.
+"""
+
+import hashlib
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.core.signals import request_finished
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.http import urlencode
+
+from . import cache as posts_cache
+from .models import Post
+
+POSTS_PER_PAGE = 10
+
+logger = logging.getLogger(__name__)
+
+_prewarm_pending = threading.Event()
+
+# Блокировка прогрева в общем кэше: пока она взята, другие воркеры
+# прогрев пропускают. Истекает сама, если прогревавший воркер упал.
+PREWARM_LOCK_KEY = posts_cache.cache_key('index', 'prewarm')
+PREWARM_LOCK_TIMEOUT = 60
+
+
+def index_page(page_number=None, refresh=False):
+    """Возвращает страницу главной из кэша текущего поколения."""
+    generation = posts_cache.index_generation()
+    timeout = settings.INDEX_CACHE_TIMEOUT
+    paginator = Paginator(Post.objects.feed(), POSTS_PER_PAGE)
+    count_key = posts_cache.index_key(generation, 'count')
+    count = None if refresh else cache.get(count_key)
+    if count is None:
+        cache.set(count_key, paginator.count, timeout)
+    else:
+        paginator.count = count
+    try:
+        number = paginator.validate_number(page_number)
+    except PageNotAnInteger:
+        number = 1
+    except EmptyPage:
+        number = paginator.num_pages
+    page_key = posts_cache.index_key(generation, f'page:{number}')
+    posts = None if refresh else cache.get(page_key)
+    if posts is None:
+        posts = list(paginator.page(number).object_list)
+        cache.set(page_key, posts, timeout)
+    return Page(posts, number, paginator)
+
+
+def index_page_version(request):
+    """Версия страницы главной для кэша страниц (core.pagecache).
+
+    Меняется со сменой поколения; параметры запроса — номер страницы
+    или курсор — входят в неё. С другими параметрами страница не
+    кэшируется.
+    """
+    params, cacheable = posts_cache.page_params(request)
+    if not cacheable:
+        return None
+    query = urlencode(params)
+    return posts_cache.index_key(
+        posts_cache.index_generation(),
+        'html:' + hashlib.sha256(query.encode()).hexdigest())
+
+
+def invalidate_index():
+    """Сбрасывает кэш главной и планирует его прогрев."""
+    posts_cache.bump_index_generation()
+    transaction.on_commit(_prewarm_pending.set)
+
+
+def prewarm_index():
+    """Заполняет кэш первых страниц главной."""
+    for number in range(1, settings.INDEX_PREWARM_PAGES + 1):
+        page = index_page(number, refresh=True)
+        if not page.has_next():
+            break
+
+
+@receiver(request_finished, dispatch_uid='posts_prewarm_index')
+def prewarm_after_response(sender, **kwargs):
+    """Прогревает главную после отправки ответа, если нужно.
+
+    Выполняется синхронно в потоке воркера, который отдал ответ. Если
+    прогрев уже идёт в другом потоке или процессе, он пропускается, а
+    флаг остаётся: прогреть попробует следующий завершённый запрос.
+    """
+    if not _prewarm_pending.is_set():
+        return
+    if not cache.add(PREWARM_LOCK_KEY, 1, PREWARM_LOCK_TIMEOUT):
+        return
+    _prewarm_pending.clear()
+    try:
+        prewarm_index()
+    except Exception:
+        logger.exception('Не удалось прогреть кэш главной страницы')
+    finally:
+        cache.delete(PREWARM_LOCK_KEY)
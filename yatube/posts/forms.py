@@ -2,7 +2,7 @@
 
 from django import forms
 
-from .models import Comment, Group, Post
+from .models import Comment, Group, Post, User
 
 
 class PostForm(forms.ModelForm):
@@ -47,3 +47,26 @@ class CommentForm(forms.ModelForm):
         if (text_check == '' or text_check.isspace()):
             raise forms.ValidationError("Поле текст не может быть пустым")
         return text_check
+
+
+class SearchForm(forms.Form):
+    """Форма поиска по постам."""
+
+    q = forms.CharField(max_length=200, label='Запрос')
+    group = forms.ModelChoiceField(queryset=Group.objects.all(),
+                                   to_field_name='slug',
+                                   required=False,
+                                   label='Группа',
+                                   empty_label='Все группы')
+    author = forms.CharField(max_length=150, required=False,
+                             label='Автор')
+
+    def clean_author(self):
+        """Заменяет имя автора пользователем."""
+        username = self.cleaned_data['author']
+        if not username:
+            return None
+        author = User.objects.filter(username=username).first()
+        if author is None:
+            raise forms.ValidationError('Автор не найден')
+        return author
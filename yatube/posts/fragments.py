@@ -0,0 +1,44 @@
+"""Per-user fragments of cached Posts app pages."""
+
+from django.template.loader import render_to_string
+
+from core.pagecache import fragment
+
+from .forms import CommentForm
+from .models import Follow
+
+
+@fragment('feed_switcher')
+def feed_switcher(request):
+    """Вкладки «Все авторы» и «Избранные авторы» для вошедших."""
+    return render_to_string('posts/includes/switcher.html', request=request)
+
+
+@fragment('follow_button')
+def follow_button(request, username):
+    """Кнопка подписки на автора или отписки от него."""
+    following = (request.user.is_authenticated
+                 and Follow.objects.filter(
+                     user=request.user, author__username=username).exists())
+    return render_to_string(
+        'posts/includes/follow_button.html',
+        {'username': username, 'following': following}, request=request)
+
+
+@fragment('post_edit')
+def post_edit(request, post_id, author_id):
+    """Кнопка правки поста для его автора."""
+    if str(request.user.pk) != author_id:
+        return ''
+    return render_to_string('posts/includes/post_edit_button.html',
+                            {'post_id': post_id}, request=request)
+
+
+@fragment('comment_form')
+def comment_form(request, post_id):
+    """Форма комментария с CSRF-токеном текущего пользователя."""
+    if not request.user.is_authenticated:
+        return ''
+    return render_to_string(
+        'posts/includes/comment_form.html',
+        {'post_id': post_id, 'form': CommentForm()}, request=request)
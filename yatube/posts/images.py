@@ -0,0 +1,169 @@
+"""Garbage collection of content-addressed post images.
+
+Картинки постов хранятся под именами по хэшу содержимого
+(core.storage.ContentAddressedStorage), поэтому одинаковые загрузки
+разных постов ссылаются на один файл. Счётчик ссылок — число постов с
+этим именем в поле image (по индексу post_image_idx). Когда пост
+удалён или сменил картинку, прежний файл удаляется после коммита, если
+на него больше никто не ссылается, вместе с миниатюрами и задачами
+очереди миниатюр.
+
+Файл, записанный или повторно загруженный менее MEDIA_GC_GRACE секунд
+назад, не удаляется: пост, который на него сошлётся, может быть ещё не
+закоммичен. Такие файлы позже удаляет команда gc_media.
+"""
+
+import logging
+import os
+import posixpath
+import re
+import time
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from . import thumbnails
+from .cache import bump_posts
+from .models import Post, ThumbnailJob
+
+# Имя по хэшу содержимого: posts/3a/7b/3a7b...e1.gif.
+HASHED_NAME_RE = re.compile(
+    r'(?:^|/)([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}(?:\.[^./]+)?$')
+
+logger = logging.getLogger(__name__)
+
+
+def image_storage():
+    return Post._meta.get_field('image').storage
+
+
+def image_directory():
+    return Post._meta.get_field('image').upload_to.strip('/')
+
+
+def is_referenced(name):
+    return Post.objects.filter(image=name).exists()
+
+
+def is_recent(name, grace):
+    storage = image_storage()
+    try:
+        modified = os.path.getmtime(storage.path(name))
+    except FileNotFoundError:
+        return False
+    return time.time() - modified < grace
+
+
+def delete_thumbnails(name):
+    """Удаляет миниатюры картинки, их ключи sorl и задачи очереди."""
+    # Миниатюры создаются по имени в хранилище по умолчанию (run_job).
+    source = ImageFile(name)
+    default.kvstore.delete_thumbnails(source)
+    default.kvstore.delete(source)
+    ThumbnailJob.objects.filter(image=name).delete()
+
+
+def collect(name, grace=None):
+    """Удаляет картинку name, если на неё не ссылается ни один пост.
+
+    Возвращает True, если картинка удалена.
+    """
+    if grace is None:
+        grace = settings.MEDIA_GC_GRACE
+    if not name or is_referenced(name):
+        return False
+    try:
+        if is_recent(name, grace):
+            return False
+    except SuspiciousFileOperation:
+        # Имя вне MEDIA_ROOT: файл не из хранилища картинок.
+        return False
+    delete_thumbnails(name)
+    image_storage().delete(name)
+    logger.info('Удалена картинка без постов %s', name)
+    return True
+
+
+def collect_on_commit(name):
+    """Удаляет картинку после коммита текущей транзакции.
+
+    Ошибка удаления только пишется в лог: пост уже сохранён, а файл
+    потом удалит gc_media.
+    """
+    def collect_logged():
+        try:
+            collect(name)
+        except Exception:
+            logger.exception('Не удалось удалить картинку %s', name)
+
+    transaction.on_commit(collect_logged)
+
+
+def stored_images(directory=None):
+    """Имена файлов каталога картинок по подкаталогам, рекурсивно."""
+    storage = image_storage()
+    directory = image_directory() if directory is None else directory
+    if not storage.exists(directory):
+        return
+    subdirectories, files = storage.listdir(directory)
+    yield [posixpath.join(directory, name) for name in files]
+    for subdirectory in subdirectories:
+        yield from stored_images(posixpath.join(directory, subdirectory))
+
+
+def sweep(grace=None, dry_run=False):
+    """Удаляет картинки, на которые не ссылается ни один пост.
+
+    Возвращает число удалённых файлов и их размер в байтах.
+    """
+    if grace is None:
+        grace = settings.MEDIA_GC_GRACE
+    storage = image_storage()
+    removed = size = 0
+    for names in stored_images():
+        referenced = set(Post.objects.filter(image__in=names)
+                         .values_list('image', flat=True))
+        for name in names:
+            if name in referenced or is_recent(name, grace):
+                continue
+            file_size = storage.size(name)
+            if dry_run or collect(name, grace):
+                removed += 1
+                size += file_size
+    return removed, size
+
+
+def rehash(name):
+    """Переносит картинку со старым именем под имя по хэшу.
+
+    Посты переключаются на новое имя, для него ставятся миниатюры, а
+    старый файл с миниатюрами удаляется. Возвращает новое имя.
+    """
+    storage = image_storage()
+    with transaction.atomic():
+        with storage.open(name) as file:
+            hashed = storage.save(name, file)
+        if hashed == name:
+            return name
+        posts = list(Post.objects.filter(image=name).values_list(
+            'pk', 'author_id', 'group_id'))
+        # update() не трогает auto_now, а по updated_at строятся ETag
+        # API и ключи карточек.
+        Post.objects.filter(image=name).update(
+            image=hashed, updated_at=timezone.now())
+        thumbnails.enqueue(hashed)
+        bump_posts(posts)
+    collect(name, grace=0)
+    return hashed
+
+
+def legacy_images():
+    """Имена картинок постов, сохранённые до хранения по хэшу."""
+    images = (Post.objects.exclude(image='').order_by()
+              .values_list('image', flat=True).distinct())
+    return [name for name in images.iterator()
+            if not HASHED_NAME_RE.search(name)]
@@ -0,0 +1 @@
+"""init.py команд управления приложения Posts."""
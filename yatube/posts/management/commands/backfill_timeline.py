@@ -0,0 +1,34 @@
+"""Management command to rebuild follow timelines."""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import timeline
+from posts.models import Follow
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """Пересобирает материализованные ленты подписок."""
+
+    help = ('Пересобирает материализованные ленты подписок из Follow '
+            'и Post, например после bulk_create или миграции.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', dest='username',
+            help='Пересобрать ленту только этого пользователя.')
+
+    def handle(self, *args, **options):
+        follows = Follow.objects.all()
+        username = options['username']
+        if username:
+            try:
+                user = User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'Пользователь {username} не найден.')
+            follows = follows.filter(user=user)
+        total = timeline.rebuild(follows)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано подписок: {total}'))
@@ -0,0 +1,26 @@
+"""Management command to queue thumbnails of existing images."""
+
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    """Ставит в очередь недостающие миниатюры картинок постов."""
+
+    help = ('Ставит в очередь миниатюры всех картинок постов, например '
+            'после изменения POST_IMAGE_WIDTHS или POST_IMAGE_FORMATS. '
+            'Уже созданные миниатюры повторно не ставятся.')
+
+    def handle(self, *args, **options):
+        # order_by() убирает сортировку Meta.ordering: её поле попало
+        # бы в SELECT и DISTINCT не схлопнул бы одинаковые картинки.
+        images = (Post.objects.exclude(image='').order_by()
+                  .values_list('image', flat=True).distinct())
+        total = 0
+        for image in images.iterator():
+            thumbnails.enqueue(image)
+            total += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Картинок поставлено в очередь: {total}'))
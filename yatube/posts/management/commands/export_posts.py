@@ -0,0 +1,51 @@
+"""Management command to export posts, comments, groups and follows."""
+
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    """Выгружает контент потоком NDJSON или CSV."""
+
+    help = ('Выгружает пользователей, группы, посты, комментарии и '
+            'подписки в NDJSON (файл или stdout) или CSV (каталог с '
+            'файлами <type>.csv), не загружая их в память целиком.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output', nargs='?', default='-',
+            help='Файл NDJSON, каталог для CSV или "-" для stdout.')
+        parser.add_argument(
+            '--format', choices=('ndjson', 'csv'), default='ndjson',
+            help='Формат выгрузки.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Число строк, читаемых из базы за раз.')
+        parser.add_argument(
+            '--media',
+            help='Каталог, в который скопировать картинки постов.')
+        parser.add_argument(
+            '--image-workers', type=int, default=8,
+            help='Число потоков копирования картинок.')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        records = transfer.export_records(options['chunk_size'])
+        if options['format'] == 'csv':
+            if output == '-':
+                raise CommandError('Для CSV укажите каталог выгрузки.')
+            total = transfer.write_csv(records, output)
+        elif output == '-':
+            total = transfer.write_ndjson(records, sys.stdout)
+        else:
+            with open(output, 'w', encoding='utf-8') as stream:
+                total = transfer.write_ndjson(records, stream)
+        if options['media']:
+            images = transfer.export_images(
+                transfer.image_names(options['chunk_size']),
+                options['media'], options['image_workers'])
+            self.stderr.write(f'Картинок скопировано: {images}')
+        self.stderr.write(self.style.SUCCESS(f'Записей выгружено: {total}'))
@@ -0,0 +1,46 @@
+"""Management command to collect unreferenced post images."""
+
+from django.core.management.base import BaseCommand
+
+from posts import images
+
+
+class Command(BaseCommand):
+    """Удаляет картинки постов, на которые не ссылается ни один пост."""
+
+    help = ('Удаляет картинки постов без ссылок из постов вместе с их '
+            'миниатюрами. С --rehash сначала переносит картинки, '
+            'сохранённые до хранения по хэшу содержимого, под новые '
+            'имена; одинаковые картинки при этом объединяются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rehash', action='store_true',
+            help='Перенести картинки со старыми именами под имена по хэшу.')
+        parser.add_argument(
+            '--grace', type=int, default=None,
+            help='Не удалять файлы моложе стольких секунд '
+                 '(по умолчанию MEDIA_GC_GRACE).')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, сколько файлов будет удалено.')
+
+    def handle(self, *args, **options):
+        if options['rehash']:
+            legacy = images.legacy_images()
+            moved = 0
+            for name in legacy:
+                if options['dry_run']:
+                    continue
+                try:
+                    images.rehash(name)
+                except FileNotFoundError:
+                    self.stderr.write(f'Картинка {name} не найдена')
+                    continue
+                moved += 1
+            self.stdout.write(f'Картинок со старыми именами: {len(legacy)}, '
+                              f'перенесено: {moved}')
+        removed, size = images.sweep(options['grace'], options['dry_run'])
+        verb = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} картинок: {removed}, {size} байт'))
@@ -0,0 +1,59 @@
+"""Management command to import posts, comments, groups and follows."""
+
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    """Загружает контент из выгрузки export_posts."""
+
+    help = ('Загружает пользователей, группы, посты, комментарии и '
+            'подписки из NDJSON (файл или stdin) или CSV (каталог с '
+            'файлами <type>.csv) пачками bulk_create.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'input', nargs='?', default='-',
+            help='Файл NDJSON, каталог с CSV или "-" для stdin.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Число записей в одном bulk_create.')
+        parser.add_argument(
+            '--transaction-size', type=int, default=10000,
+            help='Число записей в одной транзакции.')
+        parser.add_argument(
+            '--media',
+            help='Каталог с картинками выгрузки.')
+        parser.add_argument(
+            '--image-workers', type=int, default=8,
+            help='Число потоков копирования картинок.')
+
+    def handle(self, *args, **options):
+        source = options['input']
+        importer = transfer.Importer(
+            batch_size=options['batch_size'],
+            transaction_size=options['transaction_size'],
+            media=options['media'],
+            image_workers=options['image_workers'],
+        )
+        try:
+            if source == '-':
+                counts = importer.run(transfer.read_ndjson(sys.stdin))
+            elif os.path.isdir(source):
+                counts = importer.run(transfer.read_csv(source))
+            else:
+                with open(source, encoding='utf-8') as stream:
+                    counts = importer.run(transfer.read_ndjson(stream))
+        except (transfer.TransferError, IntegrityError, KeyError,
+                ValueError) as error:
+            raise CommandError(f'Загрузка прервана: {error!r}')
+        if importer.missing_images:
+            self.stderr.write(self.style.WARNING(
+                f'Картинок не найдено: {importer.missing_images}'))
+        self.stdout.write(self.style.SUCCESS('Загружено: ' + ', '.join(
+            f'{kind} {count}' for kind, count in counts.items())))
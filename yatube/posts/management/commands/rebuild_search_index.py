@@ -0,0 +1,21 @@
+"""Management command to rebuild the search index."""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import search
+
+
+class Command(BaseCommand):
+    """Заново строит поисковый индекс постов."""
+
+    help = ('Заново строит поисковый индекс постов и комментариев, '
+            'например после смены POSTS_SEARCH_BACKEND.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if search.backend_name() == 'fts5':
+                search.FTS5Index().create()
+            search.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Поисковый индекс ({search.backend_name()}) перестроен'))
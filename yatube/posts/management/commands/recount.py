@@ -0,0 +1,18 @@
+"""Management command to repair denormalized counters."""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    """Пересчитывает денормализованные счётчики."""
+
+    help = ('Пересчитывает счётчики постов, комментариев, подписчиков '
+            'и подписок, если они разошлись с данными.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            counters.recount()
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
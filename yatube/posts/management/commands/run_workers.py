@@ -0,0 +1,45 @@
+"""Management command to run thumbnail workers."""
+
+import os
+from multiprocessing import Pool
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import thumbnails
+
+
+def work(once, interval):
+    # Соединения с базой не переживают fork: каждый воркер открывает своё.
+    connections.close_all()
+    return thumbnails.work(once=once, interval=interval)
+
+
+class Command(BaseCommand):
+    """Запускает воркеры очереди миниатюр."""
+
+    help = ('Создаёт миниатюры картинок постов из очереди ThumbnailJob '
+            'в нескольких процессах.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Число процессов-воркеров.')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Завершиться, когда очередь опустеет.')
+        parser.add_argument(
+            '--interval', type=float, default=1.0,
+            help='Пауза между опросами пустой очереди, секунды.')
+
+    def handle(self, *args, **options):
+        once, interval = options['once'], options['interval']
+        if options['workers'] <= 1:
+            done = thumbnails.work(once=once, interval=interval)
+        else:
+            connections.close_all()
+            with Pool(options['workers']) as pool:
+                done = sum(pool.starmap(
+                    work, [(once, interval)] * options['workers']))
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано миниатюр: {done}'))
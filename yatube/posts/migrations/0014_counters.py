@@ -0,0 +1,69 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:12
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    """Заполняет счётчики агрегатами, как posts.counters.recount()."""
+    def count(model, field, outer='pk'):
+        queryset = (apps.get_model('posts', model).objects
+                    .filter(**{field: OuterRef(outer)}).order_by()
+                    .values(field).annotate(total=Count('pk'))
+                    .values('total'))
+        return Coalesce(Subquery(queryset), 0)
+
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    UserCounters = apps.get_model('posts', 'UserCounters')
+    UserCounters.objects.bulk_create(
+        (UserCounters(user_id=user_id)
+         for user_id in User.objects.values_list('pk', flat=True).iterator()),
+        batch_size=500,
+    )
+    UserCounters.objects.update(
+        posts_count=count('Post', 'author', 'user_id'),
+        followers_count=count('Follow', 'author', 'user_id'),
+        following_count=count('Follow', 'user', 'user_id'),
+    )
+    apps.get_model('posts', 'Group').objects.update(
+        posts_count=count('Post', 'group'))
+    apps.get_model('posts', 'Post').objects.update(
+        comments_count=count('Comment', 'post'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0013_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCounters',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Число постов')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Число подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Число подписок')),
+            ],
+            options={
+                'verbose_name': 'Счётчики пользователя',
+                'verbose_name_plural': 'Счётчики пользователей',
+            },
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число постов'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число комментариев'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
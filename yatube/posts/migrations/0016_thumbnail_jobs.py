@@ -0,0 +1,61 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:23
+
+import json
+
+from django.db import migrations, models
+
+
+def enqueue_existing_images(apps, schema_editor):
+    from posts.thumbnails import THUMBNAIL_VARIANTS
+
+    Post = apps.get_model('posts', 'Post')
+    ThumbnailJob = apps.get_model('posts', 'ThumbnailJob')
+    images = (Post.objects.exclude(image='')
+              .values_list('image', flat=True).distinct())
+    ThumbnailJob.objects.bulk_create(
+        (ThumbnailJob(image=image, geometry=geometry,
+                      options=json.dumps(options, sort_keys=True))
+         for image in images.iterator()
+         for geometry, options in THUMBNAIL_VARIANTS),
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThumbnailJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.CharField(max_length=100, verbose_name='Изображение')),
+                ('geometry', models.CharField(max_length=50, verbose_name='Размер миниатюры')),
+                ('options', models.TextField(default='{}', verbose_name='Параметры миниатюры')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Готово'), ('failed', 'Ошибка')], default='pending', max_length=10, verbose_name='Состояние')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Число попыток')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('started', models.DateTimeField(blank=True, null=True, verbose_name='Дата запуска')),
+            ],
+            options={
+                'verbose_name': 'Задача миниатюры',
+                'verbose_name_plural': 'Задачи миниатюр',
+                'ordering': ['created'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='thumbnailjob',
+            index=models.Index(fields=['status', 'created'], name='thumbnail_job_status_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='thumbnailjob',
+            constraint=models.UniqueConstraint(fields=('image', 'geometry', 'options'), name='unique_thumbnail_job'),
+        ),
+        migrations.RunPython(enqueue_existing_images,
+                             migrations.RunPython.noop),
+    ]
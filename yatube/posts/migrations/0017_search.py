@@ -0,0 +1,75 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:27
+
+# Миграция только создаёт таблицы индекса: заполняет их команда
+# rebuild_search_index, которую нужно выполнить после migrate.
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def uses_fts5(connection):
+    backend = settings.POSTS_SEARCH_BACKEND
+    if backend != 'auto':
+        return backend == 'fts5'
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return ('ENABLE_FTS5',) in cursor.fetchall()
+
+
+def create_search_table(apps, schema_editor):
+    if uses_fts5(schema_editor.connection):
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS posts_search '
+            'USING fts5(text, comments, post_id UNINDEXED, '
+            "tokenize = 'unicode61')")
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_thumbnail_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='posts.Post', verbose_name='Пост')),
+                ('length', models.FloatField(verbose_name='Длина в словах')),
+            ],
+            options={
+                'verbose_name': 'Документ поиска',
+                'verbose_name_plural': 'Документы поиска',
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Основа слова')),
+                ('frequency', models.FloatField(verbose_name='Частота')),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='posts.SearchDocument', verbose_name='Документ')),
+            ],
+            options={
+                'verbose_name': 'Вхождение слова',
+                'verbose_name_plural': 'Вхождения слов',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='searchposting',
+            index=models.Index(fields=['term', 'document'], name='search_posting_term_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='searchposting',
+            constraint=models.UniqueConstraint(fields=('document', 'term'), name='unique_search_posting'),
+        ),
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
@@ -0,0 +1,38 @@
+# Таблица FTS5 пересоздаётся со столбцом post_id для строк
+# комментариев. Миграция её только очищает: индекс заново строит
+# команда rebuild_search_index, которую нужно выполнить после migrate.
+
+from django.conf import settings
+from django.db import migrations
+
+
+def uses_fts5(connection):
+    backend = settings.POSTS_SEARCH_BACKEND
+    if backend != 'auto':
+        return backend == 'fts5'
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return ('ENABLE_FTS5',) in cursor.fetchall()
+
+
+def recreate_search_table(apps, schema_editor):
+    if uses_fts5(schema_editor.connection):
+        schema_editor.execute('DROP TABLE IF EXISTS posts_search')
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE posts_search '
+            'USING fts5(text, comments, post_id UNINDEXED, '
+            "tokenize = 'unicode61')")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_image_storage'),
+    ]
+
+    operations = [
+        migrations.RunPython(recreate_search_table,
+                             migrations.RunPython.noop),
+    ]
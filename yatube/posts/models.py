@@ -5,6 +5,8 @@ from datetime import datetime
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from core.storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -19,6 +21,11 @@ class Group(models.Model):
                                  help_text='Укажите уникальный адрес')
     description: str = models.TextField(verbose_name='Описание группы',
                                         help_text='Опишите группу')
+    posts_count: int = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число постов'
+    )
 
     class Meta:
         """Meta модели Group."""
@@ -31,6 +38,22 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    """QuerySet модели записей."""
+
+    FEED_FIELDS = ('text', 'pub_date', 'updated_at', 'image', 'author',
+                   'group', 'author__username', 'author__first_name',
+                   'author__last_name', 'group__slug')
+
+    def feed(self):
+        """Выборка для лент: автор и группа одним запросом.
+
+        Загружаются только поля, которые выводит карточка поста
+        posts/includes/post_obj.html.
+        """
+        return self.select_related('author', 'group').only(*self.FEED_FIELDS)
+
+
 class Post(models.Model):
     """Модель записей."""
 
@@ -39,6 +62,8 @@ class Post(models.Model):
     pub_date: datetime = models.DateTimeField(auto_now_add=True,
                                               verbose_name='Дата публикации',
                                               help_text='Укажите дату')
+    updated_at: datetime = models.DateTimeField(auto_now=True,
+                                                verbose_name='Дата изменения')
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -57,20 +82,53 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
 
+    comments_count: int = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число комментариев'
+    )
+
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         """Meta модели Post."""
 
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
         verbose_name = 'Сообщение'
         verbose_name_plural = 'Сообщения'
+        indexes = [
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_id_idx'),
+            models.Index(fields=['image'], name='post_image_idx'),
+        ]
 
     def __str__(self):
         """Функция __str__ модели Post."""
         return self.text[:15]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Запоминает группу и картинку из базы.
+
+        Группа нужна для пересчёта счётчиков групп, картинка — чтобы
+        ставить в очередь миниатюры только для нового изображения и
+        удалять прежнее.
+        """
+        instance = super().from_db(db, field_names, values)
+        if 'group_id' in instance.__dict__:
+            instance._loaded_group_id = instance.group_id
+        if 'image' in instance.__dict__:
+            instance._loaded_image = instance.__dict__['image']
+        return instance
+
 
 class Comment(models.Model):
     """Модель комментариев."""
@@ -94,6 +152,14 @@ class Comment(models.Model):
     created: datetime = models.DateTimeField(auto_now_add=True,
                                              verbose_name='Дата подписки')
 
+    class Meta:
+        """Meta модели Comment."""
+
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+        ]
+
 
 class Follow(models.Model):
     """Модель подписок."""
@@ -110,3 +176,181 @@ class Follow(models.Model):
         related_name='following',
         verbose_name='Следят',
     )
+    pull = models.BooleanField(
+        default=False,
+        verbose_name='Без рассылки в ленту',
+        help_text='Посты автора читаются в ленту напрямую, '
+                  'без материализованных записей'
+    )
+
+    class Meta:
+        """Meta модели Follow."""
+
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='unique_follow'),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Модель записи материализованной ленты подписок."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        db_index=False,
+        verbose_name='Автор поста',
+    )
+    pub_date: datetime = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        """Meta модели TimelineEntry."""
+
+        ordering = ['-pub_date']
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', 'post'],
+                         name='timeline_user_pub_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='timeline_user_author_idx'),
+        ]
+
+
+class UserCounters(models.Model):
+    """Модель денормализованных счётчиков пользователя."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь',
+    )
+    posts_count: int = models.PositiveIntegerField(
+        default=0, verbose_name='Число постов')
+    followers_count: int = models.PositiveIntegerField(
+        default=0, verbose_name='Число подписчиков')
+    following_count: int = models.PositiveIntegerField(
+        default=0, verbose_name='Число подписок')
+
+    class Meta:
+        """Meta модели UserCounters."""
+
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+
+class ThumbnailJob(models.Model):
+    """Модель задачи на создание миниатюры изображения."""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    image: str = models.CharField(max_length=100,
+                                  verbose_name='Изображение')
+    geometry: str = models.CharField(max_length=50,
+                                     verbose_name='Размер миниатюры')
+    options: str = models.TextField(default='{}',
+                                    verbose_name='Параметры миниатюры')
+    status: str = models.CharField(max_length=10,
+                                   choices=STATUS_CHOICES,
+                                   default=PENDING,
+                                   verbose_name='Состояние')
+    attempts: int = models.PositiveSmallIntegerField(
+        default=0, verbose_name='Число попыток')
+    error: str = models.TextField(blank=True, verbose_name='Ошибка')
+    created: datetime = models.DateTimeField(auto_now_add=True,
+                                             verbose_name='Дата создания')
+    started: datetime = models.DateTimeField(null=True, blank=True,
+                                             verbose_name='Дата запуска')
+
+    class Meta:
+        """Meta модели ThumbnailJob."""
+
+        ordering = ['created']
+        verbose_name = 'Задача миниатюры'
+        verbose_name_plural = 'Задачи миниатюр'
+        constraints = [
+            models.UniqueConstraint(fields=['image', 'geometry', 'options'],
+                                    name='unique_thumbnail_job'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'created'],
+                         name='thumbnail_job_status_idx'),
+        ]
+
+    def __str__(self):
+        """Функция __str__ модели ThumbnailJob."""
+        return f'{self.image} {self.geometry}'
+
+
+class SearchDocument(models.Model):
+    """Модель документа поискового индекса без FTS5."""
+
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+',
+        verbose_name='Пост',
+    )
+    length: float = models.FloatField(verbose_name='Длина в словах')
+
+    class Meta:
+        """Meta модели SearchDocument."""
+
+        verbose_name = 'Документ поиска'
+        verbose_name_plural = 'Документы поиска'
+
+
+class SearchPosting(models.Model):
+    """Модель вхождения основы слова в документ поиска."""
+
+    document = models.ForeignKey(
+        SearchDocument,
+        on_delete=models.CASCADE,
+        related_name='postings',
+        verbose_name='Документ',
+    )
+    term: str = models.CharField(max_length=64, verbose_name='Основа слова')
+    frequency: float = models.FloatField(verbose_name='Частота')
+
+    class Meta:
+        """Meta модели SearchPosting."""
+
+        verbose_name = 'Вхождение слова'
+        verbose_name_plural = 'Вхождения слов'
+        constraints = [
+            models.UniqueConstraint(fields=['document', 'term'],
+                                    name='unique_search_posting'),
+        ]
+        indexes = [
+            models.Index(fields=['term', 'document'],
+                         name='search_posting_term_idx'),
+        ]
@@ -0,0 +1,236 @@
+"""Keyset (cursor) pagination for Posts feeds."""
+
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Max, Min, Q
+from django.utils.functional import cached_property
+
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+class InvalidCursor(Exception):
+    """Курсор страницы не удалось разобрать."""
+
+
+def pack_cursor(payload):
+    """Кодирует данные позиции в JSON в непрозрачный токен."""
+    data = json.dumps(payload, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def unpack_cursor(cursor):
+    """Данные позиции из токена pack_cursor."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (TypeError, ValueError, binascii.Error):
+        raise InvalidCursor(cursor)
+
+
+class CursorPaginator:
+    """Паджинатор по ключу сортировки вместо OFFSET/COUNT.
+
+    Следующая страница выбирается условием по паре полей сортировки,
+    поэтому стоимость запроса не зависит от глубины страницы.
+    """
+
+    cursor_mode = True
+
+    def __init__(self, queryset, per_page,
+                 ordering=('-pub_date', '-id'), count_limit=None):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.descending = self.ordering[0].startswith('-')
+        if any(name.startswith('-') != self.descending
+               for name in self.ordering):
+            raise ValueError('Все поля сортировки курсора должны '
+                             'сортироваться в одном направлении.')
+        opts = queryset.model._meta
+        self.fields = [opts.pk if name.lstrip('-') == 'pk'
+                       else opts.get_field(name.lstrip('-'))
+                       for name in self.ordering]
+        self.count_limit = count_limit
+
+    def encode_cursor(self, obj, direction):
+        """Кодирует позицию объекта в непрозрачный токен."""
+        values = [field.value_to_string(obj) for field in self.fields]
+        return pack_cursor([direction, values])
+
+    def decode_cursor(self, cursor):
+        """Возвращает направление и значения полей из токена."""
+        try:
+            direction, values = unpack_cursor(cursor)
+            if (direction not in (FORWARD, BACKWARD)
+                    or len(values) != len(self.fields)):
+                raise InvalidCursor(cursor)
+            values = [field.to_python(value)
+                      for field, value in zip(self.fields, values)]
+        except (TypeError, ValueError, ValidationError):
+            raise InvalidCursor(cursor)
+        if any(value is None for value in values):
+            raise InvalidCursor(cursor)
+        return direction, values
+
+    def _seek(self, values, after):
+        """Условие «строго после/до» позиции для составного ключа.
+
+        Нестрогое условие на первое поле дублирует OR-цепочку, чтобы
+        планировщик видел диапазон по индексу сортировки.
+        """
+        lookup = 'lt' if self.descending == after else 'gt'
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.fields, values):
+            condition |= Q(**equal, **{f'{field.attname}__{lookup}': value})
+            equal[field.attname] = value
+        first = self.fields[0].attname
+        return Q(**{f'{first}__{lookup}e': values[0]}) & condition
+
+    def _ordered(self, reverse):
+        descending = self.descending != reverse
+        return self.queryset.order_by(*(
+            ('-' if descending else '') + field.attname
+            for field in self.fields))
+
+    def seek(self, values, forward=True):
+        """QuerySet объектов после (или до) позиции values."""
+        return self._ordered(not forward).filter(
+            self._seek(values, after=forward))
+
+    def page(self, cursor=None):
+        """Возвращает страницу, следующую за курсором."""
+        if not cursor:
+            rows = list(self._ordered(False)[:self.per_page + 1])
+            return CursorPage(rows[:self.per_page], self,
+                              has_next=len(rows) > self.per_page,
+                              has_previous=False)
+        direction, values = self.decode_cursor(cursor)
+        forward = direction == FORWARD
+        rows = list(self.seek(values, forward)[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if forward:
+            return CursorPage(rows, self, has_next=more, has_previous=True)
+        rows.reverse()
+        return CursorPage(rows, self, has_next=True, has_previous=more)
+
+    def get_page(self, cursor=None):
+        """Как page(), но с первой страницей при испорченном курсоре."""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+    @cached_property
+    def estimated_count(self):
+        """Число объектов, посчитанное не дальше count_limit.
+
+        Возвращает None, если оценка отключена.
+        """
+        if self.count_limit is None:
+            return None
+        return self.queryset.order_by()[:self.count_limit + 1].count()
+
+    @property
+    def count_exceeds_limit(self):
+        """Реальное число объектов больше count_limit."""
+        estimated = self.estimated_count
+        return estimated is not None and estimated > self.count_limit
+
+
+class CursorPage(Sequence):
+    """Страница курсорного паджинатора."""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self.object_list)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next and bool(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous and bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return self.paginator.encode_cursor(self.object_list[-1], FORWARD)
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous():
+            return None
+        return self.paginator.encode_cursor(self.object_list[0], BACKWARD)
+
+
+class EstimatedCountPaginator(Paginator):
+    """Паджинатор без точного COUNT(*) на больших выборках.
+
+    Объекты считаются не дальше count_limit. Если их больше, число
+    строк всей таблицы оценивается по разнице крайних первичных ключей
+    (два поиска по индексу), а отфильтрованной выборки — берётся
+    равным count_limit.
+
+    number — запрошенная страница. Если она доходит до count_limit,
+    отфильтрованная выборка считается точно: иначе страницы за
+    пределом были бы недоступны.
+
+    После удалений оценка по ключам больше настоящего числа строк, и
+    последние страницы по ней пусты. Тогда объекты считаются точно, а
+    номер за концом заменяется последней страницей.
+    """
+
+    def __init__(self, object_list, per_page, count_limit=10000,
+                 number=1, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_limit = count_limit
+        self.number = number
+        self.estimated = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list.order_by()
+        count = queryset[:self.count_limit + 1].count()
+        if count <= self.count_limit:
+            return count
+        if queryset.query.where:
+            if self.number * self.per_page >= self.count_limit:
+                return queryset.count()
+            return self.count_limit
+        bounds = queryset.aggregate(first=Min('pk'), last=Max('pk'))
+        self.estimated = True
+        return max(bounds['last'] - bounds['first'] + 1, count)
+
+    def page(self, number):
+        page = super().page(number)
+        if page.object_list or page.number == 1 or not self.estimated:
+            return page
+        # Оценка завышена: считаем точно и сбрасываем зависящие от неё
+        # cached_property.
+        self.estimated = False
+        self.__dict__['count'] = self.object_list.count()
+        self.__dict__.pop('num_pages', None)
+        self.__dict__.pop('page_range', None)
+        return super().page(min(page.number, self.num_pages))
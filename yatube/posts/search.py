@@ -0,0 +1,394 @@
+"""Full-text search over posts and comments.
+
+Текст постов и их комментариев разбивается на слова и приводится к
+основам стеммером Snowball для русского языка. Основы хранятся в
+обратном индексе:
+
+* на SQLite с FTS5 — в виртуальной таблице posts_search, по строке на
+  пост (rowid — id поста) и на комментарий (rowid — минус id
+  комментария). Оценка поста — сумма оценок BM25 его строк, её
+  считает сама SQLite;
+* иначе — в таблицах SearchDocument и SearchPosting, а BM25 считается
+  на Python по спискам вхождений искомых основ.
+
+Индекс обновляется сигналами при изменении постов и комментариев.
+Комментарий добавляется в индекс и убирается из него отдельно от
+остальных комментариев поста, поэтому запись комментария к посту с
+тысячами комментариев разбирает только его собственный текст.
+Результаты отдаются страницами с курсором по паре (оценка, id).
+"""
+
+import math
+import re
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+import snowballstemmer
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db import connection
+from django.db.models import Avg, Count, F
+
+from .models import Post
+from .pagination import InvalidCursor, pack_cursor, unpack_cursor
+
+FTS_TABLE = 'posts_search'
+
+# Вес слов комментариев относительно слов самого поста.
+COMMENTS_WEIGHT = 0.5
+
+# Параметры BM25 (такие же, как у функции bm25() в FTS5).
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+MAX_TERMS = 16
+BATCH_SIZE = 1000
+
+# Число основ в кэше стеммера: частые слова повторяются из текста в текст.
+STEM_CACHE_SIZE = 100000
+
+WORD_RE = re.compile(r'\w+')
+
+_stemmer = snowballstemmer.stemmer('russian')
+_stem = lru_cache(maxsize=STEM_CACHE_SIZE)(_stemmer.stemWord)
+
+
+def tokenize(text):
+    """Основы слов текста в нижнем регистре."""
+    words = WORD_RE.findall(text.lower().replace('ё', 'е'))
+    return [_stem(word) for word in words]
+
+
+def query_terms(query):
+    """Уникальные основы слов запроса в исходном порядке."""
+    terms = (term[:64] for term in tokenize(query))
+    return list(dict.fromkeys(terms))[:MAX_TERMS]
+
+
+@lru_cache(maxsize=None)
+def fts5_available():
+    """Проверяет, что SQLite собрана с модулем FTS5."""
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return ('ENABLE_FTS5',) in cursor.fetchall()
+
+
+def backend_name():
+    """Имя используемого индекса: 'fts5' или 'postings'."""
+    name = settings.POSTS_SEARCH_BACKEND
+    if name == 'auto':
+        return 'fts5' if fts5_available() else 'postings'
+    return name
+
+
+def _documents(apps, post_ids=None):
+    """Id поста, основы текста и пары (id комментария, основы)."""
+    post_model = apps.get_model('posts', 'Post')
+    comment_model = apps.get_model('posts', 'Comment')
+    posts = post_model.objects.order_by('pk').values_list('pk', 'text')
+    if post_ids is not None:
+        posts = posts.filter(pk__in=post_ids)
+    last_pk = 0
+    while True:
+        batch = list(posts.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not batch:
+            return
+        comments = defaultdict(list)
+        for pk, post_id, text in (comment_model.objects
+                                  .filter(post_id__in=[pk for pk, _ in batch])
+                                  .order_by('pk')
+                                  .values_list('pk', 'post_id', 'text')):
+            comments[post_id].append((pk, tokenize(text)))
+        for pk, text in batch:
+            yield pk, tokenize(text), comments[pk]
+        last_pk = batch[-1][0]
+
+
+class FTS5Index:
+    """Индекс в виртуальной таблице FTS5."""
+
+    def create(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+                f'USING fts5(text, comments, post_id UNINDEXED, '
+                f"tokenize = 'unicode61')")
+
+    def drop(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    def store(self, documents):
+        rows = []
+        with connection.cursor() as cursor:
+            for pk, text, comments in documents:
+                rows.append((pk, ' '.join(text), '', pk))
+                rows.extend((-comment_id, '', ' '.join(terms), pk)
+                            for comment_id, terms in comments)
+                if len(rows) >= BATCH_SIZE:
+                    self._store_rows(cursor, rows)
+                    rows = []
+            if rows:
+                self._store_rows(cursor, rows)
+
+    def _store_rows(self, cursor, rows):
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [(rowid,) for rowid, _, _, _ in rows])
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, text, comments, post_id) '
+            f'VALUES (%s, %s, %s, %s)', rows)
+
+    def delete(self, post_id):
+        # Строки комментариев убирают сигналы удаления комментариев.
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [post_id])
+
+    def add_comment(self, post_id, comment_id, terms):
+        with connection.cursor() as cursor:
+            self._store_rows(cursor, [(-comment_id, '', ' '.join(terms),
+                                       post_id)])
+
+    def remove_comment(self, post_id, comment_id, terms):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [-comment_id])
+
+    def search(self, terms, filters, after, limit):
+        # LIMIT -1 не даёт SQLite встроить подзапрос с bm25() в
+        # группировку: вне запроса MATCH функция недоступна.
+        hits = (f'SELECT post_id, SUM(score) AS score FROM ('
+                f'SELECT post_id, bm25({FTS_TABLE}, 1.0, {COMMENTS_WEIGHT}) '
+                f'AS score FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'LIMIT -1) GROUP BY post_id')
+        params = [' OR '.join(f'"{term}"' for term in terms)]
+        conditions = []
+        if len(terms) > 1:
+            # Каждое слово должно найтись в посте или его комментариях.
+            for term in terms:
+                conditions.append(
+                    f'hits.post_id IN (SELECT post_id FROM {FTS_TABLE} '
+                    f'WHERE {FTS_TABLE} MATCH %s)')
+                params.append(f'"{term}"')
+        for column, value in filters.items():
+            conditions.append(f'post.{column} = %s')
+            params.append(value)
+        if after is not None:
+            conditions.append('(hits.score > %s OR (hits.score = %s '
+                              'AND hits.post_id > %s))')
+            params.extend([after[0], after[0], after[1]])
+        params.append(limit)
+        where = f'WHERE {" AND ".join(conditions)} ' if conditions else ''
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT hits.post_id, hits.score FROM ({hits}) hits '
+                f'JOIN {Post._meta.db_table} post '
+                f'ON post.id = hits.post_id '
+                f'{where}ORDER BY hits.score, hits.post_id LIMIT %s',
+                params)
+            return cursor.fetchall()
+
+
+class PostingsIndex:
+    """Индекс в обычных таблицах; BM25 считается на Python."""
+
+    def __init__(self, apps=global_apps):
+        self.Document = apps.get_model('posts', 'SearchDocument')
+        self.Posting = apps.get_model('posts', 'SearchPosting')
+
+    def clear(self):
+        self.Posting.objects.all().delete()
+        self.Document.objects.all().delete()
+
+    def store(self, documents):
+        for pk, text, comments in documents:
+            frequencies = Counter(term[:64] for term in text)
+            length = len(text)
+            for _, terms in comments:
+                for term in terms:
+                    frequencies[term[:64]] += COMMENTS_WEIGHT
+                length += COMMENTS_WEIGHT * len(terms)
+            self.delete(pk)
+            self.Document.objects.create(post_id=pk, length=length)
+            self.Posting.objects.bulk_create(
+                self.Posting(document_id=pk, term=term, frequency=frequency)
+                for term, frequency in frequencies.items())
+
+    def delete(self, post_id):
+        self.Document.objects.filter(post_id=post_id).delete()
+
+    def add_comment(self, post_id, comment_id, terms):
+        self._change_comment(post_id, terms, COMMENTS_WEIGHT)
+
+    def remove_comment(self, post_id, comment_id, terms):
+        self._change_comment(post_id, terms, -COMMENTS_WEIGHT)
+
+    def _change_comment(self, post_id, terms, weight):
+        """Прибавляет к документу поста вхождения слов комментария."""
+        if not self.Document.objects.filter(post_id=post_id).update(
+                length=F('length') + weight * len(terms)):
+            return
+        frequencies = Counter(term[:64] for term in terms)
+        postings = self.Posting.objects.filter(document_id=post_id)
+        existing = set(postings.filter(term__in=frequencies)
+                       .values_list('term', flat=True))
+        # Один UPDATE на каждое встречающееся в комментарии число
+        # повторов слова, а не на каждое слово.
+        by_count = defaultdict(list)
+        for term in existing:
+            by_count[frequencies[term]].append(term)
+        for count, group in by_count.items():
+            postings.filter(term__in=group).update(
+                frequency=F('frequency') + weight * count)
+        if weight > 0:
+            self.Posting.objects.bulk_create(
+                self.Posting(document_id=post_id, term=term,
+                             frequency=weight * count)
+                for term, count in frequencies.items()
+                if term not in existing)
+        else:
+            postings.filter(term__in=existing, frequency__lte=0).delete()
+
+    def search(self, terms, filters, after, limit):
+        total = self.Document.objects.count()
+        if not total:
+            return []
+        average = self.Document.objects.aggregate(
+            length=Avg('length'))['length'] or 1
+        postings = self.Posting.objects.filter(term__in=terms)
+        frequencies = defaultdict(dict)
+        lengths = {}
+        candidates = postings.filter(**{
+            f'document__post__{column}': value
+            for column, value in filters.items()})
+        for post_id, term, frequency, length in candidates.values_list(
+                'document_id', 'term', 'frequency', 'document__length'):
+            frequencies[post_id][term] = frequency
+            lengths[post_id] = length
+        counts = dict(postings.order_by().values_list('term')
+                      .annotate(count=Count('pk')))
+        results = []
+        for post_id, found in frequencies.items():
+            if len(found) < len(terms):
+                continue
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[post_id]
+                              / average)
+            score = 0.0
+            for term, frequency in found.items():
+                idf = math.log(1 + (total - counts[term] + 0.5)
+                               / (counts[term] + 0.5))
+                score -= idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+            if after is None or (score, post_id) > tuple(after):
+                results.append((post_id, score))
+        results.sort(key=lambda result: (result[1], result[0]))
+        return results[:limit]
+
+
+def get_index(apps=global_apps):
+    if backend_name() == 'fts5':
+        return FTS5Index()
+    return PostingsIndex(apps)
+
+
+def index_posts(post_ids):
+    """Обновляет записи индекса для постов."""
+    get_index().store(_documents(global_apps, post_ids))
+
+
+def delete_post(post_id):
+    """Убирает пост из индекса."""
+    get_index().delete(post_id)
+
+
+def index_comment(comment):
+    """Добавляет комментарий в индекс его поста."""
+    get_index().add_comment(comment.post_id, comment.pk,
+                            tokenize(comment.text))
+
+
+def unindex_comment(comment, text=None):
+    """Убирает из индекса комментарий с текстом text (по умолчанию —
+    текущим)."""
+    get_index().remove_comment(
+        comment.post_id, comment.pk,
+        tokenize(comment.text if text is None else text))
+
+
+def rebuild(apps=global_apps):
+    """Заново строит индекс для всех постов."""
+    index = get_index(apps)
+    index.clear()
+    index.store(_documents(apps))
+
+
+def encode_cursor(score, post_id):
+    return pack_cursor([score, post_id])
+
+
+def decode_cursor(cursor):
+    try:
+        score, post_id = unpack_cursor(cursor)
+        return float(score), int(post_id)
+    except (TypeError, ValueError):
+        raise InvalidCursor(cursor)
+
+
+class SearchPage:
+    """Страница результатов поиска."""
+
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def search_post_ids(query, limit):
+    """Id самых релевантных постов по запросу, не больше limit."""
+    terms = query_terms(query)
+    if not terms:
+        return []
+    return [post_id for post_id, _ in
+            get_index().search(terms, {}, None, limit)]
+
+
+def search_posts(query, group=None, author=None, cursor=None,
+                 per_page=10):
+    """Ищет посты по словам запроса; все слова обязательны.
+
+    Посты упорядочены по убыванию релевантности BM25. Испорченный
+    курсор даёт первую страницу.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return SearchPage([], None)
+    filters = {}
+    if group is not None:
+        filters['group_id'] = group.pk
+    if author is not None:
+        filters['author_id'] = author.pk
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except InvalidCursor:
+        after = None
+    rows = get_index().search(terms, filters, after, per_page + 1)
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+    posts = Post.objects.feed().in_bulk([post_id for post_id, _ in rows])
+    return SearchPage([posts[post_id] for post_id, _ in rows
+                       if post_id in posts], next_cursor)
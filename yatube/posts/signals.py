@@ -0,0 +1,225 @@
+"""Signal handlers of Posts app."""
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import counters, images, search, thumbnails, timeline
+from .cache import bump_version
+from .conditional import CARDS
+from .feeds import invalidate_index
+from .models import Comment, Follow, Group, Post, UserCounters
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Post)
+def push_post_to_timelines(sender, instance, created, raw=False, **kwargs):
+    """Рассылает новый пост по лентам подписчиков."""
+    if created and not raw:
+        timeline.fan_out_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def fill_timeline_on_follow(sender, instance, created, raw=False,
+                            **kwargs):
+    """Добавляет в ленту посты автора при подписке."""
+    if created and not raw:
+        timeline.add_follow(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def clear_timeline_on_unfollow(sender, instance, **kwargs):
+    """Убирает из ленты посты автора при отписке."""
+    timeline.remove_follow(instance)
+
+
+@receiver(post_save, sender=User)
+def create_user_counters(sender, instance, created, raw=False, **kwargs):
+    """Создаёт счётчики новому пользователю."""
+    if created and not raw:
+        UserCounters.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, raw=False, **kwargs):
+    """Запоминает прежнюю группу поста, не загруженного из базы."""
+    if raw or instance._state.adding or hasattr(instance, '_loaded_group_id'):
+        return
+    instance._loaded_group_id = (
+        Post.objects.filter(pk=instance.pk)
+        .values_list('group_id', flat=True).first())
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_feeds(sender, instance, raw=False, **kwargs):
+    """Сдвигает отметки лент автора и групп поста (прежней и новой)."""
+    if raw:
+        return
+    bump_version('author_feed', instance.author_id)
+    for group_id in {instance.group_id,
+                     getattr(instance, '_loaded_group_id', None)}:
+        if group_id:
+            bump_version('group_feed', group_id)
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, raw=False, **kwargs):
+    """Обновляет счётчики постов автора и группы."""
+    if raw:
+        return
+    if created:
+        counters.post_added(instance)
+    elif instance._loaded_group_id != instance.group_id:
+        counters.post_moved(instance._loaded_group_id, instance.group_id)
+    instance._loaded_group_id = instance.group_id
+
+
+@receiver(post_save, sender=Post)
+def collect_replaced_image(sender, instance, created, raw=False, **kwargs):
+    """Удаляет прежнюю картинку поста, если она больше не нужна.
+
+    Должен выполняться до enqueue_post_thumbnails, который запоминает
+    новую картинку.
+    """
+    loaded = getattr(instance, '_loaded_image', None)
+    if raw or created or not loaded or loaded == instance.image.name:
+        return
+    images.collect_on_commit(loaded)
+
+
+@receiver(post_save, sender=Post)
+def enqueue_post_thumbnails(sender, instance, raw=False, **kwargs):
+    """Ставит в очередь миниатюры новой картинки поста."""
+    if raw:
+        return
+    if (instance.image
+            and instance.image.name != getattr(instance, '_loaded_image',
+                                               None)):
+        thumbnails.enqueue(instance.image.name)
+    instance._loaded_image = instance.image.name
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    """Уменьшает счётчики постов автора и группы."""
+    counters.post_added(instance, delta=-1)
+
+
+@receiver(post_delete, sender=Post)
+def collect_post_image(sender, instance, **kwargs):
+    """Удаляет картинку удалённого поста, если она больше не нужна."""
+    if instance.image:
+        images.collect_on_commit(instance.image.name)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    """Увеличивает счётчик комментариев поста."""
+    if created and not raw:
+        counters.comment_added(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    """Уменьшает счётчик комментариев поста."""
+    counters.comment_added(instance, delta=-1)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, raw=False, **kwargs):
+    """Увеличивает счётчики подписчиков и подписок."""
+    if created and not raw:
+        counters.follow_added(instance)
+        invalidate_follow_feeds(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    """Уменьшает счётчики подписчиков и подписок."""
+    counters.follow_added(instance, delta=-1)
+    invalidate_follow_feeds(instance)
+
+
+def invalidate_follow_feeds(follow):
+    """Сдвигает отметки профилей: у обоих изменились счётчики и кнопка."""
+    bump_version('author_feed', follow.author_id)
+    bump_version('author_feed', follow.user_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_cards(sender, instance, **kwargs):
+    """Сбрасывает карточку изменённого поста и кэш главной."""
+    bump_version('post', instance.pk)
+    invalidate_index()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_cards(sender, instance, **kwargs):
+    """Сбрасывает карточки постов изменённой группы и кэш главной."""
+    bump_version('group', instance.pk)
+    bump_version(*CARDS)
+    invalidate_index()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cards(sender, instance, created=False,
+                          update_fields=None, **kwargs):
+    """Сбрасывает карточки постов изменённого автора и кэш главной.
+
+    У нового пользователя постов нет, а сохранение одного last_login
+    при входе карточки не меняет.
+    """
+    if created or (update_fields is not None
+                   and set(update_fields) == {'last_login'}):
+        return
+    bump_version('user', instance.pk)
+    bump_version(*CARDS)
+    invalidate_index()
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, **kwargs):
+    """Обновляет пост в поисковом индексе."""
+    if not raw:
+        search.index_posts([instance.pk])
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    """Убирает пост из поискового индекса."""
+    search.delete_post(instance.pk)
+
+
+@receiver(pre_save, sender=Comment)
+def remember_comment_text(sender, instance, raw=False, **kwargs):
+    """Запоминает прежний текст изменяемого комментария."""
+    if raw or instance._state.adding or hasattr(instance, '_loaded_text'):
+        return
+    instance._loaded_text = (
+        Comment.objects.filter(pk=instance.pk)
+        .values_list('text', flat=True).first())
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, created, raw=False, **kwargs):
+    """Добавляет комментарий в поисковый индекс его поста."""
+    if raw:
+        return
+    loaded = None if created else getattr(instance, '_loaded_text', None)
+    if loaded == instance.text:
+        return
+    if loaded is not None:
+        search.unindex_comment(instance, loaded)
+    search.index_comment(instance)
+    instance._loaded_text = instance.text
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, **kwargs):
+    """Убирает комментарий из поискового индекса."""
+    search.unindex_comment(instance)
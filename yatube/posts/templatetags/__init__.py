@@ -0,0 +1 @@
+"""init.py шаблонных тегов приложения Posts."""
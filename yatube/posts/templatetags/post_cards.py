@@ -0,0 +1,66 @@
+"""Write your Posts template tags here."""
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from posts import thumbnails
+from posts.cache import post_card_key
+
+register = template.Library()
+
+CARD_TEMPLATE = 'posts/includes/post_obj.html'
+
+
+@register.simple_tag
+def post_card(post, group_check=False, profile_check=False):
+    """Выводит карточку поста из кэша фрагментов.
+
+    Карточка не зависит от пользователя, поэтому одна и та же копия
+    отдаётся на главной, в группах, профилях и ленте подписок.
+    """
+    key = post_card_key(post, group_check, profile_check)
+    html = cache.get(key)
+    if html is None:
+        html = render_to_string(CARD_TEMPLATE, {
+            'post': post,
+            'group_check': group_check,
+            'profile_check': profile_check,
+        })
+        cache.set(key, html, settings.POST_CARD_CACHE_TIMEOUT)
+    return mark_safe(html)
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def post_picture(image, css_class='card-img my-2'):
+    """Выводит картинку поста тегом <picture> с набором ширин.
+
+    Браузер выбирает формат из <source> и ширину по srcset и sizes.
+    Пока воркеры не создали миниатюры, выводится оригинал картинки.
+    """
+    if not image:
+        return {'image': None}
+    sources = thumbnails.picture_sources(image)
+    context = {
+        'image': image,
+        'css_class': css_class,
+        'sizes': settings.POST_IMAGE_SIZES,
+        'sources': [
+            {'type': thumbnails.MIME_TYPES[image_format],
+             'srcset': ', '.join(f'{thumbnail.url} {thumbnail.width}w'
+                                 for thumbnail in variants)}
+            for image_format, variants in sources
+        ],
+    }
+    if sources:
+        # Запасная картинка для браузеров без <picture> — в последнем,
+        # самом совместимом формате, наибольшей ширины не больше
+        # POST_IMAGE_FALLBACK_WIDTH.
+        variants = sources[-1][1]
+        fallback = [thumbnail for thumbnail in variants if thumbnail.width
+                    <= settings.POST_IMAGE_FALLBACK_WIDTH]
+        context['fallback'] = (fallback or variants)[-1]
+        context['srcset'] = context['sources'].pop()['srcset']
+    return context
@@ -0,0 +1,148 @@
+from unittest import mock
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Group, Post
+from posts.pagination import EstimatedCountPaginator
+
+User = get_user_model()
+
+
+class PostAdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for number in range(30):
+            Post.objects.create(
+                text=f'Тестовый пост {number}',
+                author=User.objects.create(username=f'author{number}'),
+                group=cls.group if number % 2 else None,
+            )
+        Post.objects.create(text='Пушкин писал стихи', author=cls.admin)
+
+    def setUp(self):
+        self.admin_client = Client()
+        self.admin_client.force_login(self.admin)
+        self.url = reverse('admin:posts_post_changelist')
+
+    def queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.admin_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return context.captured_queries, response
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Число запросов списка постов не зависит от числа строк."""
+        few, _ = self.queries(
+            self.url + '?pub_date__gte=2100-01-01+00:00%2B00:00')
+        many, _ = self.queries(self.url)
+        self.assertEqual(len(few), len(many))
+        self.assertFalse(
+            [query for query in many
+             if 'FROM "posts_group"' in query['sql']],
+            'Группы загружаются отдельным запросом')
+
+    @override_settings(POSTS_ADMIN_COUNT_LIMIT=10)
+    def test_changelist_count_is_bounded(self):
+        """Список считает посты не дальше предела."""
+        queries, response = self.queries(self.url)
+        self.assertFalse(
+            [query for query in queries
+             if query['sql'].startswith('SELECT COUNT(*) AS "__count" '
+                                        'FROM "posts_post"')],
+            'Выполнен полный COUNT(*) постов')
+        self.assertEqual(response.context['cl'].result_count, 31)
+
+    @override_settings(POSTS_ADMIN_COUNT_LIMIT=10)
+    def test_filtered_pages_past_limit_reachable(self):
+        """Страницы отфильтрованного списка за пределом открываются."""
+        post_admin = admin.site._registry[Post]
+        with mock.patch.object(post_admin, 'list_per_page', 5):
+            _, response = self.queries(
+                self.url + '?pub_date__gte=2000-01-01+00:00%2B00:00&p=4')
+        self.assertEqual(response.context['cl'].result_count, 31)
+        self.assertEqual(len(response.context['cl'].result_list), 5)
+
+    def test_form_pages_do_not_open_transactions(self):
+        """GET форм изменения и удаления не открывает транзакцию, POST —
+        открывает (внутри TestCase atomic() виден как SAVEPOINT)."""
+        post = Post.objects.get(text='Пушкин писал стихи')
+        urls = (reverse('admin:posts_post_add'),
+                reverse('admin:posts_post_change', args=[post.pk]),
+                reverse('admin:posts_post_delete', args=[post.pk]))
+        for url in urls:
+            with self.subTest(url=url):
+                queries, _ = self.queries(url)
+                self.assertFalse([query for query in queries
+                                  if 'SAVEPOINT' in query['sql']])
+        with CaptureQueriesContext(connection) as context:
+            self.admin_client.post(urls[2], {'post': 'yes'})
+        self.assertTrue([query for query in context.captured_queries
+                         if 'SAVEPOINT' in query['sql']])
+        self.assertFalse(Post.objects.filter(pk=post.pk).exists())
+
+    def test_search_uses_index(self):
+        """Поиск в админке находит формы слов через индекс."""
+        _, response = self.queries(self.url + '?q=стихами')
+        self.assertEqual(list(response.context['cl'].result_list),
+                         list(Post.objects.filter(text__contains='Пушкин')))
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create(username='author')
+        for number in range(15):
+            Post.objects.create(text=f'Тестовый пост {number}',
+                                author=author)
+
+    def test_exact_count_below_limit(self):
+        """До предела число объектов точное."""
+        paginator = EstimatedCountPaginator(Post.objects.all(), 10,
+                                            count_limit=100)
+        self.assertEqual(paginator.count, 15)
+
+    def test_estimated_count_above_limit(self):
+        """Выше предела число оценивается, выборка с фильтром — урезается."""
+        Post.objects.filter(pk=Post.objects.order_by('pk')[5].pk).delete()
+        paginator = EstimatedCountPaginator(Post.objects.all(), 10,
+                                            count_limit=5)
+        self.assertEqual(paginator.count, 15,
+                         'Оценка по крайним ключам неверна')
+        paginator = EstimatedCountPaginator(
+            Post.objects.filter(text__startswith='Тестовый'), 2,
+            count_limit=5)
+        self.assertEqual(paginator.count, 5)
+
+    def test_empty_estimated_page_clamped(self):
+        """Пустая по оценке страница пересчитывается и не выходит за
+        конец."""
+        Post.objects.filter(pk__in=Post.objects.order_by('pk').values(
+            'pk')[5:10]).delete()
+        paginator = EstimatedCountPaginator(Post.objects.all(), 5,
+                                            count_limit=5)
+        self.assertEqual(paginator.count, 15)
+        page = paginator.page(3)
+        self.assertEqual(paginator.count, 10)
+        self.assertEqual(page.number, 2)
+        self.assertEqual(len(page), 5)
+
+    def test_exact_count_past_limit(self):
+        """Страница у предела открывает точный счёт и страницы за ним."""
+        paginator = EstimatedCountPaginator(
+            Post.objects.filter(text__startswith='Тестовый'), 5,
+            count_limit=10, number=2)
+        self.assertEqual(paginator.count, 15)
+        self.assertEqual(len(paginator.page(3)), 5)
@@ -1,4 +1,5 @@
 import datetime as dt
+import hashlib
 import shutil
 import tempfile
 
@@ -81,10 +82,11 @@ class PostsFormsTests(TestCase):
                              msg_prefix='Ошибка проверки перенаправления')
         self.assertEqual(Post.objects.count(), posts_count + 1,
                          'Пост не был добавлен в базу')
+        digest = hashlib.sha256(small_gif).hexdigest()
         self.assertTrue(
             Post.objects.filter(
                 text='Тестовый текст 2',
-                image='posts/small.gif'
+                image=f'posts/{digest[:2]}/{digest[2:4]}/{digest}.gif'
             ).exists()
         )
 
@@ -0,0 +1,131 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from posts import images
+from posts.models import Post, ThumbnailJob
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def run_on_commit(func):
+    # TestCase не коммитит транзакцию: выполняем отложенное сразу.
+    func()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, MEDIA_GC_GRACE=0)
+@mock.patch('posts.images.transaction.on_commit', run_on_commit)
+class ContentAddressedImagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.addCleanup(shutil.rmtree, self.path('posts'),
+                        ignore_errors=True)
+
+    def create_post(self, content=SMALL_GIF, name='small.gif'):
+        return Post.objects.create(
+            author=self.user, text='Пост с картинкой',
+            image=SimpleUploadedFile(name, content,
+                                     content_type='image/gif'))
+
+    def path(self, name):
+        return os.path.join(TEMP_MEDIA_ROOT, name)
+
+    def test_same_upload_stored_once(self):
+        """Одинаковые загрузки хранятся одним файлом с именем по хэшу."""
+        first = self.create_post()
+        second = self.create_post(name='other.GIF')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name,
+                         r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.gif$')
+        directory = os.path.dirname(self.path(first.image.name))
+        self.assertEqual(os.listdir(directory),
+                         [os.path.basename(first.image.name)])
+
+    def test_delete_keeps_shared_image(self):
+        """Картинка удаляется вместе с последним постом, который на неё
+        ссылается, вместе с задачами миниатюр."""
+        first = self.create_post()
+        second = self.create_post()
+        name = first.image.name
+        first.delete()
+        self.assertTrue(os.path.exists(self.path(name)))
+        second.delete()
+        self.assertFalse(os.path.exists(self.path(name)))
+        self.assertFalse(ThumbnailJob.objects.filter(image=name).exists())
+
+    def test_replaced_image_collected(self):
+        """Прежняя картинка поста удаляется после замены."""
+        post = self.create_post()
+        old_name = post.image.name
+        post = Post.objects.get(pk=post.pk)
+        post.image = SimpleUploadedFile('new.gif', SMALL_GIF + b'\x00',
+                                        content_type='image/gif')
+        post.save()
+        self.assertFalse(os.path.exists(self.path(old_name)))
+        self.assertTrue(os.path.exists(self.path(post.image.name)))
+
+    @override_settings(MEDIA_GC_GRACE=3600)
+    def test_recent_image_kept(self):
+        """Недавно загруженную картинку сборщик не трогает."""
+        post = self.create_post()
+        name = post.image.name
+        post.delete()
+        self.assertTrue(os.path.exists(self.path(name)))
+        self.assertFalse(images.collect(name))
+
+    def test_gc_media_rehashes_and_sweeps(self):
+        """gc_media переносит старые имена и удаляет файлы без постов."""
+        storage = images.image_storage()
+        os.makedirs(self.path('posts'), exist_ok=True)
+        for legacy in ('posts/legacy.gif', 'posts/orphan.gif'):
+            with open(self.path(legacy), 'wb') as file:
+                file.write(SMALL_GIF)
+        post = self.create_post(content=SMALL_GIF + b'\x01')
+        Post.objects.filter(pk=post.pk).update(image='posts/legacy.gif')
+        updated_at = post.updated_at
+        out = StringIO()
+        call_command('gc_media', rehash=True, stdout=out)
+        post.refresh_from_db()
+        self.assertGreater(post.updated_at, updated_at)
+        self.assertRegex(post.image.name, images.HASHED_NAME_RE)
+        self.assertTrue(storage.exists(post.image.name))
+        self.assertFalse(storage.exists('posts/legacy.gif'))
+        self.assertFalse(storage.exists('posts/orphan.gif'))
+        self.assertTrue(ThumbnailJob.objects.filter(
+            image=post.image.name).exists())
+        self.assertIn('Удалено картинок: 2', out.getvalue())
+
+    def test_sweep_dry_run(self):
+        """С --dry-run файлы только считаются."""
+        storage = images.image_storage()
+        name = storage.save('posts/orphan.gif', ContentFile(SMALL_GIF))
+        self.assertEqual(images.sweep(dry_run=True), (1, len(SMALL_GIF)))
+        self.assertTrue(storage.exists(name))
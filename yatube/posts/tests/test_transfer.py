@@ -0,0 +1,128 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from posts import search
+from posts.models import Comment, Follow, Group, Post, ThumbnailJob
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class TransferTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.leo = User.objects.create(username='leo', first_name='Лев')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(title='Классика', slug='classic',
+                                         description='Проза')
+        cls.post = Post.objects.create(
+            text='Все счастливые семьи похожи друг на друга',
+            author=cls.leo, group=cls.group,
+            image=SimpleUploadedFile('small.gif', SMALL_GIF,
+                                     content_type='image/gif'))
+        Post.objects.filter(pk=cls.post.pk).update(
+            pub_date=datetime(1877, 1, 1, tzinfo=timezone.utc))
+        Post.objects.create(text='Без группы', author=cls.reader)
+        Comment.objects.create(post=cls.post, author=cls.reader,
+                               text='Согласен')
+        Follow.objects.create(user=cls.reader, author=cls.leo)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.dump = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dump, ignore_errors=True)
+
+    def clear(self):
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+        Group.objects.all().delete()
+        User.objects.all().delete()
+        ThumbnailJob.objects.all().delete()
+
+    def assert_restored(self):
+        leo = User.objects.get(username='leo')
+        self.assertEqual(leo.first_name, 'Лев')
+        self.assertFalse(leo.has_usable_password())
+        post = Post.objects.get(author=leo)
+        self.assertEqual(post.group.slug, 'classic')
+        self.assertEqual(post.pub_date,
+                         datetime(1877, 1, 1, tzinfo=timezone.utc))
+        self.assertEqual(post.image.name, self.post.image.name)
+        self.assertEqual(list(post.comments.values_list('text', flat=True)),
+                         ['Согласен'])
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.group.posts_count, 1)
+        self.assertTrue(Follow.objects.filter(user__username='reader',
+                                              author=leo).exists())
+        self.assertEqual(leo.counters.followers_count, 1)
+        self.assertTrue(
+            User.objects.get(username='reader').timeline.filter(
+                post=post).exists(), 'Пост не попал в ленту подписчика')
+        self.assertEqual(
+            [found.pk for found in search.search_posts('семья')], [post.pk])
+        self.assertTrue(ThumbnailJob.objects.filter(
+            image=post.image.name).exists())
+
+    def test_ndjson_roundtrip(self):
+        """Выгрузка NDJSON загружается обратно вместе с картинками."""
+        path = os.path.join(self.dump, 'dump.ndjson')
+        media = os.path.join(self.dump, 'media')
+        call_command('export_posts', path, media=media, stderr=StringIO())
+        with open(path, encoding='utf-8') as stream:
+            kinds = [json.loads(line)['type'] for line in stream]
+        self.assertEqual(kinds, ['user'] * 2 + ['group'] + ['post'] * 2
+                         + ['comment', 'follow'])
+        os.remove(os.path.join(TEMP_MEDIA_ROOT, self.post.image.name))
+        self.clear()
+        call_command('import_posts', path, media=media, batch_size=1,
+                     transaction_size=2, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 2)
+        self.assert_restored()
+        self.assertTrue(os.path.exists(
+            os.path.join(TEMP_MEDIA_ROOT, self.post.image.name)))
+
+    def test_csv_roundtrip(self):
+        """Выгрузка CSV загружается обратно."""
+        call_command('export_posts', self.dump, format='csv',
+                     stderr=StringIO())
+        self.assertTrue(os.path.exists(os.path.join(self.dump, 'post.csv')))
+        self.clear()
+        call_command('import_posts', self.dump, stdout=StringIO())
+        self.assert_restored()
+
+    def test_import_keeps_existing_content(self):
+        """Загрузка не затрагивает уже существующие посты."""
+        path = os.path.join(self.dump, 'dump.ndjson')
+        call_command('export_posts', path, stderr=StringIO())
+        call_command('import_posts', path, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 4)
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(Group.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).comments.count(), 1)
@@ -1,15 +1,26 @@
 import datetime as dt
+import os
 import shutil
 import tempfile
+from io import StringIO
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from posts.models import Comment, Follow, Group, Post
+from django.utils import timezone
+from posts import feeds, search, thumbnails
+from posts.feeds import prewarm_index
+from posts.models import (Comment, Follow, Group, Post, ThumbnailJob,
+                          TimelineEntry)
+from posts.thumbnails import IMAGE_FORMATS, THUMBNAIL_VARIANTS
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -305,6 +316,733 @@ class PaginatorTests(TestCase):
                          'Выведено неверное количество постов')
 
 
+class FeedQueryCountTests(TestCase):
+    """Число запросов ленты не зависит от числа постов на странице."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author',
+                                         first_name='Имя',
+                                         last_name='Фамилия')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            title='test_group',
+            slug='test-slug',
+            description='test_desk'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        cache.clear()
+
+    def assert_feed_queries(self, client, url, expected):
+        for posts_total, posts_on_page in ((1, 1), (15, 10)):
+            with self.subTest(url=url, posts_on_page=posts_on_page):
+                Post.objects.all().delete()
+                for number in range(posts_total):
+                    Post.objects.create(text=f'Тестовый текст {number}',
+                                        author=self.author,
+                                        group=self.group)
+                cache.clear()
+                with self.assertNumQueries(expected):
+                    response = client.get(url)
+                self.assertEqual(len(response.context['page_obj']),
+                                 posts_on_page)
+
+    def test_index_queries(self):
+        self.assert_feed_queries(self.guest_client,
+                                 reverse('posts:index'), 2)
+
+    # Ленты группы и профиля — ещё один запрос валидаторов conditional GET.
+    def test_group_posts_queries(self):
+        self.assert_feed_queries(
+            self.guest_client,
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            4)
+
+    def test_profile_queries(self):
+        self.assert_feed_queries(
+            self.guest_client,
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            4)
+
+    def test_follow_index_queries(self):
+        self.assert_feed_queries(self.reader_client,
+                                 reverse('posts:follow_index'), 5)
+
+    def test_form_pages_do_not_open_transactions(self):
+        """GET форм и отказ в подписке на себя не открывают транзакцию.
+
+        На SQLite транзакция берёт блокировку записи; внутри TestCase
+        atomic() виден как SAVEPOINT.
+        """
+        author_client = Client()
+        author_client.force_login(self.author)
+        post = Post.objects.create(text='Тестовый текст', author=self.author)
+        urls = [(self.reader_client, reverse('posts:post_create')),
+                (author_client, reverse('posts:post_edit',
+                                        kwargs={'post_id': post.pk})),
+                (self.reader_client, reverse('posts:add_comment',
+                                             kwargs={'post_id': post.pk})),
+                (author_client, reverse('posts:profile_follow',
+                                        kwargs={'username': 'author'}))]
+        for client, url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    client.get(url)
+                self.assertFalse([query for query in queries
+                                  if 'SAVEPOINT' in query['sql']])
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            title='test_group',
+            slug='test-slug',
+            description='test_desk'
+        )
+        cls.post = Post.objects.create(text='Тестовый текст',
+                                       author=cls.author,
+                                       group=cls.group)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        cache.clear()
+
+    def test_card_reused_across_pages(self):
+        """Карточка из ленты подписок отдаётся на главной из кэша."""
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertTemplateUsed(response, 'posts/includes/post_obj.html')
+        response = self.reader_client.get(reverse('posts:index'))
+        self.assertContains(response, self.post.text)
+        self.assertTemplateNotUsed(response, 'posts/includes/post_obj.html',
+                                   'Карточка поста отрисована повторно')
+
+    def test_card_invalidated_on_changes(self):
+        """Карточка обновляется при изменении поста, автора и группы."""
+        url = reverse('posts:follow_index')
+        self.reader_client.get(url)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Изменённый текст'
+        post.save()
+        self.assertContains(self.reader_client.get(url), 'Изменённый текст')
+        self.author.first_name = 'Новое имя'
+        self.author.save()
+        self.assertContains(self.reader_client.get(url), 'Новое имя')
+        self.group.slug = 'new-slug'
+        self.group.save()
+        self.assertContains(self.reader_client.get(url), '/group/new-slug/')
+
+
+class IndexCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        for number in range(13):
+            Post.objects.create(text=f'Тестовый текст {number}',
+                                author=cls.author)
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def test_index_served_from_cache(self):
+        """Повторный запрос главной не обращается к базе."""
+        for url in (reverse('posts:index'),
+                    reverse('posts:index') + '?page=2'):
+            with self.subTest(url=url):
+                self.guest_client.get(url)
+                with self.assertNumQueries(0):
+                    response = self.guest_client.get(url)
+                # Страница целиком отдана из кэша страниц.
+                self.assertTemplateNotUsed(response, 'posts/index.html')
+                self.assertContains(response, 'Тестовый текст')
+
+    def test_new_post_visible_immediately(self):
+        """Новый пост сразу виден на закэшированной главной."""
+        self.guest_client.get(reverse('posts:index'))
+        new_post = Post.objects.create(text='Свежий пост',
+                                       author=self.author)
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(response.context['page_obj'][0], new_post,
+                         'Новый пост не появился на главной')
+        new_post.delete()
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Свежий пост')
+
+    def test_prewarm_fills_first_pages(self):
+        """Прогрев заполняет кэш первых страниц главной."""
+        Post.objects.create(text='Свежий пост', author=self.author)
+        prewarm_index()
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Свежий пост')
+
+    def test_prewarm_skipped_while_in_flight(self):
+        """Пока идёт другой прогрев, новый не запускается и ждёт."""
+        feeds._prewarm_pending.set()
+        self.addCleanup(feeds._prewarm_pending.clear)
+        cache.add(feeds.PREWARM_LOCK_KEY, 1)
+        with mock.patch('posts.feeds.prewarm_index') as prewarm:
+            feeds.prewarm_after_response(None)
+            prewarm.assert_not_called()
+            self.assertTrue(feeds._prewarm_pending.is_set())
+            cache.delete(feeds.PREWARM_LOCK_KEY)
+            feeds.prewarm_after_response(None)
+        prewarm.assert_called_once_with()
+        self.assertFalse(feeds._prewarm_pending.is_set())
+        self.assertIsNone(cache.get(feeds.PREWARM_LOCK_KEY))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailQueueTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+        cls.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=cls.author,
+            image=SimpleUploadedFile(name='queue.gif', content=small_gif,
+                                     content_type='image/gif'),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def test_upload_enqueues_thumbnails(self):
+        """Новая картинка ставит миниатюры в очередь один раз."""
+        jobs = ThumbnailJob.objects.filter(image=self.post.image.name)
+        self.assertEqual(jobs.count(), len(THUMBNAIL_VARIANTS))
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Новый текст'
+        post.save()
+        call_command('enqueue_thumbnails', stdout=StringIO())
+        self.assertEqual(jobs.count(), len(THUMBNAIL_VARIANTS),
+                         'Миниатюры поставлены в очередь повторно')
+
+    def test_shared_image_enqueued_once(self):
+        """Картинка нескольких постов ставится в очередь один раз."""
+        Post.objects.create(text='Та же картинка', author=self.author,
+                            image=self.post.image.name)
+        with mock.patch('posts.thumbnails.enqueue') as enqueue:
+            call_command('enqueue_thumbnails', stdout=StringIO())
+        enqueue.assert_called_once_with(self.post.image.name)
+
+    def test_original_served_until_thumbnail_ready(self):
+        """Страница показывает оригинал, пока воркер не создал миниатюры."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.guest_client.get(url)
+        self.assertContains(response, self.post.image.url)
+        self.assertNotContains(response, '<picture>')
+        self.assertFalse(os.path.exists(
+            os.path.join(TEMP_MEDIA_ROOT, 'cache')),
+            'Миниатюра создана при выводе страницы')
+        self.guest_client.get(reverse('posts:index'))
+        call_command('run_workers', '--once', '--workers=1',
+                     stdout=StringIO())
+        self.assertFalse(ThumbnailJob.objects.exclude(
+            status=ThumbnailJob.DONE).exists())
+        for url in (url, reverse('posts:index')):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertNotContains(response, self.post.image.url)
+                self.assertContains(response, '<picture>')
+                self.assertContains(response, settings.MEDIA_URL + 'cache/')
+                for width in settings.POST_IMAGE_WIDTHS:
+                    self.assertContains(response, f' {width}w')
+                if 'WEBP' in IMAGE_FORMATS:
+                    self.assertContains(response, 'type="image/webp"')
+
+    def test_missing_image_fails_after_attempts(self):
+        """Задача с отсутствующей картинкой не зацикливает очередь."""
+        ThumbnailJob.objects.all().delete()
+        ThumbnailJob.objects.create(image='posts/missing.gif',
+                                    geometry='960x339')
+        call_command('run_workers', '--once', '--workers=1',
+                     stdout=StringIO())
+        job = ThumbnailJob.objects.get(image='posts/missing.gif')
+        self.assertEqual(job.status, ThumbnailJob.FAILED)
+        self.assertEqual(job.attempts, settings.THUMBNAIL_JOB_ATTEMPTS)
+
+    def test_stale_job_fails_after_attempts(self):
+        """Задача, на которой воркеры падают, не выдаётся бесконечно."""
+        ThumbnailJob.objects.all().delete()
+        started = timezone.now() - dt.timedelta(
+            seconds=settings.THUMBNAIL_JOB_TIMEOUT + 1)
+        retried = ThumbnailJob.objects.create(
+            image='posts/retried.gif', geometry='960x339',
+            status=ThumbnailJob.RUNNING, started=started,
+            attempts=settings.THUMBNAIL_JOB_ATTEMPTS - 1)
+        crashing = ThumbnailJob.objects.create(
+            image='posts/crashing.gif', geometry='960x339',
+            status=ThumbnailJob.RUNNING, started=started,
+            attempts=settings.THUMBNAIL_JOB_ATTEMPTS)
+        self.assertEqual(thumbnails.claim_job(), retried)
+        self.assertIsNone(thumbnails.claim_job())
+        crashing.refresh_from_db()
+        self.assertEqual(crashing.status, ThumbnailJob.FAILED)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.another_author = User.objects.create(username='another_author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.poem = Post.objects.create(
+            text='Пушкин писал стихи. Стихи о зиме.',
+            author=cls.author,
+            group=cls.group,
+        )
+        cls.prose = Post.objects.create(
+            text='Толстой писал романы, а не стихи.',
+            author=cls.another_author,
+        )
+        cls.commented = Post.objects.create(
+            text='Фотография заката',
+            author=cls.another_author,
+        )
+        Comment.objects.create(post=cls.commented, author=cls.author,
+                               text='Хочется написать об этом стихотворение')
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def search(self, **params):
+        response = self.guest_client.get(reverse('posts:search'), params)
+        self.assertEqual(response.status_code, 200)
+        return list(response.context['page_obj'])
+
+    def test_search_stems_and_ranks(self):
+        """Поиск находит формы слова и ставит выше частые вхождения."""
+        self.assertEqual(self.search(q='стихами'), [self.poem, self.prose])
+        self.assertEqual(self.search(q='писали стихи Пушкина'),
+                         [self.poem])
+        self.assertEqual(self.search(q='проза'), [])
+
+    def test_search_comments(self):
+        """Поиск учитывает текст комментариев."""
+        self.assertEqual(self.search(q='стихотворение'), [self.commented])
+
+    def test_search_words_from_post_and_comments(self):
+        """Слова запроса ищутся и в посте, и в его комментариях."""
+        self.assertEqual(self.search(q='закат стихотворение'),
+                         [self.commented])
+
+    def test_index_follows_comment_changes(self):
+        """Комментарий попадает в индекс и убирается из него."""
+        comment = Comment.objects.create(post=self.prose,
+                                         author=self.author,
+                                         text='Лучше бы писал поэмы')
+        self.assertEqual(self.search(q='поэма'), [self.prose])
+        comment = Comment.objects.get(pk=comment.pk)
+        comment.text = 'Лучше бы писал пьесы'
+        comment.save()
+        self.assertEqual(self.search(q='поэма'), [])
+        self.assertEqual(self.search(q='пьеса'), [self.prose])
+        comment.delete()
+        self.assertEqual(self.search(q='пьеса'), [])
+        self.assertEqual(self.search(q='стихами'), [self.poem, self.prose])
+
+    def test_comment_indexing_cost_does_not_grow(self):
+        """Запись комментария разбирает только его собственный текст."""
+        tokenized = []
+        original = search.tokenize
+
+        def tokenize(text):
+            tokenized.append(text)
+            return original(text)
+
+        text = 'Зимние стихи хороши'
+        Comment.objects.bulk_create(
+            Comment(post=self.poem, author=self.author, text=f'Ещё {number}')
+            for number in range(30))
+        with mock.patch('posts.search.tokenize', tokenize):
+            comment = Comment.objects.create(post=self.poem,
+                                             author=self.author, text=text)
+            comment.delete()
+        self.assertEqual(tokenized, [text, text])
+
+    def test_search_filters(self):
+        """Результаты фильтруются по группе и автору."""
+        self.assertEqual(self.search(q='стихи', group='test-slug'),
+                         [self.poem])
+        self.assertEqual(self.search(q='стихи', author='another_author'),
+                         [self.prose])
+        response = self.guest_client.get(reverse('posts:search'),
+                                         {'q': 'стихи', 'author': 'nobody'})
+        self.assertNotIn('page_obj', response.context)
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при изменении и удалении постов."""
+        post = Post.objects.get(pk=self.prose.pk)
+        post.text = 'Толстой писал романы'
+        post.save()
+        self.assertEqual(self.search(q='стихи'), [self.poem])
+        Post.objects.get(pk=self.poem.pk).delete()
+        self.assertEqual(self.search(q='стихи'), [])
+
+    def test_search_cursor_pages(self):
+        """Страницы поиска продолжают друг друга по курсору."""
+        for number in range(12):
+            Post.objects.create(text=f'Новые стихи номер {number}',
+                                author=self.author)
+        response = self.guest_client.get(reverse('posts:search'),
+                                         {'q': 'стихи'})
+        first_page = list(response.context['page_obj'])
+        self.assertEqual(len(first_page), 10)
+        self.assertTrue(response.context['page_obj'].has_next())
+        response = self.guest_client.get(reverse('posts:search'), {
+            'q': 'стихи',
+            'cursor': response.context['page_obj'].next_cursor,
+        })
+        second_page = list(response.context['page_obj'])
+        self.assertEqual(len(second_page), 4)
+        self.assertFalse(set(first_page) & set(second_page))
+
+    def test_rebuild_search_index_command(self):
+        """Команда rebuild_search_index восстанавливает индекс."""
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search(q='стихами'), [self.poem, self.prose])
+
+
+@override_settings(POSTS_SEARCH_BACKEND='postings')
+class PostingsSearchTests(SearchTests):
+    """Те же проверки для индекса без FTS5."""
+
+
+class CursorPaginatorTests(TestCase):
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.post_author = User.objects.create(username='author')
+        number_of_posts = 13
+        Post.objects.bulk_create(Post(text=f'Тестовый текст {number}',
+                                      author=cls.post_author)
+                                 for number in range(number_of_posts))
+
+    def test_cursor_pages_follow_each_other(self):
+        """Курсоры ведут на следующую и обратно на предыдущую страницу."""
+        url = reverse('posts:profile', kwargs={'username': 'author'})
+        first_page = self.guest_client.get(url + '?cursor=').context[
+            'page_obj']
+        self.assertEqual(len(first_page), 10,
+                         'Выведено неверное количество постов')
+        self.assertFalse(first_page.has_previous())
+        second_page = self.guest_client.get(
+            url + '?cursor=' + first_page.next_cursor).context['page_obj']
+        self.assertEqual(len(second_page), 3,
+                         'Выведено неверное количество постов')
+        self.assertFalse(second_page.has_next())
+        expected = list(Post.objects.order_by('-pub_date', '-id'))
+        self.assertEqual(list(first_page) + list(second_page), expected,
+                         'Посты на страницах идут не по порядку')
+        previous_page = self.guest_client.get(
+            url + '?cursor=' + second_page.previous_cursor).context[
+                'page_obj']
+        self.assertEqual(list(previous_page), list(first_page),
+                         'Курсор назад ведёт не на первую страницу')
+        self.assertFalse(previous_page.has_previous())
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Испорченный курсор отдаёт первую страницу."""
+        response = self.guest_client.get(
+            reverse('posts:index') + '?cursor=garbage')
+        self.assertEqual(len(response.context['page_obj']), 10,
+                         'Выведено неверное количество постов')
+
+    def test_cursor_page_estimated_count(self):
+        """Курсорный режим показывает примерное число постов."""
+        response = self.guest_client.get(
+            reverse('posts:index') + '?cursor=')
+        self.assertEqual(
+            response.context['page_obj'].paginator.estimated_count, 13,
+            'Неверно посчитано число постов')
+
+
+@override_settings(POSTS_COMMENTS_PER_PAGE=5)
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.post = Post.objects.create(text='Тестовый текст',
+                                       author=cls.author)
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.author,
+                    text=f'Комментарий {number}')
+            for number in range(8))
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def test_comments_paginated(self):
+        """На странице поста первая страница комментариев по порядку."""
+        response = self.guest_client.get(
+            reverse('posts:post_detail', args=[self.post.pk]))
+        comments = response.context['comments']
+        self.assertEqual([comment.text for comment in comments],
+                         [f'Комментарий {number}' for number in range(5)],
+                         'Комментарии выведены не по порядку')
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, 'data-comments-more')
+
+    def test_load_more_fragment(self):
+        """Фрагмент отдаёт следующую страницу комментариев."""
+        first_page = self.guest_client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        ).context['comments']
+        response = self.guest_client.get(
+            reverse('posts:post_comments', args=[self.post.pk]),
+            {'cursor': first_page.next_cursor})
+        self.assertTemplateUsed(response, 'posts/includes/comment_list.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        comments = response.context['comments']
+        self.assertEqual([comment.text for comment in comments],
+                         [f'Комментарий {number}' for number in range(5, 8)])
+        self.assertFalse(comments.has_next())
+        self.assertNotContains(response, 'data-comments-more')
+
+    def test_comment_author_fields_limited(self):
+        """У комментариев и авторов читаются только нужные поля."""
+        comments = self.guest_client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        ).context['comments']
+        self.assertIn('post_id', comments[0].get_deferred_fields())
+        self.assertIn('password', comments[0].author.get_deferred_fields())
+
+    def test_fragment_for_missing_post(self):
+        """Фрагмент комментариев несуществующего поста — 404."""
+        response = self.guest_client.get(
+            reverse('posts:post_comments', args=[self.post.pk + 100]))
+        self.assertEqual(response.status_code, 404)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(text='Тестовый текст',
+                                       author=cls.author, group=cls.group)
+        cls.urls = (
+            reverse('posts:group_posts', args=[cls.group.slug]),
+            reverse('posts:profile', args=[cls.author.username]),
+            reverse('posts:post_detail', args=[cls.post.pk]),
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        cache.clear()
+
+    def etags(self, client=None):
+        client = client or self.guest_client
+        return [client.get(url)['ETag'] for url in self.urls]
+
+    def test_not_modified(self):
+        """Повтор запроса с ETag — 304 за один запрос к базе."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response['ETag'].startswith('W/"'))
+                self.assertIn('Last-Modified', response)
+                with self.assertNumQueries(1):
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+
+    def test_cache_control(self):
+        """Анонимные ответы public, ответы вошедшим — private."""
+        for client, scope in ((self.guest_client, 'public'),
+                              (self.reader_client, 'private')):
+            for url in self.urls:
+                with self.subTest(url=url, scope=scope):
+                    response = client.get(url)
+                    self.assertIn(scope, response['Cache-Control'])
+                    self.assertIn('no-cache', response['Cache-Control'])
+                    self.assertIn('Cookie', response['Vary'])
+
+    def test_etag_per_user(self):
+        """У анонимного и вошедшего пользователя разные ETag."""
+        for guest, reader in zip(self.etags(),
+                                 self.etags(self.reader_client)):
+            self.assertNotEqual(guest, reader)
+
+    def test_new_post_changes_etag(self):
+        """Новый пост меняет ETag ленты группы и профиля."""
+        before = self.etags()
+        Post.objects.create(text='Новый пост', author=self.author,
+                            group=self.group)
+        after = self.etags()
+        self.assertNotEqual(before[0], after[0])
+        self.assertNotEqual(before[1], after[1])
+
+    def test_edit_changes_etag(self):
+        """Правка поста меняет ETag всех трёх страниц."""
+        before = self.etags()
+        self.post.text = 'Новый текст'
+        self.post.save()
+        for old, new in zip(before, self.etags()):
+            self.assertNotEqual(old, new)
+
+    def test_comment_changes_etag(self):
+        """Новый комментарий меняет ETag страницы поста."""
+        before = self.etags()[2]
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Комментарий')
+        self.assertNotEqual(before, self.etags()[2])
+
+    def test_follow_changes_etag(self):
+        """Подписка меняет ETag профиля и страницы поста автора."""
+        before = self.etags(self.reader_client)
+        Follow.objects.create(user=self.reader, author=self.author)
+        after = self.etags(self.reader_client)
+        self.assertNotEqual(before[1], after[1])
+        self.assertNotEqual(before[2], after[2])
+
+    def test_missing_page(self):
+        """Для несуществующего объекта view отвечает 404."""
+        response = self.guest_client.get(
+            reverse('posts:profile', args=['nobody']))
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(text='Тестовый текст',
+                                       author=cls.author, group=cls.group)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        cache.clear()
+
+    def test_logged_in_served_from_cache(self):
+        """Вошедший получает закэшированную страницу со своими фрагментами."""
+        pages = {
+            reverse('posts:index'): 'posts/index.html',
+            reverse('posts:group_posts', args=[self.group.slug]):
+                'posts/group_list.html',
+            reverse('posts:profile', args=[self.author.username]):
+                'posts/profile.html',
+            reverse('posts:post_detail', args=[self.post.pk]):
+                'posts/post_detail.html',
+        }
+        for url, template in pages.items():
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), 'Войти')
+                response = self.reader_client.get(url)
+                self.assertTemplateNotUsed(response, template)
+                self.assertContains(response, 'Пользователь: reader')
+                self.assertNotContains(response, 'Войти')
+                self.assertNotContains(response, '<!--fragment')
+
+    def test_follow_button_per_user(self):
+        """Кнопка подписки в закэшированном профиле своя у каждого."""
+        url = reverse('posts:profile', args=[self.author.username])
+        self.assertContains(self.guest_client.get(url), 'Подписаться')
+        self.assertContains(self.reader_client.get(url), 'Отписаться')
+
+    def test_post_fragments_per_user(self):
+        """Форма комментария и кнопка правки — по пользователю."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        response = self.guest_client.get(url)
+        self.assertNotContains(response, 'Добавить комментарий')
+        self.assertNotContains(response, 'Редактировать')
+        response = self.reader_client.get(url)
+        self.assertContains(response, 'Добавить комментарий')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertIn('csrftoken', response.cookies)
+        self.assertNotContains(response, 'Редактировать')
+        self.assertContains(self.author_client.get(url), 'Редактировать')
+
+    def test_new_post_refreshes_page(self):
+        """Новый пост сразу виден на закэшированной странице группы."""
+        url = reverse('posts:group_posts', args=[self.group.slug])
+        self.reader_client.get(url)
+        Post.objects.create(text='Свежий пост', author=self.author,
+                            group=self.group)
+        self.assertContains(self.reader_client.get(url), 'Свежий пост')
+
+    def test_unknown_params_not_cached(self):
+        """Посторонние параметры не создают записей кэша и не меняют
+        ETag."""
+        url = reverse('posts:profile', args=[self.author.username])
+        etag = self.guest_client.get(url)['ETag']
+        for path in (url + '?utm=1', reverse('posts:index') + '?utm=1'):
+            with self.subTest(path=path):
+                with mock.patch('core.pagecache.cache.set') as cache_set:
+                    response = self.guest_client.get(path)
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse([key for (key, *_), _ in
+                                  cache_set.call_args_list
+                                  if key.startswith('page:')])
+        self.assertEqual(self.guest_client.get(url + '?utm=2')['ETag'],
+                         etag)
+
+    @override_settings(PAGE_CACHE_ENABLED=False)
+    def test_disabled(self):
+        """Без кэша страниц страница рисуется на каждый запрос."""
+        url = reverse('posts:profile', args=[self.author.username])
+        self.guest_client.get(url)
+        response = self.reader_client.get(url)
+        self.assertTemplateUsed(response, 'posts/profile.html')
+        self.assertContains(response, 'Отписаться')
+
+
 class FollowTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -401,3 +1139,59 @@ class FollowTests(TestCase):
                                                  author=self.author_followed)
         self.assertEqual(followed_authors.count(), 1,
                          'Не удалось подписаться на автора')
+
+    def test_follow_fills_timeline(self):
+        """Подписка добавляет в ленту уже опубликованные посты автора."""
+        self.authorized_user.get(reverse('posts:profile_follow',
+                                         kwargs={'username':
+                                                 self.author_not_followed}))
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.current_user, post=self.post_not_follow).exists(),
+            'Пост автора не попал в ленту при подписке')
+        response = (self.authorized_user.
+                    get(reverse('posts:follow_index')))
+        self.assertIn(self.post_not_follow, response.context.get('page_obj'),
+                      'Поста нового автора нет в ленте')
+
+    def test_unfollow_clears_timeline(self):
+        """Отписка убирает посты автора из ленты."""
+        self.authorized_user.get(reverse('posts:profile_unfollow',
+                                         kwargs={'username':
+                                                 self.author_followed}))
+        self.assertFalse(
+            TimelineEntry.objects.filter(
+                user=self.current_user,
+                post__author=self.author_followed).exists(),
+            'Посты автора остались в ленте после отписки')
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_prolific_author_read_without_fan_out(self):
+        """Посты автора без рассылки читаются в ленту напрямую."""
+        new_post = Post.objects.create(
+            author=self.author_followed,
+            text='Пост популярного автора'
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=new_post).exists(),
+            'Пост популярного автора разослан по лентам')
+        self.assertTrue(
+            Follow.objects.get(user=self.current_user,
+                               author=self.author_followed).pull,
+            'Подписка на популярного автора не переведена в pull')
+        response = (self.authorized_user.
+                    get(reverse('posts:follow_index')))
+        self.assertIn(new_post, response.context.get('page_obj'),
+                      'Поста популярного автора нет в ленте')
+        self.assertNotIn(self.post_not_follow,
+                         response.context.get('page_obj'),
+                         'Выведен пост неотслеживаемого автора')
+
+    def test_backfill_timeline_command(self):
+        """Команда backfill_timeline восстанавливает ленты."""
+        TimelineEntry.objects.all().delete()
+        call_command('backfill_timeline', stdout=StringIO())
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.current_user, post=self.post_follow).exists(),
+            'Лента не восстановлена командой')
@@ -0,0 +1,199 @@
+"""Background thumbnail generation for Posts app.
+
+Миниатюры картинок постов создаются не при просмотре страницы, а
+воркерами команды run_workers из очереди ThumbnailJob. Задачи ставятся
+в очередь в той же транзакции, что и сохранение поста. Пока миниатюры
+не готовы, шаблоны показывают оригинал картинки, поэтому запрос
+страницы никогда не вызывает Pillow.
+
+Для каждой картинки создаётся набор ширин POST_IMAGE_WIDTHS в каждом
+формате POST_IMAGE_FORMATS, который умеет сохранять Pillow. Из GIF
+берётся первый кадр: миниатюры сохраняются в форматы без анимации.
+"""
+
+import json
+import logging
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.helpers import serialize, tokey
+from sorl.thumbnail.images import ImageFile
+
+from .cache import bump_posts
+from .models import Post, ThumbnailJob
+
+# Пропорции картинки в карточке поста (960x339).
+CARD_ASPECT = 339 / 960
+
+MIME_TYPES = {
+    'AVIF': 'image/avif',
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+}
+
+CLAIM_BATCH = 20
+
+logger = logging.getLogger(__name__)
+
+
+def supported_formats():
+    """Форматы из POST_IMAGE_FORMATS, которые умеет сохранять Pillow."""
+    Image.init()
+    return [name for name in settings.POST_IMAGE_FORMATS
+            if name in Image.SAVE and name in MIME_TYPES]
+
+
+IMAGE_FORMATS = supported_formats()
+
+# Миниатюры, которые выводят шаблоны постов: (размер, параметры).
+THUMBNAIL_VARIANTS = [
+    (f'{width}x{round(width * CARD_ASPECT)}',
+     {'upscale': True, 'padding': True, 'format': image_format})
+    for width in settings.POST_IMAGE_WIDTHS
+    for image_format in IMAGE_FORMATS
+]
+
+
+class PostThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl с поиском готовых миниатюр и форматом AVIF."""
+
+    extensions = dict(EXTENSIONS, AVIF='avif')
+
+    def _get_thumbnail_filename(self, source, geometry_string, options):
+        key = tokey(source.key, geometry_string, serialize(options))
+        path = '%s/%s/%s' % (key[:2], key[2:4], key)
+        return '%s%s.%s' % (sorl_settings.THUMBNAIL_PREFIX, path,
+                            self.extensions[options['format']])
+
+    def get_ready_thumbnail(self, file_, geometry_string, **options):
+        """Миниатюра из хранилища ключей sorl или None.
+
+        Параметры дополняются так же, как в ThumbnailBackend, поэтому
+        имя миниатюры совпадает с созданной воркером.
+        """
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+backend = PostThumbnailBackend()
+
+
+def ready_thumbnail(image, geometry, **options):
+    """Готовая миниатюра картинки; None, если её ещё нет."""
+    if not image:
+        return None
+    # По имени, как в run_job: ключ sorl зависит от хранилища картинки.
+    return backend.get_ready_thumbnail(getattr(image, 'name', image),
+                                       geometry, **options)
+
+
+def picture_sources(image):
+    """Готовые миниатюры картинки по форматам.
+
+    Возвращает список пар (формат, миниатюры по возрастанию ширины)
+    в порядке предпочтения форматов; форматы без готовых миниатюр
+    пропускаются.
+    """
+    ready = {}
+    for geometry, options in THUMBNAIL_VARIANTS:
+        thumbnail = ready_thumbnail(image, geometry, **options)
+        if thumbnail is not None:
+            ready.setdefault(options['format'], []).append(thumbnail)
+    return [(image_format, sorted(ready[image_format],
+                                  key=lambda thumbnail: thumbnail.width))
+            for image_format in IMAGE_FORMATS if image_format in ready]
+
+
+def enqueue(image_name):
+    """Ставит в очередь миниатюры картинки для всех шаблонов."""
+    ThumbnailJob.objects.bulk_create(
+        (ThumbnailJob(image=image_name, geometry=geometry,
+                      options=json.dumps(options, sort_keys=True))
+         for geometry, options in THUMBNAIL_VARIANTS),
+        ignore_conflicts=True,
+    )
+
+
+def claim_job():
+    """Забирает задачу из очереди; None, если очередь пуста.
+
+    Задачи, зависшие в работе дольше THUMBNAIL_JOB_TIMEOUT (например,
+    после падения воркера), выдаются заново, пока не исчерпаны
+    THUMBNAIL_JOB_ATTEMPTS попыток. Иначе задача помечается ошибочной:
+    картинка, на которой падает сам воркер (нехватка памяти,
+    декомпрессионная бомба), до except в run_job не доходит.
+    """
+    stale = timezone.now() - timedelta(
+        seconds=settings.THUMBNAIL_JOB_TIMEOUT)
+    stale_jobs = Q(status=ThumbnailJob.RUNNING, started__lt=stale)
+    ThumbnailJob.objects.filter(
+        stale_jobs, attempts__gte=settings.THUMBNAIL_JOB_ATTEMPTS).update(
+        status=ThumbnailJob.FAILED,
+        error='Воркер не завершил задачу за отведённое время')
+    available = Q(status=ThumbnailJob.PENDING) | stale_jobs
+    candidates = (ThumbnailJob.objects.filter(available)
+                  .values_list('pk', flat=True)[:CLAIM_BATCH])
+    for pk in candidates:
+        claimed = ThumbnailJob.objects.filter(available, pk=pk).update(
+            status=ThumbnailJob.RUNNING, started=timezone.now(),
+            attempts=F('attempts') + 1)
+        if claimed:
+            return ThumbnailJob.objects.get(pk=pk)
+    return None
+
+
+def run_job(job):
+    """Создаёт миниатюру задачи и сбрасывает карточки её постов."""
+    try:
+        thumbnail = backend.get_thumbnail(job.image, job.geometry,
+                                          **json.loads(job.options))
+        if not thumbnail.exists():
+            raise FileNotFoundError(f'Картинка {job.image} не найдена')
+    except Exception:
+        logger.exception('Не удалось создать миниатюру %s', job)
+        failed = job.attempts >= settings.THUMBNAIL_JOB_ATTEMPTS
+        job.status = ThumbnailJob.FAILED if failed else ThumbnailJob.PENDING
+        job.error = traceback.format_exc()
+        job.save(update_fields=['status', 'error'])
+        return False
+    job.status = ThumbnailJob.DONE
+    job.error = ''
+    job.save(update_fields=['status', 'error'])
+    bump_posts(Post.objects.filter(image=job.image).values_list(
+        'pk', 'author_id', 'group_id'))
+    return True
+
+
+def work(once=False, interval=1.0):
+    """Выполняет задачи очереди; возвращает число созданных миниатюр.
+
+    С once=True возвращается, когда очередь опустела.
+    """
+    done = 0
+    while True:
+        job = claim_job()
+        if job is None:
+            if once:
+                return done
+            time.sleep(interval)
+            continue
+        done += run_job(job)
@@ -0,0 +1,122 @@
+"""Materialized follow timeline for Posts app.
+
+Посты раскладываются по лентам подписчиков при записи (push). Для
+авторов с числом подписчиков больше TIMELINE_FANOUT_LIMIT рассылка не
+делается: подписки помечаются pull=True, и посты таких авторов читаются
+в ленту живым запросом (pull).
+"""
+
+from django.conf import settings
+from django.db.models import Count, Q
+
+from .models import Follow, Post, TimelineEntry
+
+BATCH_SIZE = 500
+
+
+def is_prolific(author_id):
+    """Проверяет, что у автора слишком много подписчиков для рассылки."""
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    followers = Follow.objects.filter(author_id=author_id)
+    return followers[:limit + 1].count() > limit
+
+
+def fan_out_post(post):
+    """Добавляет новый пост в ленты подписчиков автора."""
+    followers = Follow.objects.filter(author_id=post.author_id)
+    if is_prolific(post.author_id):
+        followers.filter(pull=False).update(pull=True)
+        return
+    user_ids = followers.filter(pull=False).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=post.pk,
+                       author_id=post.author_id, pub_date=post.pub_date)
+         for user_id in user_ids.iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def mark_prolific():
+    """Переводит на pull подписки на авторов с избытком подписчиков."""
+    prolific = (Follow.objects.order_by().values('author_id')
+                .annotate(followers=Count('pk'))
+                .filter(followers__gt=settings.TIMELINE_FANOUT_LIMIT)
+                .values('author_id'))
+    return Follow.objects.filter(author_id__in=prolific,
+                                 pull=False).update(pull=True)
+
+
+def fan_out_posts(posts):
+    """Раскладывает посты по лентам подписчиков одним проходом.
+
+    Массовый аналог fan_out_post для постов, созданных bulk_create;
+    перед ним подписки должны быть размечены mark_prolific().
+    """
+    rows = Follow.objects.filter(
+        pull=False, author__posts__in=posts.values('pk')
+    ).values_list('user_id', 'author__posts__pk', 'author_id',
+                  'author__posts__pub_date')
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=post_id,
+                       author_id=author_id, pub_date=pub_date)
+         for user_id, post_id, author_id, pub_date in rows.iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def add_follow(follow):
+    """Заполняет ленту последними постами нового автора."""
+    if follow.pull or is_prolific(follow.author_id):
+        if not follow.pull:
+            Follow.objects.filter(pk=follow.pk).update(pull=True)
+            follow.pull = True
+        return
+    posts = (Post.objects.filter(author_id=follow.author_id)
+             .order_by('-pub_date')
+             .values_list('pk', 'pub_date')
+             [:settings.TIMELINE_BACKFILL_LIMIT])
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=follow.user_id, post_id=post_id,
+                       author_id=follow.author_id, pub_date=pub_date)
+         for post_id, pub_date in posts),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def remove_follow(follow):
+    """Убирает из ленты посты автора, от которого отписались."""
+    TimelineEntry.objects.filter(user_id=follow.user_id,
+                                 author_id=follow.author_id).delete()
+
+
+def timeline_posts(user):
+    """Возвращает посты ленты подписок пользователя.
+
+    Без pull-подписок лента читается одним проходом по индексу
+    (user, -pub_date) материализованных записей.
+    """
+    pulled = Follow.objects.filter(user=user, pull=True).values('author_id')
+    if not pulled.exists():
+        return Post.objects.filter(timeline_entries__user=user).order_by(
+            '-timeline_entries__pub_date', '-timeline_entries__post_id')
+    entries = TimelineEntry.objects.filter(user=user).values('post_id')
+    return Post.objects.filter(Q(pk__in=entries) | Q(author__in=pulled))
+
+
+def rebuild(follows=None):
+    """Пересобирает записи лент для подписок; возвращает их число."""
+    if follows is None:
+        follows = Follow.objects.all()
+    total = 0
+    for follow in follows.iterator():
+        remove_follow(follow)
+        pull = is_prolific(follow.author_id)
+        if follow.pull != pull:
+            Follow.objects.filter(pk=follow.pk).update(pull=pull)
+            follow.pull = pull
+        add_follow(follow)
+        total += 1
+    return total
@@ -0,0 +1,387 @@
+"""Bulk import and export of Posts app content.
+
+Пользователи, группы, посты, комментарии и подписки выгружаются и
+загружаются потоком записей в формате NDJSON (одна запись JSON на
+строку, поле type — вид записи) или CSV (по файлу <type>.csv на вид
+записи в одном каталоге). Записи читаются и пишутся генераторами,
+поэтому память не растёт с размером выгрузки.
+
+Авторы и группы при загрузке ищутся по username и slug через словари
+id в памяти. Посты получают id исходного поста со сдвигом на
+наибольший id в базе, поэтому комментарии находят свой пост без
+словаря. Загрузка выполняется bulk_create пачками, несколько пачек —
+в одной транзакции. bulk_create не вызывает сигналы, поэтому после
+загрузки счётчики, ленты, поисковый индекс и очередь миниатюр
+обновляются отдельно.
+"""
+
+import csv
+import json
+import logging
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files import File
+from django.core.management.color import no_style
+from django.db import connection, reset_queries, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import counters, images, search, thumbnails, timeline
+from .feeds import invalidate_index
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Порядок видов записей: каждая ссылается только на предыдущие.
+FIELDS = {
+    'user': ('username', 'first_name', 'last_name'),
+    'group': ('slug', 'title', 'description'),
+    'post': ('id', 'author', 'group', 'text', 'pub_date', 'image'),
+    'comment': ('id', 'post', 'author', 'text', 'created'),
+    'follow': ('user', 'author'),
+}
+
+logger = logging.getLogger(__name__)
+
+
+class TransferError(Exception):
+    """Запись выгрузки не удалось загрузить."""
+
+
+def _format_date(value):
+    return value.isoformat() if value is not None else None
+
+
+def export_records(chunk_size=2000):
+    """Записи всех видов по порядку FIELDS; генератор словарей."""
+    users = User.objects.order_by('pk').values_list(*FIELDS['user'])
+    for username, first_name, last_name in users.iterator(chunk_size):
+        yield {'type': 'user', 'username': username,
+               'first_name': first_name, 'last_name': last_name}
+    groups = Group.objects.order_by('pk').values_list(*FIELDS['group'])
+    for slug, title, description in groups.iterator(chunk_size):
+        yield {'type': 'group', 'slug': slug, 'title': title,
+               'description': description}
+    posts = Post.objects.order_by('pk').values_list(
+        'pk', 'author__username', 'group__slug', 'text', 'pub_date',
+        'image')
+    for pk, author, group, text, pub_date, image in posts.iterator(
+            chunk_size):
+        yield {'type': 'post', 'id': pk, 'author': author, 'group': group,
+               'text': text, 'pub_date': _format_date(pub_date),
+               'image': image}
+    comments = Comment.objects.order_by('pk').values_list(
+        'pk', 'post_id', 'author__username', 'text', 'created')
+    for pk, post_id, author, text, created in comments.iterator(chunk_size):
+        yield {'type': 'comment', 'id': pk, 'post': post_id,
+               'author': author, 'text': text,
+               'created': _format_date(created)}
+    follows = Follow.objects.order_by('pk').values_list(
+        'user__username', 'author__username')
+    for user, author in follows.iterator(chunk_size):
+        yield {'type': 'follow', 'user': user, 'author': author}
+
+
+def write_ndjson(records, stream):
+    """Пишет записи в поток по одной на строку; возвращает их число."""
+    total = 0
+    for record in records:
+        stream.write(json.dumps(record, ensure_ascii=False))
+        stream.write('\n')
+        total += 1
+    return total
+
+
+def write_csv(records, directory):
+    """Пишет записи в файлы <type>.csv каталога; возвращает их число."""
+    os.makedirs(directory, exist_ok=True)
+    files = {}
+    writers = {}
+    total = 0
+    try:
+        for record in records:
+            kind = record['type']
+            if kind not in writers:
+                files[kind] = open(os.path.join(directory, f'{kind}.csv'),
+                                   'w', newline='', encoding='utf-8')
+                writers[kind] = csv.DictWriter(files[kind], FIELDS[kind],
+                                               extrasaction='ignore')
+                writers[kind].writeheader()
+            writers[kind].writerow(record)
+            total += 1
+    finally:
+        for file in files.values():
+            file.close()
+    return total
+
+
+def read_ndjson(stream):
+    """Записи из потока NDJSON; пустые строки пропускаются."""
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            raise TransferError(f'Строка {number}: {error}')
+        if record.get('type') not in FIELDS:
+            raise TransferError(f'Строка {number}: неизвестный вид записи '
+                                f'{record.get("type")!r}')
+        yield record
+
+
+def read_csv(directory):
+    """Записи из файлов <type>.csv каталога в порядке FIELDS."""
+    for kind, fields in FIELDS.items():
+        path = os.path.join(directory, f'{kind}.csv')
+        if not os.path.exists(path):
+            continue
+        with open(path, newline='', encoding='utf-8') as file:
+            for row in csv.DictReader(file):
+                record = {field: row.get(field) or None for field in fields}
+                record['type'] = kind
+                yield record
+
+
+def image_names(chunk_size=2000):
+    """Имена картинок постов без повторов."""
+    images = (Post.objects.exclude(image='').order_by()
+              .values_list('image', flat=True).distinct())
+    return images.iterator(chunk_size)
+
+
+def _copy_out(name, directory):
+    target = os.path.join(directory, name)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    storage = images.image_storage()
+    with storage.open(name) as source, open(target, 'wb') as copy:
+        shutil.copyfileobj(source, copy)
+
+
+def export_images(names, directory, workers=8, batch_size=1000):
+    """Копирует картинки из хранилища в каталог в несколько потоков.
+
+    Возвращает число скопированных картинок.
+    """
+    names = iter(names)
+    total = 0
+    with ThreadPoolExecutor(workers) as pool:
+        while True:
+            batch = list(islice(names, batch_size))
+            if not batch:
+                return total
+            for _ in pool.map(lambda name: _copy_out(name, directory),
+                              batch):
+                total += 1
+
+
+def _parse_date(value):
+    if not value:
+        return timezone.now()
+    date = parse_datetime(value)
+    if date is None:
+        raise TransferError(f'Неверная дата {value!r}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+@contextmanager
+def _preserve_dates(model):
+    """Отключает auto_now и auto_now_add, чтобы сохранить даты записей."""
+    fields = [field for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False)
+              or getattr(field, 'auto_now_add', False)]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
+
+
+def _batches(records, size):
+    """Пачки подряд идущих записей одного вида: (вид, список)."""
+    batch = []
+    for record in records:
+        if batch and (record['type'] != batch[0]['type']
+                      or len(batch) == size):
+            yield batch[0]['type'], batch
+            batch = []
+        batch.append(record)
+    if batch:
+        yield batch[0]['type'], batch
+
+
+class Importer:
+    """Загрузка записей выгрузки пачками bulk_create.
+
+    media — каталог с картинками выгрузки; картинки копируются в
+    хранилище в image_workers потоков. Без него имена картинок
+    сохраняются как есть.
+    """
+
+    def __init__(self, batch_size=1000, transaction_size=10000,
+                 media=None, image_workers=8):
+        self.batch_size = batch_size
+        self.transaction_batches = max(1, transaction_size // batch_size)
+        self.media = media
+        self.image_workers = image_workers
+        self.user_ids = {}
+        self.group_ids = {}
+        self.post_offset = Post.objects.aggregate(pk=Max('pk'))['pk'] or 0
+        self.follow_offset = (
+            Follow.objects.aggregate(pk=Max('pk'))['pk'] or 0)
+        self.counts = dict.fromkeys(FIELDS, 0)
+        self.missing_images = 0
+
+    def run(self, records):
+        """Загружает записи и обновляет производные данные."""
+        batches = _batches(records, self.batch_size)
+        with ThreadPoolExecutor(self.image_workers) as self.pool:
+            while True:
+                chunk = list(islice(batches, self.transaction_batches))
+                if not chunk:
+                    break
+                with transaction.atomic():
+                    for kind, batch in chunk:
+                        getattr(self, f'load_{kind}s')(batch)
+                        self.counts[kind] += len(batch)
+                # При DEBUG журнал запросов иначе растёт до конца загрузки.
+                reset_queries()
+        self.refresh()
+        return self.counts
+
+    def resolve_users(self, usernames):
+        """Id пользователей по username; недостающие создаются."""
+        missing = set(usernames) - self.user_ids.keys() - {None}
+        if missing:
+            self.user_ids.update(User.objects.filter(
+                username__in=missing).values_list('username', 'pk'))
+            new = missing - self.user_ids.keys()
+            if new:
+                self.create_users({'username': username} for username in new)
+        return [self.user_ids.get(username) for username in usernames]
+
+    def create_users(self, records):
+        password = make_password(None)
+        users = [User(username=record['username'],
+                      first_name=record.get('first_name') or '',
+                      last_name=record.get('last_name') or '',
+                      password=password)
+                 for record in records]
+        User.objects.bulk_create(users, ignore_conflicts=True)
+        self.user_ids.update(User.objects.filter(
+            username__in=[user.username for user in users]
+        ).values_list('username', 'pk'))
+
+    def resolve_groups(self, slugs):
+        missing = set(slugs) - self.group_ids.keys() - {None}
+        if missing:
+            self.group_ids.update(Group.objects.filter(
+                slug__in=missing).values_list('slug', 'pk'))
+            unknown = missing - self.group_ids.keys()
+            if unknown:
+                raise TransferError(
+                    f'Группа {sorted(unknown)[0]!r} не найдена')
+        return [self.group_ids.get(slug) for slug in slugs]
+
+    def load_users(self, batch):
+        usernames = [record['username'] for record in batch]
+        self.user_ids.update(User.objects.filter(
+            username__in=usernames).values_list('username', 'pk'))
+        self.create_users(record for record in batch
+                          if record['username'] not in self.user_ids)
+
+    def load_groups(self, batch):
+        slugs = [record['slug'] for record in batch]
+        self.group_ids.update(Group.objects.filter(
+            slug__in=slugs).values_list('slug', 'pk'))
+        groups = [Group(slug=record['slug'], title=record['title'],
+                        description=record.get('description') or '')
+                  for record in batch if record['slug'] not in self.group_ids]
+        Group.objects.bulk_create(groups)
+        self.group_ids.update(Group.objects.filter(
+            slug__in=slugs).values_list('slug', 'pk'))
+
+    def copy_image(self, name):
+        """Копирует картинку из каталога выгрузки; возвращает её имя."""
+        storage = images.image_storage()
+        if not name or self.media is None or storage.exists(name):
+            return name or ''
+        try:
+            with open(os.path.join(self.media, name), 'rb') as file:
+                return storage.save(name, File(file))
+        except FileNotFoundError:
+            logger.warning('Картинка %s не найдена в выгрузке', name)
+            self.missing_images += 1
+            return ''
+
+    def load_posts(self, batch):
+        authors = self.resolve_users([record['author'] for record in batch])
+        groups = self.resolve_groups([record['group'] for record in batch])
+        images = self.pool.map(self.copy_image,
+                               [record.get('image') for record in batch])
+        posts = [Post(pk=int(record['id']) + self.post_offset,
+                      author_id=author_id, group_id=group_id,
+                      text=record['text'], image=image,
+                      pub_date=_parse_date(record.get('pub_date')),
+                      updated_at=timezone.now())
+                 for record, author_id, group_id, image
+                 in zip(batch, authors, groups, images)]
+        with _preserve_dates(Post):
+            Post.objects.bulk_create(posts)
+
+    def load_comments(self, batch):
+        authors = self.resolve_users([record['author'] for record in batch])
+        comments = [Comment(post_id=int(record['post']) + self.post_offset,
+                            author_id=author_id, text=record['text'],
+                            created=_parse_date(record.get('created')))
+                    for record, author_id in zip(batch, authors)]
+        with _preserve_dates(Comment):
+            Comment.objects.bulk_create(comments)
+
+    def load_follows(self, batch):
+        users = self.resolve_users([record['user'] for record in batch])
+        authors = self.resolve_users([record['author'] for record in batch])
+        Follow.objects.bulk_create(
+            (Follow(user_id=user_id, author_id=author_id)
+             for user_id, author_id in zip(users, authors)
+             if user_id != author_id),
+            ignore_conflicts=True,
+        )
+
+    def refresh(self):
+        """Обновляет то, что при обычном сохранении делают сигналы."""
+        new_posts = Post.objects.filter(pk__gt=self.post_offset)
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(no_style(),
+                                                             [Post]):
+                    cursor.execute(sql)
+            counters.recount()
+            timeline.mark_prolific()
+            timeline.fan_out_posts(new_posts)
+            # Новые посты уже разложены, остались прежние посты авторов
+            # новых подписок.
+            new_follows = Follow.objects.filter(
+                pk__gt=self.follow_offset,
+                author__posts__pk__lte=self.post_offset).distinct()
+            for follow in new_follows.iterator():
+                timeline.add_follow(follow)
+            search.index_posts(new_posts.values('pk'))
+            images = (new_posts.exclude(image='').order_by()
+                      .values_list('image', flat=True).distinct())
+            for image in images.iterator():
+                thumbnails.enqueue(image)
+            invalidate_index()
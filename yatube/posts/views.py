@@ -1,85 +1,142 @@
 """Write your Posts app view functions here."""
 
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.http import HttpRequest
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
 
-from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from core.pagecache import cache_page_fragments
+from core.ratelimit import ratelimit
 
-POSTS_PER_PAGE = 10
+from . import search as posts_search
+from .conditional import (conditional_page, group_validators, page_version,
+                          post_detail_validators, profile_validators)
+from .counters import get_counters
+from .feeds import POSTS_PER_PAGE, index_page, index_page_version
+from .forms import CommentForm, PostForm, SearchForm
+from .models import Comment, Follow, Group, Post, User
+from .pagination import CursorPaginator
+from .timeline import timeline_posts
 
 
 def context_pagination(queryset, request):
-    """Функция паджинатор."""
+    """Функция паджинатор.
+
+    При ?cursor= в запросе или POSTS_PAGINATION = 'cursor' страницы
+    выбираются по ключу (pub_date, id) без OFFSET и COUNT(*).
+    """
+    cursor = request.GET.get('cursor')
+    if cursor is not None or settings.POSTS_PAGINATION == 'cursor':
+        paginator = CursorPaginator(
+            queryset, POSTS_PER_PAGE,
+            count_limit=settings.POSTS_CURSOR_COUNT_LIMIT)
+        return {'page_obj': paginator.get_page(cursor)}
     paginator = Paginator(queryset, POSTS_PER_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return {'page_obj': page_obj}
 
 
-@cache_page(20, key_prefix='index_page')
+@cache_page_fragments(index_page_version)
 def index(request: HttpRequest):
-    """Функция для отображения главной страницы."""
+    """Функция для отображения главной страницы.
+
+    Страницы по номерам отдаются из кэша, который сбрасывается при
+    изменении постов; курсорные страницы читаются из базы. Готовый HTML
+    кэшируется для всех пользователей с метками фрагментов.
+    """
     template: str = 'posts/index.html'
-    post_list = Post.objects.all()
-    context = context_pagination(post_list, request)
+    if ('cursor' in request.GET
+            or settings.POSTS_PAGINATION == 'cursor'):
+        context = context_pagination(Post.objects.feed(), request)
+    else:
+        context = {'page_obj': index_page(request.GET.get('page'))}
     return render(request, template, context)
 
 
+@conditional_page(group_validators)
+@cache_page_fragments(page_version)
 def group_posts(request: HttpRequest, slug: str):
     """Функция для отображения страницы группы."""
-    group = (get_object_or_404(Group.objects.prefetch_related('posts'),
-             slug=slug))
-    post_list = group.posts.all()
+    group = get_object_or_404(Group, slug=slug)
+    post_list = group.posts.feed()
     template: str = 'posts/group_list.html'
     context = {'group': group}
     context.update(context_pagination(post_list, request))
     return render(request, template, context)
 
 
+@conditional_page(profile_validators)
+@cache_page_fragments(page_version)
 def profile(request: HttpRequest, username):
     """Функция для отображения страницы профиля."""
-    author = (get_object_or_404(User,
-              username=username))
-    following = False
-    if request.user.is_authenticated:
-        follow = Follow.objects.filter(user=request.user,
-                                       author=author).exists()
-        if follow is True:
-            following = True
-    user_posts = author.posts.select_related('author')
+    author = get_object_or_404(User.objects.select_related('counters'),
+                               username=username)
+    user_posts = author.posts.feed()
     template: str = 'posts/profile.html'
     context = {'author': author,
-               'following': following}
+               'counters': get_counters(author)}
     context.update(context_pagination(user_posts, request))
     return render(request, template, context)
 
 
+def comments_page(post_id, cursor=None):
+    """Страница комментариев поста по порядку создания.
+
+    Страницы выбираются курсором по (created, id), у автора читается
+    только имя, поэтому стоимость страницы не зависит от числа
+    комментариев к посту.
+    """
+    comments = (Comment.objects.filter(post_id=post_id)
+                .select_related('author')
+                .only('text', 'created', 'author__username'))
+    paginator = CursorPaginator(comments, settings.POSTS_COMMENTS_PER_PAGE,
+                                ordering=('created', 'id'))
+    return paginator.get_page(cursor)
+
+
+@conditional_page(post_detail_validators)
+@cache_page_fragments(page_version)
 def post_detail(request: HttpRequest, post_id):
     """Функция для отображения страницы поста."""
     template: str = 'posts/post_detail.html'
-    post = (get_object_or_404(Post,
-            pk=post_id))
+    post = get_object_or_404(
+        Post.objects.select_related('author__counters', 'group'),
+        pk=post_id)
     form = CommentForm(request.POST or None)
-    comments = post.comments.select_related()
+    comments = comments_page(post.pk, request.GET.get('comments'))
     context = {'post': post,
+               'author_counters': get_counters(post.author),
                'form': form,
                'comments': comments}
     return render(request, template, context)
 
 
+def post_comments(request: HttpRequest, post_id):
+    """Фрагмент со следующей страницей комментариев поста."""
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    context = {'post': post,
+               'comments': comments_page(post.pk,
+                                         request.GET.get('cursor'))}
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
 @login_required
+@ratelimit('post_create')
 def post_create(request):
     """Функция для страницы создания поста."""
     template: str = 'posts/create_post.html'
     form = PostForm(request.POST or None, files=request.FILES or None,)
     if request.method == 'POST' and form.is_valid():
-        post_form = form.save(commit=False)
-        post_form.author = request.user
-        post_form.save()
+        # Транзакция только вокруг записи: на SQLite она берёт
+        # блокировку записи (BEGIN IMMEDIATE), и отрисовка формы не
+        # должна её держать.
+        with transaction.atomic():
+            post_form = form.save(commit=False)
+            post_form.author = request.user
+            post_form.save()
         return redirect('posts:profile', username=request.user)
     context = {'form': form}
     return render(request, template, context)
@@ -97,7 +154,8 @@ def post_edit(request, post_id):
                     files=request.FILES or None,
                     instance=post)
     if form.is_valid():
-        form = form.save()
+        with transaction.atomic():
+            form.save()
         return redirect('posts:post_detail', post.pk)
 
     context = {'form': form,
@@ -107,6 +165,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@ratelimit('add_comment')
 def add_comment(request, post_id):
     """Функция для дщобавления комментария."""
     post = get_object_or_404(Post, pk=post_id)
@@ -115,32 +174,55 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
+def search(request: HttpRequest):
+    """Функция для страницы поиска по постам и комментариям."""
+    form = SearchForm(request.GET or None)
+    context = {'form': form}
+    if form.is_valid():
+        page_obj = posts_search.search_posts(
+            form.cleaned_data['q'],
+            group=form.cleaned_data['group'],
+            author=form.cleaned_data['author'],
+            cursor=request.GET.get('cursor'),
+            per_page=POSTS_PER_PAGE)
+        query = request.GET.copy()
+        query.pop('cursor', None)
+        context.update({'page_obj': page_obj,
+                        'query_string': query.urlencode()})
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def follow_index(request):
     """Функция для страницы избранных авторов."""
-    post_list = Post.objects.filter(author__following__user=request.user)
+    post_list = timeline_posts(request.user).feed()
     context = context_pagination(post_list, request)
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@ratelimit('follow', methods=None)
 def profile_follow(request, username):
     """Функция для подписки на автора."""
     author = get_object_or_404(User, username=username)
     if request.user != author:
-        Follow.objects.get_or_create(user=request.user, author=author)
+        with transaction.atomic():
+            Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('posts:profile', username=username)
 
 
 @login_required
+@ratelimit('follow', methods=None)
 def profile_unfollow(request, username):
     """Функция для отписки от автора."""
     author = get_object_or_404(User, username=username)
     if request.user != author:
-        if Follow.objects.filter(user=request.user, author=author).exists():
-            Follow.objects.filter(user=request.user, author=author).delete()
+        with transaction.atomic():
+            Follow.objects.filter(user=request.user,
+                                  author=author).delete()
     return redirect('posts:profile', username=username)
@@ -0,0 +1,18 @@
+"""
+Django settings for yatube project.
+
+Профиль настроек выбирается переменной окружения DJANGO_ENV (её можно
+задать в файле .env рядом с manage.py): dev — для разработки (по
+умолчанию), prod — для боевого запуска.
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+if os.getenv('DJANGO_ENV', 'dev') == 'prod':
+    from .prod import *  # noqa: F401,F403
+else:
+    from .dev import *  # noqa: F401,F403
@@ -0,0 +1,339 @@
+"""
+Base Django settings for yatube project.
+
+Generated by 'django-admin startproject' using Django 2.2.19.
+Профили dev и prod дополняют эти настройки, а выбирает профиль
+yatube/settings/__init__.py.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/2.2/topics/settings/
+
+For the full list of settings and their values, see
+https://docs.djangoproject.com/en/2.2/ref/settings/
+"""
+
+import os
+
+# Build paths inside the project like this: os.path.join(BASE_DIR, ...)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+
+# Quick-start development settings - unsuitable for production
+# See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = '+)xnxriqn^4la+&b6&t8*g+b=yc(u*=#40a)qewpn+n89&to(s'
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = False
+
+ALLOWED_HOSTS = [
+    'localhost',
+    '127.0.0.1',
+    '[::1]',
+    'testserver',
+]
+
+
+# Application definition
+
+INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'posts.apps.PostsConfig',
+    'users.apps.UsersConfig',
+    'core.apps.CoreConfig',
+    'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
+    'sorl.thumbnail',
+]
+
+MIDDLEWARE = [
+    'core.metrics.RequestMetricsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'core.pagecache.FragmentMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ROOT_URLCONF = 'yatube.urls'
+
+TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+
+TEMPLATES = [
+    {
+        'BACKEND': 'core.metrics.DjangoTemplates',
+        'DIRS': [TEMPLATES_DIR],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.debug',
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+                'core.context_processors.year.year',
+            ],
+        },
+    },
+]
+
+LOGIN_URL = 'users:login'
+LOGIN_REDIRECT_URL = 'posts:index'
+
+WSGI_APPLICATION = 'yatube.wsgi.application'
+
+CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+
+# Database
+# https://docs.djangoproject.com/en/2.2/ref/settings/#databases
+
+# По умолчанию SQLite; серверная база задаётся переменными DB_*.
+DATABASES = {
+    'default': {
+        'ENGINE': os.getenv('DB_ENGINE', 'core.backends.sqlite3'),
+        'NAME': os.getenv('DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')),
+        'USER': os.getenv('DB_USER', ''),
+        'PASSWORD': os.getenv('DB_PASSWORD', ''),
+        'HOST': os.getenv('DB_HOST', ''),
+        'PORT': os.getenv('DB_PORT', ''),
+    }
+}
+
+# SQLite: транзакции записи начинаются с BEGIN IMMEDIATE и ждут
+# блокировку до DB_BUSY_TIMEOUT секунд (см. core.backends.sqlite3).
+if DATABASES['default']['ENGINE'] == 'core.backends.sqlite3':
+    DATABASES['default']['OPTIONS'] = {
+        'timeout': float(os.getenv('DB_BUSY_TIMEOUT', 20)),
+    }
+
+# PRAGMA, которые core.db выполняет на каждом новом соединении SQLite.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -32 * 1024,
+}
+
+
+# Password validation
+# https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME':
+        ('django.contrib.auth.password_validation.'
+         'UserAttributeSimilarityValidator'),
+    },
+    {
+        'NAME': ('django.contrib.auth.password_validation.'
+                 'MinimumLengthValidator'),
+    },
+    {
+        'NAME': ('django.contrib.auth.password_validation.'
+                 'CommonPasswordValidator'),
+    },
+    {
+        'NAME': ('django.contrib.auth.password_validation.'
+                 'NumericPasswordValidator'),
+    },
+]
+
+EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+
+EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+# Internationalization
+# https://docs.djangoproject.com/en/2.2/topics/i18n/
+
+LANGUAGE_CODE = 'ru'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_L10N = True
+
+USE_TZ = True
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/2.2/howto/static-files/
+
+STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+
+STATIC_URL = '/static/'
+STATIC_ROOT = os.getenv('STATIC_ROOT', os.path.join(BASE_DIR, 'staticfiles'))
+
+# Статику из STATIC_ROOT может отдавать само приложение
+# (core.views.serve_static) — со сжатыми копиями и кэшем: файлы с хэшем
+# в имени на год, остальные на STATIC_MAX_AGE секунд.
+STATIC_SERVE = os.getenv('STATIC_SERVE', '0') == '1'
+STATIC_HASHED_MAX_AGE = 60 * 60 * 24 * 365
+STATIC_MAX_AGE = 60 * 60
+
+# collectstatic сохраняет .gz (и .br с пакетом brotli) для текстовых
+# файлов не меньше STATIC_COMPRESS_MIN_SIZE байт, если копия меньше
+# оригинала хотя бы на долю STATIC_COMPRESS_MIN_RATIO.
+STATIC_COMPRESS_MIN_SIZE = 256
+STATIC_COMPRESS_MIN_RATIO = 0.05
+
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Раздача медиа приложением (core.views.serve_media): python —
+# FileResponse с sendfile и Range, accel — X-Accel-Redirect для nginx
+# (location MEDIA_ACCEL_PREFIX с internal и alias на MEDIA_ROOT),
+# sendfile — X-Sendfile. Пустое значение: медиа отдаются только при
+# DEBUG через django.views.static.
+MEDIA_SERVE = os.getenv('MEDIA_SERVE', '')
+MEDIA_ACCEL_PREFIX = os.getenv('MEDIA_ACCEL_PREFIX', '/protected-media/')
+MEDIA_PUBLIC_DIRS = ('posts/', 'cache/')
+MEDIA_MAX_AGE = 60 * 60 * 24 * 30
+
+# Картинки постов хранятся по хэшу содержимого (core.storage) и
+# удаляются, когда на них не ссылается ни один пост. Файлы моложе
+# MEDIA_GC_GRACE секунд не удаляются: их может сохранять незавершённая
+# транзакция.
+MEDIA_GC_GRACE = 60 * 60
+
+# Кэш выбирается переменной окружения CACHE_BACKEND. Общий для всех
+# процессов кэш (db, file, redis) нужен при запуске в несколько
+# воркеров: иначе каждый воркер прогревает свой кэш, а сброс не доходит
+# до остальных. Для db перед запуском нужен manage.py createcachetable.
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', ''),
+    'db': ('django.core.cache.backends.db.DatabaseCache', 'yatube_cache'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache',
+             os.path.join(BASE_DIR, 'cache')),
+    'redis': ('core.cache.redis.RedisCache', 'redis://127.0.0.1:6379/0'),
+}
+
+CACHE_BACKEND, CACHE_LOCATION = CACHE_BACKENDS[
+    os.getenv('CACHE_BACKEND', 'locmem')]
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv('CACHE_LOCATION', CACHE_LOCATION),
+        'KEY_PREFIX': os.getenv('CACHE_KEY_PREFIX', 'yatube'),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 10000)),
+        },
+    }
+}
+
+# Posts feeds pagination: 'offset' (номера страниц) или 'cursor'
+# (ключ (pub_date, id), ссылки «вперёд/назад»).
+POSTS_PAGINATION = os.getenv('POSTS_PAGINATION', 'offset')
+
+# Предел подсчёта «примерного» числа постов в курсорном режиме;
+# None отключает подсчёт.
+POSTS_CURSOR_COUNT_LIMIT = 1000
+
+# Комментариев на странице поста и в каждой подгрузке «Показать ещё».
+POSTS_COMMENTS_PER_PAGE = 50
+
+# Лента подписок: авторам с большим числом подписчиков посты в ленты
+# не рассылаются, а читаются живым запросом.
+TIMELINE_FANOUT_LIMIT = 5000
+
+# Сколько последних постов автора попадает в ленту при подписке.
+TIMELINE_BACKFILL_LIMIT = 1000
+
+# Время жизни закэшированной карточки поста, секунды.
+POST_CARD_CACHE_TIMEOUT = 60 * 60
+
+# Кэш главной страницы сбрасывается при изменении постов, поэтому
+# время жизни может быть большим.
+INDEX_CACHE_TIMEOUT = 60 * 60
+
+# Главная, страницы групп, профилей и постов кэшируются целиком в виде
+# для анонимного пользователя; зависящие от пользователя фрагменты
+# подставляются в каждый ответ. Ключ меняется вместе с содержимым,
+# время жизни только вытесняет редко читаемые страницы.
+PAGE_CACHE_ENABLED = os.getenv('PAGE_CACHE_ENABLED', '1') == '1'
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Сколько первых страниц главной прогревать после сброса кэша.
+INDEX_PREWARM_PAGES = 3
+
+# Очередь миниатюр: задача, которую воркер не завершил за это время
+# (секунды), выдаётся другому воркеру; после стольких неудачных
+# попыток задача помечается ошибочной.
+THUMBNAIL_JOB_TIMEOUT = 5 * 60
+THUMBNAIL_JOB_ATTEMPTS = 3
+
+# Картинки постов: ширины миниатюр для srcset и форматы в порядке
+# предпочтения (недоступные в Pillow пропускаются; последний формат —
+# запасной для старых браузеров).
+POST_IMAGE_WIDTHS = (320, 640, 960, 1920)
+POST_IMAGE_FORMATS = ('AVIF', 'WEBP', 'JPEG')
+POST_IMAGE_FALLBACK_WIDTH = 960
+POST_IMAGE_SIZES = '(max-width: 992px) 100vw, 960px'
+
+# Поисковый индекс: 'fts5' (SQLite FTS5), 'postings' (таблицы индекса
+# и ранжирование на Python) или 'auto' — FTS5, если он есть в SQLite.
+POSTS_SEARCH_BACKEND = os.getenv('POSTS_SEARCH_BACKEND', 'auto')
+
+# Админка постов: до скольких строк считать выборку точно и сколько
+# самых релевантных постов показывать при поиске.
+POSTS_ADMIN_COUNT_LIMIT = 10000
+POSTS_ADMIN_SEARCH_LIMIT = 1000
+
+# Лимиты запросов на запись (core.ratelimit): «N/единица» (s, m, h, d)
+# по области view; корзина вмещает N запросов и пополняется равномерно.
+# Лимитеру нужен атомарный incr, не продлевающий ключ: он есть у
+# locmem (лимит в каждом процессе свой) и redis (общий лимит). При
+# кэше db или file лимиты считаются в отдельном locmem-кэше.
+if CACHE_BACKEND in (CACHE_BACKENDS['locmem'][0],
+                     CACHE_BACKENDS['redis'][0]):
+    RATELIMIT_CACHE = 'default'
+else:
+    CACHES['ratelimit'] = {
+        'BACKEND': CACHE_BACKENDS['locmem'][0],
+        'LOCATION': 'ratelimit',
+    }
+    RATELIMIT_CACHE = 'ratelimit'
+RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', '1') == '1'
+RATELIMITS = {
+    'post_create': '10/m',
+    'add_comment': '30/m',
+    'follow': '60/m',
+}
+
+# Метрики запросов (core.metrics): заголовок Server-Timing (выдаёт
+# устройство сервера любому клиенту, поэтому включён только в dev),
+# доля запросов, которые пишутся в лог, пороги медленного запроса и
+# медленного SQL (миллисекунды) и число последних запросов в сводке
+# по view.
+METRICS_SERVER_TIMING = False
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', 0))
+METRICS_SLOW_REQUEST_MS = 500
+METRICS_SLOW_QUERY_MS = 100
+METRICS_WINDOW = 1000
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.metrics': {
+            'handlers': ['console'],
+            'level': os.getenv('METRICS_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
@@ -0,0 +1,20 @@
+"""Development settings for yatube project."""
+
+import os
+
+from .base import *  # noqa: F401,F403
+from .base import INSTALLED_APPS, MIDDLEWARE
+
+DEBUG = True
+
+INTERNAL_IPS = [
+    '127.0.0.1',
+]
+
+METRICS_SERVER_TIMING = True
+
+# Панель отладки можно отключить, например для замеров: DEBUG_TOOLBAR=0.
+if os.getenv('DEBUG_TOOLBAR', '1') == '1':
+    INSTALLED_APPS = INSTALLED_APPS + ['debug_toolbar']
+    MIDDLEWARE = MIDDLEWARE + [
+        'debug_toolbar.middleware.DebugToolbarMiddleware']
@@ -0,0 +1,56 @@
+"""Production settings for yatube project.
+
+Секретный ключ и имена хостов берутся из окружения. Соединения с базой
+живут между запросами, шаблоны компилируются один раз на процесс,
+статика раздаётся из collectstatic с хэшами в именах файлов и сжатыми
+копиями, медиа — через sendfile или фронтовой сервер.
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .base import *  # noqa: F401,F403
+from .base import DATABASES, TEMPLATES
+
+DEBUG = False
+
+try:
+    SECRET_KEY = os.environ['SECRET_KEY']
+except KeyError:
+    raise ImproperlyConfigured('Задайте SECRET_KEY для профиля prod.')
+
+ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', 'localhost').split(',')
+
+# Чтения идут через отдельное соединение SQLite только для чтения к тому
+# же файлу: в режиме WAL они не ждут писателя (см. core.db).
+if (DATABASES['default']['ENGINE'] == 'core.backends.sqlite3'
+        and os.getenv('DB_READ_REPLICA', '1') == '1'):
+    DATABASES['replica'] = dict(DATABASES['default'], READ_ONLY=True,
+                                TEST={'MIRROR': 'default'})
+    DATABASE_ROUTERS = ['core.db.ReadReplicaRouter']
+
+# Соединения с базой переиспользуются до CONN_MAX_AGE секунд вместо
+# нового соединения на каждый запрос.
+for database in DATABASES.values():
+    database['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', 600))
+
+# Шаблоны читаются и компилируются один раз на процесс.
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
+STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+
+# Медиа отдаёт приложение через sendfile; с nginx — MEDIA_SERVE=accel.
+MEDIA_SERVE = os.getenv('MEDIA_SERVE', 'python')
+
+# Без фронтового сервера статику отдаёт приложение; с nginx и
+# gzip_static/brotli_static можно отключить: STATIC_SERVE=0.
+STATIC_SERVE = os.getenv('STATIC_SERVE', '1') == '1'
+
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', 0.01))
@@ -1,9 +1,13 @@
 """Set your project URL's here."""
 
+import re
+
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
+
+from core.views import metrics, serve_media, serve_static
 
 urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
@@ -11,18 +15,33 @@ urlpatterns = [
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('api/v1/', include('api.urls', namespace='api')),
+    path('metrics/', metrics, name='metrics'),
 ]
 
 handler404 = 'core.views.page_not_found'
 handler500 = 'core.views.server_error'
 handler403 = 'core.views.permission_denied'
 
-if settings.DEBUG:
-    import debug_toolbar
+if settings.STATIC_SERVE:
+    urlpatterns += (
+        re_path(r'^{}(?P<path>.+)$'.format(
+            re.escape(settings.STATIC_URL.lstrip('/'))), serve_static),
+    )
 
+if settings.MEDIA_SERVE:
+    urlpatterns += (
+        re_path(r'^{}(?P<path>.+)$'.format(
+            re.escape(settings.MEDIA_URL.lstrip('/'))), serve_media),
+    )
+elif settings.DEBUG:
     urlpatterns += static(
         settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
     )
+
+if 'debug_toolbar' in settings.INSTALLED_APPS:
+    import debug_toolbar
+
     urlpatterns += (
         path('__debug__/', include(debug_toolbar.urls)),
     )